@@ -0,0 +1,179 @@
+import threading
+import time
+
+import numpy as np
+
+from cpu_scheduler import protect_audio_thread
+from jarvis_log import get_logger, telemetry
+
+log = get_logger(__name__)
+
+# Yeh file mic ko ek hi baar kholti hai aur hamesha khula rakhti hai.
+# PortAudio callback (capture thread) har block ko ek preallocated ring buffer mein likhta hai.
+# Hotword, VAD recording aur speaker verification sab 'consumers' hain jo ring se
+# absolute sample index ke hisaab se padhte hain -- na stream reopen, na ALSA setup ka gap,
+# aur hotword se thoda pehle ka audio (pre-roll) bhi mil jaata hai.
+
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_BLOCKSIZE = 160 # 10 ms: consumers ko jaldi data milta hai
+DEFAULT_RING_SECONDS = 30 # Sabse lambi recording (7s) + pre-roll se kaafi zyada
+POLL_INTERVAL = 0.005 # Reader ka wait step (callback mein koi lock/notify nahi)
+
+
+class RingBuffer:
+    """
+    Single-writer float32 ring. Writer pehle samples copy karta hai, phir 'write_pos'
+    publish karta hai; readers sirf write_pos padhte hain, isliye koi lock nahi chahiye.
+    Index absolute hain (shuru se kitne samples aaye), wrap-around andar hi sambhalta hai.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.buf = np.zeros(self.capacity, dtype=np.float32)
+        self.write_pos = 0
+
+    def write(self, samples):
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self.buf[start:start + first] = samples[:first]
+        if first < n:
+            self.buf[:n - first] = samples[first:]
+        self.write_pos += n
+
+    def oldest(self):
+        """Sabse purana index jo abhi bhi ring mein hai."""
+        return max(0, self.write_pos - self.capacity)
+
+    def read(self, start, end, out=None):
+        """[start, end) ki copy. Overwrite ho chuka ya abhi aaya hi nahi toh ValueError."""
+        if start < self.oldest() or end > self.write_pos or end < start:
+            raise ValueError(f"Ring range [{start}, {end}) available nahi (have [{self.oldest()}, {self.write_pos}))")
+        n = end - start
+        if out is None:
+            out = np.empty(n, dtype=np.float32)
+        s = start % self.capacity
+        first = min(n, self.capacity - s)
+        out[:first] = self.buf[s:s + first]
+        if first < n:
+            out[first:n] = self.buf[:n - first]
+        # Padhte waqt writer ne overwrite toh nahi kar diya?
+        if start < self.oldest():
+            raise ValueError("Ring reader bahut peeche reh gaya (overrun).")
+        return out
+
+
+class CaptureReader:
+    """Ring ka ek sequential consumer: read(n) agle n samples deta hai (zaroorat ho toh wait)."""
+
+    def __init__(self, capture, start):
+        self.capture = capture
+        self.position = start
+
+    def read(self, n, timeout=None):
+        """Agle n samples, ya timeout par None."""
+        end = self.position + n
+        if not self.capture.wait_for(end, timeout):
+            return None
+        frame = self.capture.ring.read(self.position, end)
+        self.position = end
+        return frame
+
+
+class AudioCapture:
+    """
+    Ek persistent sd.InputStream jo ring buffer bharta rehta hai.
+    push() direct bhi call ho sakta hai (replay/testing mein mic ke bina).
+    """
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, blocksize=DEFAULT_BLOCKSIZE, seconds=DEFAULT_RING_SECONDS):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.ring = RingBuffer(sample_rate * seconds)
+        self.stream = None
+        self.xruns = 0
+        self.callback_tid = None # PortAudio callback thread ki native id (cpu_scheduler ke liye)
+
+    def _callback(self, indata, frames, time_info, status):
+        # Real-time thread: koi print/log nahi, sirf ring write aur telemetry slot
+        if self.callback_tid is None:
+            self.callback_tid = threading.get_native_id()
+        if status:
+            self.xruns += 1
+            telemetry.xrun()
+        block = indata[:, 0]
+        self.ring.write(block)
+        telemetry.level(block)
+
+    def start(self):
+        if self.stream is not None:
+            return
+        import sounddevice as sd
+        self.stream = sd.InputStream(
+            channels=1,
+            samplerate=self.sample_rate,
+            blocksize=self.blocksize,
+            dtype='float32',
+            callback=self._callback
+        )
+        self.stream.start()
+        log.info(f"[Capture] Mic stream open ({self.sample_rate} Hz, block {self.blocksize}).")
+        # Callback thread audio core par + realtime priority (LLM ke saare cores lene par bhi overflow na ho)
+        protect_audio_thread('capture', lambda: self.callback_tid)
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def push(self, samples):
+        """Mic ke bina audio daalna (replay/tests)."""
+        self.ring.write(np.asarray(samples, dtype=np.float32).reshape(-1))
+
+    @property
+    def position(self):
+        return self.ring.write_pos
+
+    def wait_for(self, index, timeout=None):
+        """Jab tak ring mein 'index' tak samples na aa jaayein. Timeout par False."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.ring.write_pos < index:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+        return True
+
+    def reader(self, start=None):
+        """Naya consumer; start=None matlab abhi se."""
+        if start is None:
+            start = self.position
+        return CaptureReader(self, max(start, self.ring.oldest()))
+
+    def read_range(self, start, end):
+        return self.ring.read(max(start, self.ring.oldest()), end)
+
+    def ms_to_samples(self, ms):
+        return int(self.sample_rate * ms / 1000)
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    print("--- Audio Capture Ring Test (no mic) ---")
+    cap = AudioCapture(seconds=1)
+    reader = cap.reader()
+
+    def producer():
+        for i in range(50): # 50 x 10 ms, ring sirf 1s ka
+            cap.push(np.full(160, i, dtype=np.float32))
+            time.sleep(0.002)
+
+    threading.Thread(target=producer, daemon=True).start()
+    frames = [reader.read(480, timeout=1.0) for _ in range(16)]
+    print(f"Read {sum(len(f) for f in frames)} samples; first={frames[0][0]}, last={frames[-1][-1]}")
+    print(f"Pre-roll (last 100 ms): {cap.read_range(cap.position - 1600, cap.position)[[0, -1]]}")
+    print("\n--- Test Complete ---")
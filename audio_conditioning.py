@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# audio_conditioning.py
+# Hinglish: record_command ka float32 buffer seedha memory mein saaf karta hai
+# (silence check, DC hatao, gain normalize, clipping se bachao) -- na ffmpeg, na temp WAV.
+# CLI: audio_volume_analysis.sh jaisa hi diagnostic report Python se.
+#   python3 audio_conditioning.py /path/to/file.wav        # analyze
+#   python3 audio_conditioning.py -a /path/to/file.wav     # amplify aur _loud.wav save
+
+import io
+import sys
+import wave
+
+import numpy as np
+
+SILENCE_FLOOR_DB = -90.0 # Isse neeche = digital silence (ffmpeg ka 'mean_volume: -inf' case)
+TARGET_RMS_DB = -18.0 # Whisper ke liye aaram ka level (loudnorm I=-16 ke aas paas)
+PEAK_LIMIT_DB = -1.5 # True peak limit, loudnorm ke TP=-1.5 jaisa
+MAX_GAIN_DB = 30.0 # Noise ko 1000x mat badhao
+
+# audio_volume_analysis.sh wale thresholds
+THRESH_WARN_DB = -40.0
+THRESH_BAD_DB = -60.0
+
+
+def _to_db(value):
+    return float(20.0 * np.log10(value)) if value > 0 else float('-inf')
+
+def volume_stats(audio):
+    """
+    ffmpeg 'volumedetect' jaisa: (mean_volume_db, max_volume_db), full scale = 1.0.
+    Sab float32 mein, ek hi pass mein.
+    """
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    if audio.size == 0:
+        return float('-inf'), float('-inf')
+    rms = float(np.sqrt(np.dot(audio, audio) / audio.size))
+    peak = float(np.max(np.abs(audio)))
+    return _to_db(rms), _to_db(peak)
+
+def is_silent(audio, floor_db=SILENCE_FLOOR_DB):
+    mean_db, _ = volume_stats(audio)
+    return mean_db <= floor_db
+
+def condition(audio, target_rms_db=TARGET_RMS_DB, peak_limit_db=PEAK_LIMIT_DB, max_gain_db=MAX_GAIN_DB):
+    """
+    STT se pehle audio taiyaar karta hai (in memory):
+    1. DC offset hatao
+    2. RMS ko target tak le jaao, par gain itna hi ki peak limit cross na ho
+    3. Phir bhi bacha koi sample [-1, 1] mein clip
+    Returns: naya float32 array (silent audio ke liye None).
+    """
+    audio = np.array(audio, dtype=np.float32).reshape(-1)
+    if audio.size == 0:
+        return None
+    audio -= audio.mean(dtype=np.float64).astype(np.float32)
+
+    mean_db, max_db = volume_stats(audio)
+    if mean_db <= SILENCE_FLOOR_DB:
+        return None
+
+    gain_db = min(target_rms_db - mean_db, peak_limit_db - max_db, max_gain_db)
+    audio *= np.float32(10.0 ** (gain_db / 20.0))
+    np.clip(audio, -1.0, 1.0, out=audio)
+    return audio
+
+def to_wav_bytes(audio, sample_rate):
+    """float32 audio ko 16-bit PCM WAV bytes (memory mein) banata hai, stdin par bhejne ke liye."""
+    pcm = (np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0) * 32767.0).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(int(sample_rate))
+        wf.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+def analyze_file(path, amplify=False):
+    """audio_volume_analysis.sh ka Python version (same report, same thresholds)."""
+    import soundfile as sf
+    audio, sample_rate = sf.read(path, dtype='float32', always_2d=True)
+    audio = audio.mean(axis=1)
+
+    print(f"Analyzing: {path}")
+    mean_db, max_db = volume_stats(audio)
+    print(f"mean_volume: {mean_db:.1f} dB")
+    print(f"max_volume:  {max_db:.1f} dB")
+
+    if mean_db <= THRESH_BAD_DB:
+        print("Status: TOO QUIET (very low). Model likely won't detect speech.")
+    elif mean_db <= THRESH_WARN_DB:
+        print("Status: Low volume. Better to amplify or re-record louder (recommended).")
+    else:
+        print("Status: Volume OK for STT (should work).")
+
+    print("")
+    print("Suggestions:")
+    print(" - Agar mean_volume <= -45 dB: mic gain bad ya recording bahut halki. Re-record karen (zara loud bol ke).")
+    print(" - Windows: Settings → System → Sound → Input → Select mic → Device properties → Levels -> 80-100%")
+    print(" - Agar WSL mic forwarding problem ho: record in Windows Voice Recorder, copy .wav to WSL and test.")
+    print("")
+    if amplify:
+        out_path = path.rsplit('.', 1)[0] + "_loud.wav"
+        print(f"Amplifying and normalizing to {out_path}...")
+        conditioned = condition(audio)
+        if conditioned is None:
+            print("Audio poori tarah silent hai, amplify karne layak kuch nahi.")
+            return 0
+        sf.write(out_path, conditioned, sample_rate, subtype='PCM_16')
+        print(f"Amplified file saved to: {out_path}")
+        print(f"Run: python3 audio_conditioning.py {out_path}  to re-check")
+    return 0
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    do_amplify = bool(args) and args[0] == "-a"
+    if do_amplify:
+        args = args[1:]
+    wav_path = args[0] if args else "./temp_stt_input.wav"
+    try:
+        sys.exit(analyze_file(wav_path, amplify=do_amplify))
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"File not found: {wav_path} ({e})")
+        sys.exit(2)
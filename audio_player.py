@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from cpu_scheduler import protect_audio_thread
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file TTS audio ko ek hi persistent sd.OutputStream se bajati hai.
+# Pehle har utterance ke liye naya 'aplay' process khulta tha, aur use rokne ka ek hi tareeka tha
+# 'killall aplay' (system ke saare aplay!). Ab PortAudio callback har block (20 ms) mein current
+# buffer se agla hissa nikalta hai; stop() ek flag set karta hai jo agle hi block mein lagta hai.
+# Callback har block ka playback level bhi note karta hai -- barge-in VAD apni hi awaaz ko
+# user ki awaaz samajhne se bachne ke liye ise use karta hai (interrupt_handler.EchoGate).
+
+DEFAULT_SAMPLE_RATE = 22050 # Piper medium voices
+DEFAULT_BLOCK_MS = 20
+SILENCE_DB = -90.0
+LEVEL_HISTORY = 200 # Itne blocks (~4s) ke (time, dB) yaad
+
+PlaybackResult = namedtuple('PlaybackResult', ['completed', 'position_s', 'duration_s'])
+
+
+def level_db(samples):
+    if len(samples) == 0:
+        return SILENCE_DB
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float32))))
+    return 20.0 * np.log10(rms) if rms > 1e-9 else SILENCE_DB
+
+def pcm_to_float(pcm, sample_rate, target_rate):
+    """S16_LE bytes -> float32, target_rate par (linear resample, voices ke rate alag ho sakte hain)."""
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    if sample_rate != target_rate and len(audio):
+        n = int(round(len(audio) * target_rate / float(sample_rate)))
+        audio = np.interp(np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+class AudioPlayer:
+    """
+    play() blocking hai (ek waqt mein ek utterance; tts ka playback lock isse sambhalta hai).
+    stop() kisi bhi thread se: agla audio block silence, play() turant lautta hai
+    aur bata deta hai utterance mein kahan tak baja tha.
+    """
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, block_ms=DEFAULT_BLOCK_MS, device=None):
+        self.sample_rate = sample_rate
+        self.blocksize = int(sample_rate * block_ms / 1000)
+        self.device = device
+        self.stream = None
+        self.current = None # float32 array jo abhi baj raha hai
+        self.pos = 0 # current mein kitne samples baj chuke
+        self.stop_flag = False
+        self.done = threading.Event()
+        self.done.set()
+        self.levels = deque(maxlen=LEVEL_HISTORY) # (monotonic time, dB) har block ka
+        self.underruns = 0
+        self.callback_tid = None # PortAudio callback thread ki native id (cpu_scheduler ke liye)
+
+    def start(self):
+        if self.stream is not None:
+            return
+        import sounddevice as sd
+        self.stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            blocksize=self.blocksize,
+            channels=1,
+            dtype='float32',
+            device=self.device,
+            callback=self._callback
+        )
+        self.stream.start()
+        log.info(f"[Player] Output stream open ({self.sample_rate} Hz, block {self.blocksize}).")
+        protect_audio_thread('playback', lambda: self.callback_tid)
+
+    def _callback(self, outdata, frames, time_info, status):
+        # Real-time thread: koi lock/log nahi
+        if self.callback_tid is None:
+            self.callback_tid = threading.get_native_id()
+        if status:
+            self.underruns += 1
+        current = self.current
+        if current is None or self.stop_flag:
+            outdata.fill(0)
+            self.levels.append((time.monotonic(), SILENCE_DB))
+            if current is not None:
+                self.current = None
+                self.done.set()
+            return
+        chunk = current[self.pos:self.pos + frames]
+        n = len(chunk)
+        outdata[:n, 0] = chunk
+        outdata[n:, 0] = 0
+        self.pos += n
+        self.levels.append((time.monotonic(), level_db(chunk)))
+        if self.pos >= len(current):
+            self.current = None
+            self.done.set()
+
+    def play(self, pcm, sample_rate=DEFAULT_SAMPLE_RATE):
+        """S16_LE mono PCM bajao. Returns PlaybackResult (stop hua toh completed=False)."""
+        audio = pcm_to_float(pcm, sample_rate, self.sample_rate)
+        duration = len(audio) / float(self.sample_rate)
+        if not len(audio):
+            return PlaybackResult(True, 0.0, 0.0)
+        self.start()
+        self.stop_flag = False
+        self.pos = 0
+        self.done.clear()
+        self.current = audio
+        # Buffer khatam hone ke baad bhi stream ki latency jitna ruko (warna aakhri hissa kat-ta)
+        self.done.wait(duration + 2.0)
+        position = min(self.pos, len(audio)) / float(self.sample_rate)
+        completed = not self.stop_flag
+        if completed:
+            latency = getattr(self.stream, 'latency', 0.0) or 0.0
+            time.sleep(latency)
+        return PlaybackResult(completed, position, duration)
+
+    def stop(self):
+        """Agle block se silence. Returns position (seconds) jahan roka, ya None agar kuch baj nahi raha tha."""
+        if self.current is None:
+            return None
+        self.stop_flag = True
+        position = self.pos / float(self.sample_rate)
+        self.done.wait(0.5) # Callback agle block mein done set karta hai
+        return position
+
+    @property
+    def playing(self):
+        return self.current is not None and not self.stop_flag
+
+    def recent_level_db(self, window_s=0.3):
+        """Pichle window_s mein sabse tez playback level (dB). Echo gating ke liye."""
+        cutoff = time.monotonic() - window_s
+        levels = [db for t, db in list(self.levels) if t >= cutoff]
+        return max(levels) if levels else SILENCE_DB
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+_player = None
+_player_lock = threading.Lock()
+_player_failed = False
+
+def get_player(create=True):
+    """
+    Process-wide player; sounddevice/output device na mile toh None (tts aplay par chala jaata hai).
+    create=False: sirf pehle se khula player (stop/level check ke liye device mat kholo).
+    """
+    global _player, _player_failed
+    with _player_lock:
+        if _player is None and create and not _player_failed:
+            try:
+                player = AudioPlayer()
+                player.start()
+                _player = player
+            except Exception as e:
+                _player_failed = True
+                log.warning(f"[Player] Output stream nahi khula ({e}); aplay use hoga.")
+        return _player
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    print("--- Audio Player Test (callback simulate, no device) ---")
+
+    class FakeStream:
+        latency = 0.0
+
+    player = AudioPlayer()
+    player.stream = FakeStream()
+    tone = (np.sin(2 * np.pi * 440 * np.arange(22050) / 22050.0) * 0.3 * 32767).astype(np.int16).tobytes()
+    out = np.zeros((player.blocksize, 1), dtype=np.float32)
+
+    def device():
+        # Sound card jaisa: har 20 ms ek block maangta hai
+        while not player.done.is_set() or player.current is not None:
+            player._callback(out, player.blocksize, None, None)
+            time.sleep(player.blocksize / float(player.sample_rate))
+
+    threading.Thread(target=lambda: (time.sleep(0.05), device()), daemon=True).start()
+    stopper = threading.Timer(0.4, lambda: print(f"stop() at {player.stop():.2f}s"))
+    start = time.monotonic()
+    stopper.start()
+    result = player.play(tone, 22050)
+    print(f"{result} (returned after {time.monotonic() - start:.2f}s)")
+    print(f"Recent playback level: {player.recent_level_db(1.0):.1f} dB")
+    print("\n--- Test Complete ---")
@@ -0,0 +1,182 @@
+import re
+import threading
+from collections import namedtuple
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file har utterance ko ek hi pass mein route karti hai.
+# Pehle intent_parser har keyword ke liye naya re.search chalata tha aur usse pehle
+# jarvis_name_manager apne alag regex -- cost keywords ki ginti ke saath badhti thi.
+# Ab startup par saare rename patterns aur intent keywords ek word-level trie mein compile hote hain.
+# Text ke har word se trie mein sirf utna aage jaate hain jitna sabse lamba phrase hai, isliye
+# dispatch O(text length) hai, chahe INTENT_MAP mein saikdon phrases hon.
+
+KIND_RENAME = 'rename'
+KIND_INTENT = 'intent'
+KIND_PRIORITY = {KIND_RENAME: 1, KIND_INTENT: 0} # Rename pehle check hota tha, ab bhi upar rank hota hai
+
+WORD_RE = re.compile(r"\w+")
+TRAILING_PUNCT = ".,!?;:"
+
+# name: route ka naam (intent name ya config key), kind: 'intent'/'rename',
+# phrase: match hua keyword, start/end: text mein char offsets, argument: capture_rest wale phrase ke baad ka text,
+# hits: is route ke kitne keywords mile, score: ranking tuple (bada = behtar)
+RouteMatch = namedtuple('RouteMatch', ['name', 'kind', 'phrase', 'start', 'end', 'argument', 'hits', 'score'])
+
+
+def route_score(kind, n_words, phrase, hits, start):
+    """Ranking tuple: kind priority, lambe phrase, zyada hits, phir text mein pehle wala."""
+    return (KIND_PRIORITY.get(kind, 0), n_words, len(phrase), hits, -start)
+
+def external_match(name, source, kind=KIND_INTENT):
+    """
+    Router ke bahar se aaya match (jaise keyword_spotter ne audio se intent pehchana).
+    Text nahi hai, isliye offsets 0 aur phrase mein source ka naam; score router jaisa hi banta hai.
+    """
+    return RouteMatch(name, kind, source, 0, 0, None, 1, route_score(kind, len(source.split()), source, 1, 0))
+
+
+def tokenize(text):
+    """(word, start, end) list; lowercase. Word boundary ka kaam yahi karta hai."""
+    return [(m.group(0), m.start(), m.end()) for m in WORD_RE.finditer(text.lower())]
+
+
+class _Node:
+    __slots__ = ('children', 'outputs')
+
+    def __init__(self):
+        self.children = {}
+        self.outputs = [] # (name, kind, phrase, n_words, capture_rest)
+
+
+class CommandRouter:
+    """
+    Word-level trie. add_phrase() se rule jodo, match() se ek pass mein saare matches
+    ranked milte hain (route ke hisaab se best match, first-match-wins nahi).
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.max_depth = 0
+        self.phrases = 0
+        self.lock = threading.Lock()
+
+    def add_phrase(self, phrase, name, kind=KIND_INTENT, capture_rest=False):
+        """
+        phrase: words ki string ("system update"). capture_rest=True: phrase ke baad ka
+        poora text 'argument' ban jaata hai ("change your name to <argument>").
+        """
+        words = [w for w, _, _ in tokenize(phrase)]
+        if not words:
+            return
+        with self.lock:
+            node = self.root
+            for word in words:
+                node = node.children.setdefault(word, _Node())
+            node.outputs.append((name, kind, " ".join(words), len(words), capture_rest))
+            self.max_depth = max(self.max_depth, len(words))
+            self.phrases += 1
+
+    def match(self, text):
+        """Saare routes, best pehle. Har route ka sabse specific (lamba) match rakha jaata hai."""
+        tokens = tokenize(text)
+        best = {}
+        hits = {}
+        root = self.root
+        for i in range(len(tokens)):
+            node = root
+            # Har start word se trie mein max_depth tak hi (phrase lengths par bound)
+            for j in range(i, min(i + self.max_depth, len(tokens))):
+                node = node.children.get(tokens[j][0])
+                if node is None:
+                    break
+                for name, kind, phrase, n_words, capture_rest in node.outputs:
+                    start, end = tokens[i][1], tokens[j][2]
+                    argument = None
+                    if capture_rest:
+                        argument = text[end:].strip().rstrip(TRAILING_PUNCT).strip()
+                        if not argument:
+                            continue # "change your name to" ke baad kuch nahi
+                    key = (kind, name)
+                    hits[key] = hits.get(key, 0) + 1
+                    # Specific phrase (zyada words/chars) jeet-ta hai; barabar ho toh pehle wala
+                    score = (KIND_PRIORITY.get(kind, 0), n_words, len(phrase), -start)
+                    if key not in best or score > best[key][0]:
+                        best[key] = (score, phrase, start, end, argument)
+        results = []
+        for (kind, name), (score, phrase, start, end, argument) in best.items():
+            n_hits = hits[(kind, name)]
+            full_score = route_score(kind, score[1], phrase, n_hits, start)
+            results.append(RouteMatch(name, kind, phrase, start, end, argument, n_hits, full_score))
+        results.sort(key=lambda m: m.score, reverse=True)
+        return results
+
+    def route(self, text, kind=None):
+        """Sabse upar wala match (kind diya ho toh sirf usi kind mein), ya None."""
+        for m in self.match(text):
+            if kind is None or m.kind == kind:
+                return m
+        return None
+
+
+def build_router(intent_map, rename_patterns):
+    """
+    intent_map: {intent_name: [keywords]} (intent_parser.INTENT_MAP)
+    rename_patterns: [(config_key, verbs, owners, response)] (jarvis_name_manager.RENAME_PATTERNS)
+    """
+    router = CommandRouter()
+    for config_key, verbs, owners, _response in rename_patterns:
+        for verb in verbs:
+            for owner in owners:
+                router.add_phrase(f"{verb} {owner} name to", config_key, kind=KIND_RENAME, capture_rest=True)
+    for intent_name, keywords in intent_map.items():
+        for keyword in keywords:
+            router.add_phrase(keyword, intent_name, kind=KIND_INTENT)
+    log.info(f"[Router] {router.phrases} phrases compiled (max {router.max_depth} words).")
+    return router
+
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    """Default router (INTENT_MAP + RENAME_PATTERNS), pehli call par ek hi baar compile."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                # Yahan import: intent_parser/jarvis_name_manager khud is module ko use karte hain
+                from intent_parser import INTENT_MAP
+                from jarvis_name_manager import RENAME_PATTERNS
+                _router = build_router(INTENT_MAP, RENAME_PATTERNS)
+    return _router
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import time
+    print("--- Command Router Test ---")
+    router = get_router()
+    for text in [
+        "Jarvis, aaj kya din hai? Date batao.",
+        "system update kardo",
+        "Change your name to Friday.",
+        "reset your name to nothing", # 'set' word boundary ke bina match nahi hona chahiye
+        "aaj mausam kaisa hai",
+    ]:
+        print(f"\nIN: {text}")
+        for m in router.match(text):
+            print(f"  {m.kind}:{m.name} phrase='{m.phrase}' arg={m.argument!r} hits={m.hits}")
+
+    # keyword_spotter jaisa bahar se aaya match: same tuple shape, router ke match jaisa rank
+    print(f"\nExternal: {external_match('check_ram', 'kws')}")
+
+    # Bahut saare phrases: dispatch time phrases ki ginti se nahi badhna chahiye
+    big = build_router({f"intent_{i}": [f"keyword{i} alpha", f"beta{i}"] for i in range(2000)}, [])
+    sentence = "jarvis please do the thing with keyword1999 alpha right now " * 4
+    start = time.perf_counter()
+    for _ in range(1000):
+        big.match(sentence)
+    print(f"\n2000 intents, 1000 matches: {(time.perf_counter() - start) * 1000:.1f} ms")
+    print("\n--- Test Complete ---")
@@ -0,0 +1,221 @@
+import json
+import os
+import tempfile
+import threading
+from collections.abc import Mapping
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file config.json ki ek hi shared copy memory mein rakhti hai.
+# Pehle jarvis_name_manager har utterance par file dobara padh/parse karta tha, aur rename ke baad
+# main.py ka 'config' purana reh jaata tha (listen_for_hotword purana JARVIS_NAME dikhata tha).
+# Ab sab isi service se padhte hain; file mtime badle toh reload, likhna temp file + rename se,
+# aur badli hui keys subscribers (main, ...) ko bata di jaati hain.
+
+JARVIS_DIR = os.path.expanduser('~/jarvis')
+CONFIG_PATH = os.path.join(JARVIS_DIR, 'config.json')
+DEFAULT_POLL_INTERVAL = 1.0 # mtime check (ek stat call, bahut sasta)
+
+
+class ConfigService(Mapping):
+    """
+    Read-only Mapping jaisa (config['KEY'], config.get()) jo hamesha taaza data deta hai.
+    Andar ka dict kabhi in-place nahi badalta: reload/update naya dict bana kar reference swap
+    karte hain, isliye readers ko lock nahi chahiye aur kabhi aadha-adhoora config nahi dikhta.
+    Defaults (setdefault) alag layer mein rehte hain aur file mein kabhi nahi likhe jaate.
+    """
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+        self._file = {} # Sirf file ki values (yahi likhi jaati hain)
+        self._defaults = {}
+        self._data = {} # defaults + file, readers isi ko dekhte hain
+        self._mtime = None
+        self.loaded = False
+        self._subscribers = [] # (callback, keys ya None)
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Mapping interface ---
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def setdefault(self, key, default=None):
+        """Runtime default (file mein nahi likha jaata)."""
+        with self.lock:
+            self._defaults[key] = default
+            self._rebuild()
+        return self._data[key]
+
+    def _rebuild(self):
+        data = dict(self._defaults)
+        data.update(self._file)
+        self._data = data
+
+    # --- Load / reload ---
+    def _stat_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        """Pehli baar file padho. File na ho ya JSON kharab ho toh exception (caller FATAL maane)."""
+        with self.lock:
+            mtime = self._stat_mtime()
+            with open(self.path, 'r') as f:
+                self._file = json.load(f)
+            self._mtime = mtime
+            self._rebuild()
+            self.loaded = True
+        return self
+
+    def check_reload(self):
+        """mtime badla ho toh reload karke subscribers ko batao. Returns changed keys dict."""
+        mtime = self._stat_mtime()
+        if mtime is None or mtime == self._mtime:
+            return {}
+        with self.lock:
+            try:
+                with open(self.path, 'r') as f:
+                    new_file = json.load(f)
+            except (OSError, ValueError) as e:
+                # Editor ne aadhi file likhi ho sakti hai: purana config rakho, agle check par dobara
+                log.warning(f"[Config] Reload fail ({e}); purana config hi chalu hai.")
+                return {}
+            self._mtime = mtime
+            changed = self._diff(self._file, new_file)
+            self._file = new_file
+            self._rebuild()
+        if changed:
+            log.info(f"[Config] File badli, reload: {sorted(changed)}")
+            self._notify(changed)
+        return changed
+
+    @staticmethod
+    def _diff(old, new):
+        changed = {key: new.get(key) for key in set(old) | set(new) if old.get(key) != new.get(key)}
+        return changed
+
+    # --- Writes ---
+    def update(self, changes):
+        """Keys badlo aur file atomically likho (temp file + fsync + rename). Returns changed keys."""
+        with self.lock:
+            new_file = dict(self._file)
+            new_file.update(changes)
+            changed = self._diff(self._file, new_file)
+            if not changed:
+                return {}
+            self._write(new_file)
+            self._file = new_file
+            self._rebuild()
+        log.info(f"[Config] Saved: {changed}")
+        self._notify(changed)
+        return changed
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.config.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        # Apni hi likhi file ko watcher 'badli hui' na samjhe
+        self._mtime = self._stat_mtime()
+
+    # --- Subscribers ---
+    def subscribe(self, callback, keys=None):
+        """callback(changed: {key: new_value}) jab bhi (keys mein se) kuch badle."""
+        with self.lock:
+            self._subscribers.append((callback, set(keys) if keys else None))
+
+    def _notify(self, changed):
+        for callback, keys in list(self._subscribers):
+            relevant = changed if keys is None else {k: v for k, v in changed.items() if k in keys}
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception as e:
+                log.error(f"[Config] Subscriber error: {e}")
+
+    # --- Watcher ---
+    def start_watching(self, interval=DEFAULT_POLL_INTERVAL):
+        """Background thread jo har 'interval' par mtime dekhta hai (hot reload)."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                self.check_reload()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop_watching(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_config_service(path=CONFIG_PATH):
+    """Process-wide shared service (pehli call par banta hai; load() caller karta hai)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ConfigService(path)
+    return _service
+
+def use_config_service(service):
+    """Shared service badlo (replay/testing mein asli config.json ko chhoone se bachne ke liye)."""
+    global _service
+    with _service_lock:
+        _service = service
+    return service
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import time
+    print("--- Config Service Test ---")
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'config.json')
+        with open(path, 'w') as f:
+            json.dump({"JARVIS_NAME": "Jarvis", "USER_NAME": "Sir"}, f)
+        config = ConfigService(path).load()
+        config.setdefault('WHISPER_THREADS', 2)
+        config.subscribe(lambda changed: print(f"Subscriber: {changed}"), keys=['JARVIS_NAME'])
+        config.update({"JARVIS_NAME": "Friday"})
+        print(f"After update: {dict(config)}")
+        with open(path) as f:
+            print(f"On disk: {f.read()}")
+        time.sleep(0.01)
+        with open(path, 'w') as f: # Bahar se edit (jaise nano)
+            json.dump({"JARVIS_NAME": "Edith", "USER_NAME": "Boss"}, f)
+        os.utime(path, None)
+        print(f"Reload changed: {config.check_reload()}")
+        print(f"Now: {config['JARVIS_NAME']} / {config['USER_NAME']} / threads={config['WHISPER_THREADS']}")
+    print("\n--- Test Complete ---")
@@ -0,0 +1,267 @@
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file decide karti hai ki kaunsa kaam kis CPU par aur kitne threads mein chale.
+# Pehle WHISPER_THREADS (cpu/2) aur LLAMA_THREADS (cpu-1) import ke waqt fix ho jaate the, aur
+# llama saare cores par chalta tha -- PortAudio ka callback thread bhookha rehta, mic ring overflow
+# hota aur hotword miss hote (LLM runs ke saath exact match). Ab:
+#   - Ek physical core (big.LITTLE par sabse dheema) audio ke liye alag: capture/playback callback
+#     aur hotword thread wahin, baaki cores par whisper/llama/piper (command taskset/nice se wrap)
+#   - Threads har stage ke liye: load average, physical cores (SMT siblings ek gine) aur MODE se
+#   - Inference processes par nice (hamesha allowed), audio threads par SCHED_FIFO ya negative nice
+#     jahan permission ho (CAP_SYS_NICE / rtprio limit); na ho toh report mein likha milta hai
+
+STAGES = ('stt', 'llm', 'tts')
+REPLAN_S = 5.0 # Itni der purana plan dobara load dekh kar banta hai
+DEFAULT_RT_PRIORITY = 20
+AUDIO_NICE = -10 # SCHED_FIFO na mile toh
+# Child ko exec se pehle cores/nice par daalne ke liye. preexec_fn nahi: woh multithreaded process mein
+# fork ke baad chalta hai (deadlock ho sakta hai), aur spawn ke baad pid par lagana sirf main thread
+# badalta hai -- llama/whisper ke worker threads tab tak ban chuke hote hain
+TASKSET = shutil.which('taskset')
+NICE = shutil.which('nice')
+
+# share: inference cores ka kitna hissa; llm_headroom: streaming mein piper/STT ke liye chhode cores
+# nice: stage -> nice value (sirf badhaya jaata hai, woh bina permission chalta hai)
+MODE_PROFILES = {
+    'low-power': {'share': 0.5, 'llm_headroom': 0, 'nice': {'stt': 5, 'llm': 10, 'tts': 5}},
+    'balanced': {'share': 1.0, 'llm_headroom': 1, 'nice': {'stt': 0, 'llm': 5, 'tts': 0}},
+    'performance': {'share': 1.0, 'llm_headroom': 0, 'nice': {'stt': 0, 'llm': 0, 'tts': 0}},
+}
+MODE_ALIASES = {'high-power': 'performance'} # Purane config.json ka naam
+
+# threads / nice: stage -> value;  cpus: saare allowed logical CPUs
+CpuPlan = namedtuple('CpuPlan', ['mode', 'load', 'cpus', 'physical_cores', 'audio_cpus',
+                                 'inference_cpus', 'threads', 'nice'])
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def allowed_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+def physical_cores(cpus, sysfs='/sys/devices/system/cpu'):
+    """
+    SMT siblings ko ek core mein group karo. Returns [(cpu, ...), ...], sabse dheema core
+    (cpuinfo_max_freq) pehle; sysfs na mile toh har CPU apna core.
+    """
+    groups = {}
+    for cpu in cpus:
+        base = os.path.join(sysfs, f'cpu{cpu}')
+        core = _read_int(os.path.join(base, 'topology', 'core_id'))
+        package = _read_int(os.path.join(base, 'topology', 'physical_package_id')) or 0
+        freq = _read_int(os.path.join(base, 'cpufreq', 'cpuinfo_max_freq')) or 0
+        key = (package, core if core is not None else cpu)
+        cpus_in_core, max_freq = groups.get(key, ((), 0))
+        groups[key] = (cpus_in_core + (cpu,), max(max_freq, freq))
+    # Same speed par last core audio ko (cpu0 par aksar IRQs aate hain)
+    ordered = sorted(groups.values(), key=lambda item: (item[1], -item[0][0]))
+    return [cpus_in_core for cpus_in_core, _freq in ordered]
+
+
+class CpuScheduler:
+    """
+    plan(): is waqt ke load se CpuPlan. spawn_command(stage, cmd): taskset/nice wala command (affinity + nice).
+    protect_thread(): audio threads ko audio core par aur realtime priority par.
+    """
+
+    def __init__(self, mode='balanced', audio_cpus=None, rt_priority=DEFAULT_RT_PRIORITY,
+                 loadavg=os.getloadavg, cpus=None, sysfs='/sys/devices/system/cpu'):
+        self._plan = None
+        self._planned_at = 0.0
+        self.set_mode(mode)
+        self.rt_priority = int(rt_priority)
+        self.loadavg = loadavg
+        self.cpus = cpus or allowed_cpus()
+        self.cores = physical_cores(self.cpus, sysfs=sysfs)
+        if audio_cpus:
+            self.audio_cpus = sorted(set(int(c) for c in audio_cpus) & set(self.cpus))
+        elif len(self.cores) >= 2:
+            self.audio_cpus = list(self.cores[0])
+        else:
+            self.audio_cpus = [] # Ek hi core: alag karne ko kuch nahi, sirf nice/priority
+        inference = [c for c in self.cpus if c not in self.audio_cpus]
+        self.inference_cpus = inference or list(self.cpus)
+        self.inference_cores = [core for core in self.cores if set(core) & set(self.inference_cpus)]
+        self.lock = threading.Lock()
+        self.applied = {} # name -> kya lagaya (report ke liye)
+
+    def set_mode(self, mode):
+        mode = MODE_ALIASES.get(mode, mode)
+        self.mode = mode if mode in MODE_PROFILES else 'balanced'
+        self._plan = None # Agla plan() naye profile se
+
+    def _current_load(self):
+        try:
+            return float(self.loadavg()[0])
+        except (OSError, TypeError, IndexError):
+            return 0.0
+
+    def plan(self, force=False):
+        with self.lock:
+            now = time.monotonic()
+            if self._plan is not None and not force and now - self._planned_at < REPLAN_S:
+                return self._plan
+            profile = MODE_PROFILES[self.mode]
+            load = self._current_load()
+            # Jo cores abhi doosre kaam mein busy hain unpar threads daalna sirf context switches hai
+            free = max(1, len(self.inference_cpus) - int(load))
+            # SMT siblings GEMM mein madad nahi karte: physical cores se zyada threads nahi
+            base = max(1, min(len(self.inference_cores), int(free * profile['share'])))
+            llm = base - profile['llm_headroom'] if base > 2 else base
+            threads = {'stt': base, 'llm': max(1, llm), 'tts': 1}
+            self._plan = CpuPlan(self.mode, round(load, 2), list(self.cpus), len(self.cores),
+                                 list(self.audio_cpus), list(self.inference_cpus), threads,
+                                 dict(profile['nice']))
+            self._planned_at = now
+            return self._plan
+
+    def threads(self, stage):
+        return self.plan().threads.get(stage, 1)
+
+    def spawn_command(self, stage, command):
+        """
+        subprocess.Popen/run ke liye command, 'taskset -c <inference cores>' aur 'nice -n' ke saath.
+        Dono exec karte hain (pid wahi rehta hai), toh child ke saare threads shuru se inhin par.
+        Tool na mile toh woh hissa chhod diya jaata hai.
+        """
+        plan = self.plan()
+        prefix = []
+        if plan.audio_cpus and TASKSET:
+            prefix += [TASKSET, '-c', ','.join(map(str, sorted(plan.inference_cpus)))]
+        nice = plan.nice.get(stage, 0)
+        if nice and NICE:
+            prefix += [NICE, '-n', str(nice)]
+        return prefix + list(command)
+
+    def protect_thread(self, name, tid, realtime=True):
+        """
+        Audio thread (native id) ko audio cores par, aur SCHED_FIFO (realtime=True) ya
+        negative nice. Jo permission na mile woh chhod kar aage; returns kya laga.
+        """
+        applied = []
+        if self.audio_cpus:
+            try:
+                os.sched_setaffinity(tid, self.audio_cpus)
+                applied.append(f"cpus {','.join(map(str, self.audio_cpus))}")
+            except OSError as e:
+                applied.append(f"affinity denied ({e.strerror})")
+        priority = None
+        if realtime and hasattr(os, 'SCHED_FIFO'):
+            try:
+                os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(self.rt_priority))
+                priority = f"SCHED_FIFO {self.rt_priority}"
+            except OSError:
+                pass
+        if priority is None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, AUDIO_NICE)
+                priority = f"nice {AUDIO_NICE}"
+            except OSError:
+                priority = "default priority (no CAP_SYS_NICE/rtprio)"
+        applied.append(priority)
+        self.applied[name] = ", ".join(applied)
+        log.info(f"[CPU] {name} thread {tid}: {self.applied[name]}")
+        return self.applied[name]
+
+    def protect_when_ready(self, name, get_tid, realtime=True, timeout=2.0):
+        """Callback thread PortAudio banata hai; uski id pehle callback ke baad hi milti hai."""
+        def run():
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                tid = get_tid()
+                if tid is not None:
+                    self.protect_thread(name, tid, realtime=realtime)
+                    return
+                time.sleep(0.02)
+            log.debug(f"[CPU] {name} thread id nahi mila (stream chalu nahi hua?).")
+
+        threading.Thread(target=run, name=f"jarvis-cpu-{name}", daemon=True).start()
+
+    def report(self):
+        plan = self.plan()
+        lines = [
+            f"--- CPU plan (MODE={plan.mode}, load {plan.load}) ---",
+            f"CPUs {plan.cpus}, physical cores {plan.physical_cores}",
+            f"Audio cores: {plan.audio_cpus or 'shared (ek hi core)'}  Inference cores: {plan.inference_cpus}",
+        ]
+        for stage in STAGES:
+            lines.append(f"  {stage:<4} threads {plan.threads[stage]:<3} nice {plan.nice[stage]}")
+        for name, applied in sorted(self.applied.items()):
+            lines.append(f"  {name} thread: {applied}")
+        return "\n".join(lines)
+
+
+_scheduler = None
+
+def get_scheduler():
+    return _scheduler
+
+def create_cpu_scheduler(config):
+    """config['CPU_SCHEDULER'] (default True), MODE, AUDIO_CPUS, AUDIO_RT_PRIORITY. Process-wide."""
+    global _scheduler
+    if not config.get('CPU_SCHEDULER', True):
+        _scheduler = None
+        return None
+    _scheduler = CpuScheduler(
+        mode=config.get('MODE', 'balanced'),
+        audio_cpus=config.get('AUDIO_CPUS'),
+        rt_priority=config.get('AUDIO_RT_PRIORITY', DEFAULT_RT_PRIORITY)
+    )
+    return _scheduler
+
+def stage_threads(stage, configured=None):
+    """config mein number diya ho toh wahi; warna ('auto'/None) scheduler abhi ke load se."""
+    if configured not in (None, '', 'auto'):
+        return int(configured)
+    if _scheduler is not None:
+        return _scheduler.threads(stage)
+    cpus = os.cpu_count() or 1
+    return max(1, cpus // 2) if stage == 'stt' else max(1, cpus - 1) if stage == 'llm' else 1
+
+def spawn_command(stage, command):
+    return _scheduler.spawn_command(stage, command) if _scheduler is not None else command
+
+def protect_audio_thread(name, get_tid, realtime=True):
+    if _scheduler is not None:
+        _scheduler.protect_when_ready(name, get_tid, realtime=realtime)
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import subprocess
+    print("--- CPU Scheduler Test ---")
+
+    # 1. Is machine ka plan
+    scheduler = CpuScheduler(mode='balanced')
+    print(scheduler.report())
+
+    # 2. Fake 8-core big.LITTLE-jaisa topology, alag-alag load aur MODE
+    for mode in MODE_PROFILES:
+        for load in (0.2, 3.5):
+            fake = CpuScheduler(mode=mode, cpus=list(range(8)), loadavg=lambda load=load: (load, 0, 0),
+                                sysfs='/nonexistent')
+            plan = fake.plan()
+            print(f"{mode:<12} load {load}: audio {plan.audio_cpus} threads {plan.threads}")
+
+    # 3. Child process sach mein inference cores aur nice par?
+    child = ['python3', '-c', 'import os; print(sorted(os.sched_getaffinity(0)), os.nice(0))']
+    print(f"llm command: {scheduler.spawn_command('llm', child)}")
+    out = subprocess.run(scheduler.spawn_command('llm', child), capture_output=True, text=True).stdout.strip()
+    print(f"llm child: {out}")
+    print(f"Audio thread: {scheduler.protect_thread('test', threading.get_native_id())}")
+    print("\n--- Test Complete ---")
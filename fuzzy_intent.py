@@ -0,0 +1,184 @@
+import re
+import threading
+from collections import namedtuple
+
+from command_router import tokenize
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file exact router ke miss hone par STT ki galtiyon ko bardasht karti hai.
+# whisper tiny "tareekh" ko "tarik" ya "kitni ram" ko "kitni rum" sun leta hai; pehle aisa
+# text seedha LLM par jaata tha (kai second CPU, aur jawab bhi kamzor).
+# Startup par INTENT_MAP ke har keyword ka Hinglish phonetic form banta hai aur uske
+# character trigrams ka inverted index; utterance ke word windows ko Dice similarity se score
+# karke threshold se upar wala best whitelist intent milta hai.
+
+DEFAULT_THRESHOLD = 0.75
+# Consonant skeleton exact mila (vowels galat sune gaye) toh yeh trigram score ka aadha bonus hai,
+# fixed score nahi: "desk"/"disco" ka skeleton bhi "dsk" hai, par trigrams bahut alag hain
+SKELETON_WEIGHT = 0.5
+MIN_SKELETON_CHARS = 4 # "dsk"/"rm" jaise chhote skeleton par bharosa nahi (desk/disco/disk, rum/room/ram)
+
+# Hinglish romanization ke common variants ek jaise kar do (order matters)
+PHONETIC_RULES = [
+    (re.compile(r'c(?!h)'), 'k'), # disc->disk (ch alag rehta hai)
+    (re.compile(r'([kgcjtdpb])h'), r'\1'), # kh->k, bh->b, th->t ... (aspiration)
+    (re.compile(r'sh'), 's'),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'q'), 'k'),
+    (re.compile(r'z'), 'j'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'(ee|ii|ey|y\b)'), 'i'),
+    (re.compile(r'(oo|uu|ou)'), 'u'),
+    (re.compile(r'aa'), 'a'),
+    (re.compile(r'(.)\1+'), r'\1'), # Double letters ek
+]
+VOWELS_RE = re.compile(r'(?<=\w)[aeiou]') # Pehla letter chhod kar saare vowels
+
+FuzzyMatch = namedtuple('FuzzyMatch', ['intent', 'keyword', 'heard', 'score'])
+
+
+def phonetic(text):
+    """Hinglish word(s) ka normalized roop: 'tareekh' -> 'tarik', 'kitni ram' -> 'kitni ram'."""
+    words = []
+    for word, _, _ in tokenize(text):
+        for pattern, repl in PHONETIC_RULES:
+            word = pattern.sub(repl, word)
+        words.append(word)
+    return " ".join(words)
+
+def skeleton(phonetic_text):
+    """Consonant skeleton: 'kitni ram' -> 'ktnrm' (vowel ki galti ab farak nahi padti)."""
+    return "".join(VOWELS_RE.sub('', w) for w in phonetic_text.split())
+
+def trigrams(phonetic_text):
+    padded = f"#{phonetic_text.replace(' ', '#')}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIntentIndex:
+    """
+    INTENT_MAP se bana fuzzy index. match() utterance ke har word window (keyword jitne words)
+    ko inverted trigram index se score karta hai -- saare keywords par loop nahi.
+    """
+
+    def __init__(self, intent_map, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.keywords = [] # (intent, keyword, n_words, trigram_count, raw keyword words)
+        self.postings = {} # (n_words, trigram) -> [keyword ids]
+        self.skeletons = {} # (n_words, skeleton) -> [keyword ids]
+        self.max_words = 0
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "matches": 0, "saved_llm_calls": 0}
+        for intent, keywords in intent_map.items():
+            for keyword in keywords:
+                form = phonetic(keyword)
+                if not form:
+                    continue
+                n_words = len(form.split())
+                grams = trigrams(form)
+                kid = len(self.keywords)
+                self.keywords.append((intent, keyword, n_words, len(grams),
+                                      tuple(w for w, _, _ in tokenize(keyword))))
+                for gram in grams:
+                    self.postings.setdefault((n_words, gram), []).append(kid)
+                skel = skeleton(form)
+                if len(skel) >= MIN_SKELETON_CHARS:
+                    self.skeletons.setdefault((n_words, skel), []).append(kid)
+                self.max_words = max(self.max_words, n_words)
+
+    def _score_window(self, words, raw_words, best):
+        n = len(words)
+        form = " ".join(words)
+        grams = trigrams(form)
+        overlap = {}
+        for gram in grams:
+            for kid in self.postings.get((n, gram), ()):
+                overlap[kid] = overlap.get(kid, 0) + 1
+        scores = {kid: 2.0 * common / (len(grams) + self.keywords[kid][3]) for kid, common in overlap.items()}
+        for kid in self.skeletons.get((n, skeleton(form)), ()):
+            dice = scores.get(kid, 0.0)
+            scores[kid] = SKELETON_WEIGHT + (1.0 - SKELETON_WEIGHT) * dice
+        for kid, score in scores.items():
+            if self.keywords[kid][4] == raw_words:
+                # Bilkul wahi keyword bola gaya: woh exact router ka faisla hai, fuzzy sirf galat
+                # sune gaye roop bachata hai ("storage ka matlab" ko dobara check_disk nahi)
+                continue
+            intent = self.keywords[kid][0]
+            # Barabar score par lamba keyword (zyada specific) jeet-ta hai
+            rank = (score, self.keywords[kid][2])
+            if intent not in best or rank > best[intent][0]:
+                best[intent] = (rank, kid, form)
+
+    def match(self, text):
+        """Threshold se upar ke intents, best pehle (list of FuzzyMatch)."""
+        words = phonetic(text).split()
+        raw_words = [w for w, _, _ in tokenize(text)] # phonetic() har word ka ek hi roop banata hai
+        best = {}
+        for n in range(1, self.max_words + 1):
+            for i in range(len(words) - n + 1):
+                self._score_window(words[i:i + n], tuple(raw_words[i:i + n]), best)
+        results = [
+            FuzzyMatch(intent, self.keywords[kid][1], heard, round(rank[0], 3))
+            for intent, (rank, kid, heard) in best.items() if rank[0] >= self.threshold
+        ]
+        results.sort(key=lambda m: m.score, reverse=True)
+        with self.lock:
+            self.stats["lookups"] += 1
+            if results:
+                self.stats["matches"] += 1
+        return results
+
+    def best(self, text):
+        results = self.match(text)
+        return results[0] if results else None
+
+    def record_saved_llm_call(self):
+        """Fuzzy match ne utterance ko LLM par jaane se bachaya."""
+        with self.lock:
+            self.stats["saved_llm_calls"] += 1
+            return self.stats["saved_llm_calls"]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_fuzzy_index(threshold=None):
+    """INTENT_MAP ka default index, ek hi baar banta hai. threshold diya ho toh update."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            from intent_parser import INTENT_MAP
+            _index = FuzzyIntentIndex(INTENT_MAP)
+            log.info(f"[Fuzzy] {len(_index.keywords)} keywords indexed.")
+        if threshold is not None:
+            _index.threshold = float(threshold)
+    return _index
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import time
+    print("--- Fuzzy Intent Test ---")
+    index = get_fuzzy_index()
+    for text in [
+        "jarvis aaj ki tarikh kya hai",
+        "kitni rum hai",
+        "sistem apdate kardo",
+        "disc kitna bhara hai",
+        "rum peena hai", # 'ram' ka skeleton bahut chhota: match nahi hona chahiye
+        "aaj mausam kaisa hai",
+        # Neeche sab None aane chahiye (pehle skeleton ya exact keyword se galat intent milta tha)
+        "desk kahan hai",
+        "disco chalao",
+        "storage ka matlab",
+        "memory lane song",
+        "kya chal rahi hai zindagi",
+    ]:
+        print(f"{text!r} -> {index.best(text)}")
+    start = time.perf_counter()
+    for _ in range(1000):
+        index.best("jarvis please aaj ki tarikh batao mujhe jaldi se")
+    print(f"Avg lookup: {(time.perf_counter() - start):.3f} ms")
+    print(f"Stats: {index.stats}")
+    print("\n--- Test Complete ---")
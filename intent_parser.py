@@ -1,4 +1,7 @@
-import re # Humne Regular Expressions ko import kiya
+from command_router import KIND_INTENT, get_router
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
 
 # Yeh file STT ke text (Hinglish) ko hamare whitelist commands se map karega
 
@@ -20,31 +23,50 @@ INTENT_MAP = {
     ],
     "reboot_system": [
         "reboot", "restart", "band karke chalu"
+    ],
+    # Background jobs (safe_runner.JobManager) ke liye, whitelist.yml mein nahi.
+    # Sirf job/update wale phrases: akela "cancel" ya "kya chal raha hai" roz ki baaton mein aata hai
+    "cancel_jobs": [
+        "job cancel", "job cancel karo", "jobs cancel karo", "update cancel", "update cancel karo",
+        "update rok do"
+    ],
+    "job_status": [
+        "job status", "background job status", "jobs ka status", "update ka status"
     ]
 }
 
+# confirm_prompt wale commands (update/reboot) ke jawab ke liye
+CONFIRM_YES = ["haan", "haa", "han", "ha", "ji", "ji haan", "yes", "yeah", "ok", "okay", "theek hai",
+               "kar do", "kardo", "karo", "shuru karo", "sure"]
+CONFIRM_NO = ["nahi", "nahin", "no", "mat", "mat karo", "ruko", "cancel", "rehne do", "abhi nahi"]
+
+def parse_confirmation(text):
+    """
+    Haan/nahi jawab: True, False, ya None (samajh nahi aaya). Dono mile ("haan... nahi ruko")
+    toh nahi jeet-ta -- shak mein command nahi chalna chahiye.
+    """
+    if not text:
+        return None
+    padded = " " + " ".join("".join(c if c.isalnum() else " " for c in text.lower()).split()) + " "
+    if any(f" {phrase} " in padded for phrase in CONFIRM_NO):
+        return False
+    if any(f" {phrase} " in padded for phrase in CONFIRM_YES):
+        return True
+    return None
+
 def parse_intent(text):
     """
     User ke bolay gaye text ko parse karke intent (command name) nikalta hai.
+    Saare keywords command_router ke compiled trie mein hain: ek pass, word boundary ke saath,
+    aur sabse specific (lamba) keyword wala intent jeet-ta hai -- pehla match nahi.
     """
-    text_lower = text.lower() # Sab kuch lowercase mein check karenge
-
-    for intent_name, keywords in INTENT_MAP.items():
-        for keyword in keywords:
-
-            # --- YEH HAI NAYA LOGIC ---
-            # Hum check kar rahe hain ki keyword ek poora shabd hai ya nahi
-            # \b ka matlab hai 'word boundary' (space, comma, ya line ka end)
-            # re.escape() keyword ko safe banata hai (agar usme special char ho)
-            if re.search(r"\b" + re.escape(keyword) + r"\b", text_lower):
-            # ---------------------------
-
-                # Jaise hi pehla match milta hai, hum command ka naam return kar denge
-                print(f"[Intent Parser] Match mila: '{keyword}' -> {intent_name}")
-                return intent_name
+    match = get_router().route(text, kind=KIND_INTENT)
+    if match:
+        log.info(f"[Intent Parser] Match mila: '{match.phrase}' -> {match.name}")
+        return match.name
 
     # Agar koi bhi keyword match nahi hua
-    print("[Intent Parser] Koi bhi command match nahi hua.")
+    log.info("[Intent Parser] Koi bhi command match nahi hua.")
     return None
 
 # --- Test Karne Ke Liye ---
@@ -63,4 +85,14 @@ if __name__ == "__main__":
     test4 = "mausam kaisa hai" # Yeh hamare map mein nahi hai
     print(f"\nText: '{test4}' -> Intent: {parse_intent(test4)}")
 
+    # Roz ki baatein jo job commands nahi hain (None aana chahiye)
+    for text in ("meeting cancel ho gayi kya", "aur bhai kya chal raha hai"):
+        print(f"\nText: '{text}' -> Intent: {parse_intent(text)}")
+
+    test5 = "update cancel karo"
+    print(f"\nText: '{test5}' -> Intent: {parse_intent(test5)}")
+
+    for answer in ("Haan, kar do.", "nahi abhi mat karo", "haan... nahi ruko", "mausam kaisa hai", None):
+        print(f"\nConfirm: {answer!r} -> {parse_confirmation(answer)}")
+
     print("\n--- Test Complete ---")
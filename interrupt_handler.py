@@ -1,126 +1,189 @@
-import sounddevice as sd
 import webrtcvad
 import numpy as np
 import time
 import threading
-from tts import speak # Hum apne 'tts.py' script ko import kar rahe hain
-import subprocess
-# --- VAD Setup ---
-vad = webrtcvad.Vad()
-vad.set_mode(3) # Mode 3 sabse aggressive hai (turant speech pakadta hai)
-SAMPLE_RATE = 16000 # VAD ke liye 16kHz zaroori hai
-FRAME_DURATION_MS = 30  # 30ms VAD ke liye zaroori hai
-FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION_MS / 1000)
-
-# --- Global Flags (Jo threads ke beech baat karengi) ---
+from collections import namedtuple
 
-# Yeh Event batata hai ki TTS bolna band kare
-stop_tts_event = threading.Event()
+from audio_player import SILENCE_DB, get_player, level_db
+from jarvis_log import get_logger
 
-# Yeh Event batata hai ki user ne interrupt kar diya hai
-user_interrupted_event = threading.Event()
+log = get_logger(__name__)
 
-# --- Functions ---
+# Yeh file barge-in sambhalti hai: Jarvis bol raha ho aur user beech mein bole toh turant chup.
+# Pehle yahan ek thread 100 ms par poll karta tha aur 'killall aplay' chalata tha -- system ke saare
+# aplay band, der se reaction, aur mic mein aa rahi Jarvis ki apni awaaz bhi 'user' lagti thi.
+# Ab TTS audio_player ke persistent output stream se bajta hai (stop ek block mein), aur VAD
+# playback energy se gated hai: jab speaker baj raha ho, mic ka level apni awaaz ki echo se kaafi
+# upar hona chahiye tabhi speech maani jaati hai.
 
-def play_tts_interruptible(text_to_speak):
-    """TTS ko ek alag thread mein play karta hai, taaki hum ise rok sakein."""
-
-    print(f"TTS Thread: Bolna shuru kar raha hoon... '{text_to_speak}'")
-
-    # NOTE: Humara 'tts.py' script (jo file banakar 'aplay' karta hai)
-    # poora command ek baar mein chalata hai.
-    # Asli interrupt ke liye, humein audio stream ko Python mein hi
-    # play karna hota.
-
-    # Abhi ke Makkhan Mode ke liye, hum simulate karenge:
-    # Hum 'speak' function ko call karenge,
-    # aur check karenge ki kya VAD ne humein roka.
+# --- VAD Setup ---
+SAMPLE_RATE = 16000 # VAD ke liye 16kHz zaroori hai
+FRAME_DURATION_MS = 30  # 30ms VAD ke liye zaroori hai
+FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION_MS / 1000)
 
-    # Ek naya thread banao jo 'speak' function ko chalayega
-    tts_thread = threading.Thread(target=speak, args=(text_to_speak,))
-    tts_thread.start()
+PLAYBACK_ACTIVE_DB = -50.0 # Isse tez playback ho tabhi gating lagti hai
+DEFAULT_COUPLING_DB = -6.0 # Shuruaati andaza: mic mein echo playback se itna dB (room/volume se seekha jaata hai)
+ECHO_MARGIN_DB = 8.0 # User ki awaaz predicted echo se kam se kam itni tez
+COUPLING_ALPHA = 0.05 # Echo coupling ka EMA
+MIN_SPEECH_FRAMES = 3 # Itne lagataar speech frames (90 ms) = barge-in (ek click se nahi)
+ECHO_WINDOW_S = 0.3 # Speaker -> mic delay + buffering
 
-    # Main thread yahaan wait karega, ya toh tts khatam hone ka,
-    # ya interrupt hone ka.
-    while tts_thread.is_alive():
-        if stop_tts_event.is_set():
-            print("TTS Thread: Interrupt signal mila! TTS rokne ki koshish...")
-            # Asliyat mein, humein yahaan 'aplay' process ko kill karna hoga.
-            # Abhi ke liye, hum bas event set kar rahe hain.
-            # Humara 'tts.py' script 'aplay' ko kill nahi kar sakta.
-            # Yeh ek limitation hai.
+# interrupted: user ne roka?  position_s: utterance ke kitne second par
+InterruptResult = namedtuple('InterruptResult', ['interrupted', 'position_s'])
 
-            # Hum 'kill' command simulate karenge
-            subprocess.run(["killall", "aplay"], capture_output=True, text=True)
-            user_interrupted_event.set() # Main loop ko batao ki interrupt hua
-            break
-        time.sleep(0.1)
 
-    print("TTS Thread: Playback poora hua.")
+class EchoGate:
+    """
+    webrtcvad + playback energy. Playback chal raha ho toh har frame ke liye predicted echo
+    (playback dB + seekha hua coupling) se tulna; jo frames echo jaise lagein unse coupling
+    update hota hai. Playback band ho toh seedha VAD.
+    """
 
-def vad_listener():
+    def __init__(self, player=None, sample_rate=SAMPLE_RATE, vad=None, margin_db=ECHO_MARGIN_DB,
+                 min_frames=MIN_SPEECH_FRAMES):
+        self.player = player
+        self.sample_rate = sample_rate
+        if vad is None:
+            vad = webrtcvad.Vad()
+            vad.set_mode(3) # Mode 3 sabse aggressive hai (turant speech pakadta hai)
+        self.vad = vad
+        self.margin_db = margin_db
+        self.min_frames = min_frames
+        self.coupling_db = DEFAULT_COUPLING_DB
+        self.run = 0
+        self.gated = 0 # Kitne speech frames echo maan kar ignore hue
+
+    def playback_db(self):
+        return self.player.recent_level_db(ECHO_WINDOW_S) if self.player is not None else SILENCE_DB
+
+    def playing(self):
+        """Playback (ya uski echo, ECHO_WINDOW_S tak) abhi gate ho rahi hai?"""
+        return self.playback_db() >= PLAYBACK_ACTIVE_DB
+
+    def is_user_speech(self, frame):
+        """Ek 30 ms float32 frame: user bol raha hai (apni echo nahi)?"""
+        pcm = (np.clip(frame, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        if not self.vad.is_speech(pcm, self.sample_rate):
+            return False
+        play_db = self.playback_db()
+        if play_db < PLAYBACK_ACTIVE_DB:
+            return True
+        mic_db = level_db(frame)
+        predicted = play_db + self.coupling_db
+        if mic_db > predicted + self.margin_db:
+            return True
+        # Echo hi thi: coupling seekho (room/volume ke hisaab se)
+        self.coupling_db += COUPLING_ALPHA * ((mic_db - play_db) - self.coupling_db)
+        self.gated += 1
+        return False
+
+    def update(self, frame):
+        """Debounced: MIN_SPEECH_FRAMES lagataar user speech frames par True."""
+        if self.is_user_speech(frame):
+            self.run += 1
+        else:
+            self.run = 0
+        return self.run >= self.min_frames
+
+    def reset(self):
+        self.run = 0
+
+
+def vad_listener(capture=None, player=None, stop_event=None, on_interrupt=None, until=None):
     """
-    Hamesha mic sunta rehta hai aur speech detect hone par 'stop_tts_event' set karta hai.
+    Playback ke dauraan mic sunta hai; gated speech milte hi playback rokta hai.
+    capture: main ka shared AudioCapture (ring se padho); None ho toh apna InputStream.
+    until: callable; True lautaye toh sunna band (jaise awaaz khatam).
+    Returns playback position (seconds) jahan roka, ya None (koi interrupt nahi).
     """
-    print("VAD Thread: Mic sunna shuru...")
-
-    def callback(indata, frames, time, status):
-        if status:
-            print(status, flush=True)
-        try:
-            # Data ko 16-bit PCM mein convert karo
-            audio_data = (indata * 32767).astype(np.int16).tobytes()
-
-            # VAD ko check karne ke liye correct frame size mein baanto
-            for i in range(0, len(audio_data), FRAME_SIZE * 2): # 2 bytes per sample
-                frame = audio_data[i:i + FRAME_SIZE * 2]
-                if len(frame) == FRAME_SIZE * 2:
-                    if vad.is_speech(frame, SAMPLE_RATE):
-                        print("\n[VAD Detected Speech!] -> STOP TTS!")
-                        stop_tts_event.set() # TTS ko rokne ka signal bhejo
-                        return # Callback se nikal jao
-        except Exception as e:
-            print(f"VAD callback error: {e}")
-
-    # Mic stream shuru karo
-    stream = sd.InputStream(
-        samplerate=SAMPLE_RATE,
-        blocksize=FRAME_SIZE,
-        channels=1,
-        dtype='float32',
-        callback=callback
-    )
-    with stream:
-        # Yeh thread tab tak chalta rahega jab tak 'stop_tts_event' set nahi hota
-        while not stop_tts_event.is_set():
-            time.sleep(0.5)
-
-    print("VAD Thread: Listener band ho gaya.")
+    from tts import stop_playback # Yahan import: tts khud audio_player use karta hai
+    player = player or get_player(create=False)
+    stop_event = stop_event or threading.Event()
+    gate = EchoGate(player)
+
+    def interrupted():
+        position = stop_playback() # Sirf hamari awaaz; queue mein rukti awaazein bhi
+        log.info(f"[Barge-in] User ne {position if position is None else round(position, 2)}s par roka.")
+        if on_interrupt is not None:
+            on_interrupt(position)
+        return position
+
+    if capture is not None:
+        reader = capture.reader()
+        while not stop_event.is_set() and not (until is not None and until()):
+            try:
+                frame = reader.read(FRAME_SIZE, timeout=0.5)
+            except ValueError:
+                reader = capture.reader() # Peeche reh gaye (overrun)
+                continue
+            if frame is not None and gate.update(frame):
+                return interrupted()
+        return None
+
+    import sounddevice as sd
+    result = []
+
+    def callback(indata, frames, time_info, status):
+        if not result and gate.update(indata[:, 0].copy()):
+            result.append(True)
+            stop_event.set()
+
+    with sd.InputStream(samplerate=SAMPLE_RATE, blocksize=FRAME_SIZE, channels=1,
+                        dtype='float32', callback=callback):
+        while not stop_event.is_set() and not (until is not None and until()):
+            time.sleep(0.01)
+    return interrupted() if result else None
+
+
+def play_tts_interruptible(text_to_speak, lang='en_m', capture=None):
+    """Bolo, aur user beech mein bole toh ek audio block ke andar chup. Returns InterruptResult."""
+    from tts import speak # Yahan import: tts khud audio_player use karta hai
+    get_player() # Output stream pehle khul jaaye taaki listener ko player mile
+    stop_event = threading.Event()
+    outcome = {}
+
+    def listen():
+        outcome['position'] = vad_listener(capture=capture, stop_event=stop_event)
+
+    listener = threading.Thread(target=listen, daemon=True)
+    listener.start()
+    try:
+        speak(text_to_speak, lang=lang)
+    finally:
+        stop_event.set()
+        listener.join(timeout=1.0)
+    position = outcome.get('position')
+    return InterruptResult(position is not None, position)
 
 # --- Test Karne Ke Liye ---
 if __name__ == "__main__":
     print("--- Interrupt Handler Test ---")
 
-    # Ek lamba sa text jo 5-10 second tak bolega
-    long_text = "Sir, yeh ek lamba test hai. Main bolta rahunga taaki aap mujhe beech mein interrupt kar sakein. Kripya main jab bol raha hoon, tab kuch bolne ki koshish karein."
+    # 1. Offline: echo gating (fake VAD jo har loud frame ko speech kehta hai)
+    class EnergyVAD:
+        def is_speech(self, pcm, rate):
+            return np.abs(np.frombuffer(pcm, dtype=np.int16)).mean() > 300
 
-    # 1. VAD listener ko ek background thread mein shuru karo
-    stop_tts_event.clear()
-    user_interrupted_event.clear()
+    class FakePlayer:
+        level = -12.0
+        def recent_level_db(self, window_s):
+            return self.level
 
-    listener_thread = threading.Thread(target=vad_listener, daemon=True)
-    listener_thread.start()
+    t = np.arange(FRAME_SIZE) / float(SAMPLE_RATE)
+    echo = (0.1 * np.sin(2 * np.pi * 300 * t)).astype(np.float32) # Speaker ki awaaz mic mein (~ -23 dB)
+    user = (0.6 * np.sin(2 * np.pi * 200 * t)).astype(np.float32) + echo # User tez bola
+    gate = EchoGate(FakePlayer(), vad=EnergyVAD())
+    print(f"Echo frames barge-in: {any(gate.update(echo) for _ in range(20))} (coupling {gate.coupling_db:.1f} dB)")
+    print(f"User frames barge-in: {any(gate.update(user) for _ in range(MIN_SPEECH_FRAMES))}")
 
-    time.sleep(1) # Listener ko setup hone do
-
-    # 2. TTS ko main thread mein play karo
-    play_tts_interruptible(long_text)
-
-    if user_interrupted_event.is_set():
-        print("\nTest Result: SUCCESS! User ne successfully interrupt kiya.")
-    else:
-        print("\nTest Result: TTS poora ho gaya (koi interrupt nahi hua).")
-
-    # Script ko poori tarah band karne ke liye VAD thread ko signal do
-    stop_tts_event.set()
+    # 2. Asli mic + speaker (sounddevice chahiye)
+    long_text = "Sir, yeh ek lamba test hai. Main bolta rahunga taaki aap mujhe beech mein interrupt kar sakein. Kripya main jab bol raha hoon, tab kuch bolne ki koshish karein."
+    try:
+        result = play_tts_interruptible(long_text)
+        if result.interrupted:
+            print(f"\nTest Result: SUCCESS! User ne {result.position_s:.2f}s par interrupt kiya.")
+        else:
+            print("\nTest Result: TTS poora ho gaya (koi interrupt nahi hua).")
+    except Exception as e:
+        print(f"Live test skip: {e}")
     print("Test finished.")
@@ -0,0 +1,240 @@
+import itertools
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Yeh file Jarvis ka logging aur audio telemetry sambhalti hai.
+# Koi bhi thread (PortAudio callback bhi) sirf ek queue/ring mein record daalta hai;
+# asli formatting aur terminal write ek background thread karta hai.
+# Isse callbacks kabhi terminal I/O par block nahi hote (input overflow wali problem).
+
+LOG_QUEUE_SIZE = 10000 # Bhar gayi toh naye records drop (caller kabhi wait nahi karta)
+RATE_BURST = 5 # Ek hi message ek second mein itni baar tak
+RATE_WINDOW_S = 1.0
+LOG_FORMAT = "%(asctime)s.%(msecs)03d %(levelname)-7s %(name)s | %(message)s"
+LOG_DATEFMT = "%H:%M:%S"
+
+# Telemetry record sources
+SRC_CAPTURE = 0 # Mic capture callback (har block ka level)
+SRC_VAD = 1 # VAD decision (flag = is_speech)
+SRC_XRUN = 2 # PortAudio status (overflow/underflow)
+
+TELEMETRY_CAPACITY = 8192 # ~80s of 10 ms blocks
+TELEMETRY_INTERVAL_S = 10.0
+LEVEL_BINS_DB = np.arange(-90, 1, 10, dtype=np.float32) # Histogram bins (dBFS)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Same log call site (logger, level, file, line) ko RATE_WINDOW_S mein RATE_BURST se zyada baar
+    nahi jaane deta. Key message par nahi hai: f-string wale messages har baar alag hote hain
+    (level/number badalta hai), toh woh kabhi dabte hi nahi the aur state bhi bedhadak badhti thi.
+    Dabaaye gaye messages ki ginti agle allowed message ke saath bata di jaati hai.
+    """
+
+    def __init__(self, burst=RATE_BURST, window=RATE_WINDOW_S):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.lock = threading.Lock()
+        self.state = {} # key -> [window_start, count, suppressed]
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.state.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                self.state[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+                return True
+            if entry[1] < self.burst:
+                entry[1] += 1
+                return True
+            entry[2] += 1
+            return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler jo queue full hone par wait nahi karta, record drop karke ginti rakhta hai."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_log_queue = queue.Queue(LOG_QUEUE_SIZE)
+_queue_handler = None
+_listener = None
+_setup_lock = threading.Lock()
+
+def setup_logging(level="INFO", stream=None):
+    """
+    Root 'jarvis' logger ko queue par wire karta hai (idempotent).
+    Dobara call karne par sirf level badalta hai.
+    """
+    global _queue_handler, _listener
+    root = logging.getLogger("jarvis")
+    with _setup_lock:
+        root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+        if _listener is not None:
+            return root
+        _queue_handler = DroppingQueueHandler(_log_queue)
+        _queue_handler.addFilter(RateLimitFilter())
+        root.addHandler(_queue_handler)
+        root.propagate = False
+        out = logging.StreamHandler(stream or sys.stdout)
+        out.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATEFMT))
+        _listener = logging.handlers.QueueListener(_log_queue, out, respect_handler_level=False)
+        _listener.start()
+    return root
+
+def get_logger(name):
+    """Module logger: get_logger(__name__). Pehli call par logging setup ho jaata hai."""
+    if _listener is None:
+        setup_logging()
+    return logging.getLogger("jarvis." + name.rsplit('.', 1)[-1])
+
+def shutdown_logging():
+    """Queue mein bache records flush karke listener band."""
+    global _listener
+    telemetry.stop()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        logging.getLogger("jarvis").removeHandler(_queue_handler)
+
+
+class AudioTelemetry:
+    """
+    Real-time threads ke liye fixed-size records ka preallocated ring.
+    record() sirf ek slot bharta hai (no allocation, no lock, no I/O).
+    Background thread har interval par level histogram, VAD counts aur xruns ka
+    ek summary line log karta hai.
+    """
+
+    RECORD_DTYPE = np.dtype([('src', 'u1'), ('flag', 'i1'), ('peak', 'f4'), ('mean_sq', 'f4')])
+
+    def __init__(self, capacity=TELEMETRY_CAPACITY):
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=self.RECORD_DTYPE)
+        self._counter = itertools.count() # next() GIL ke neeche atomic hai
+        self.written = 0
+        self.read_pos = 0
+        self.totals = {"blocks": 0, "speech": 0, "non_speech": 0, "xruns": 0, "dropped": 0}
+        self._stop = threading.Event()
+        self._thread = None
+        self.log = None
+
+    def record(self, src, peak=0.0, mean_sq=0.0, flag=0):
+        i = next(self._counter)
+        slot = self.records[i % self.capacity]
+        slot['src'] = src
+        slot['flag'] = flag
+        slot['peak'] = peak
+        slot['mean_sq'] = mean_sq
+        self.written = i + 1
+
+    def level(self, block):
+        """Audio block ka peak/power float32 mein (float64 copy nahi)."""
+        n = block.size
+        if n == 0:
+            return
+        self.record(SRC_CAPTURE, float(np.max(np.abs(block))), float(np.dot(block, block)) / n)
+
+    def vad(self, is_speech):
+        self.record(SRC_VAD, flag=1 if is_speech else 0)
+
+    def xrun(self):
+        self.record(SRC_XRUN)
+
+    def aggregate(self):
+        """Naye records ka summary dict (aur totals update)."""
+        end = self.written
+        start = self.read_pos
+        dropped = 0
+        if end - start > self.capacity:
+            dropped = end - start - self.capacity
+            start = end - self.capacity
+        self.read_pos = end
+        idx = np.arange(start, end) % self.capacity
+        recs = self.records[idx]
+
+        levels = recs[recs['src'] == SRC_CAPTURE]
+        vad = recs[recs['src'] == SRC_VAD]
+        rms_db = np.clip(10.0 * np.log10(levels['mean_sq'] + 1e-12), -90.0, 0.0)
+        hist, _ = np.histogram(rms_db, bins=np.append(LEVEL_BINS_DB, np.float32(10.0)))
+        summary = {
+            "blocks": int(levels.size),
+            "peak_max": float(levels['peak'].max()) if levels.size else 0.0,
+            "rms_db_median": float(np.median(rms_db)) if levels.size else float('-inf'),
+            "level_hist": hist.tolist(),
+            "speech": int(np.count_nonzero(vad['flag'] == 1)),
+            "non_speech": int(np.count_nonzero(vad['flag'] == 0)),
+            "xruns": int(np.count_nonzero(recs['src'] == SRC_XRUN)),
+            "dropped": dropped,
+        }
+        for key in self.totals:
+            self.totals[key] += summary[key]
+        return summary
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            s = self.aggregate()
+            if not s["blocks"] and not s["speech"] and not s["non_speech"]:
+                continue
+            self.log.info(
+                f"[Telemetry] blocks={s['blocks']} peak_max={s['peak_max'] * 32767:.0f} "
+                f"rms_db_median={s['rms_db_median']:.1f} hist(-90..0dB)={s['level_hist']} "
+                f"vad speech/non={s['speech']}/{s['non_speech']} xruns={s['xruns']} dropped={s['dropped']}"
+            )
+            if s['xruns']:
+                self.log.warning(f"[Telemetry] {s['xruns']} audio overflows in last {interval:.0f}s")
+
+    def start(self, interval=TELEMETRY_INTERVAL_S):
+        if self._thread is not None:
+            return
+        self.log = get_logger("telemetry")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+
+telemetry = AudioTelemetry()
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    log = get_logger("jarvis_log_test")
+    log.info("--- Logger Test ---")
+    def noisy(i):
+        log.info(f"Repeated message {i}") # Text har baar alag, call site ek
+    for i in range(20):
+        noisy(i) # Sirf RATE_BURST dikhne chahiye
+    time.sleep(1.1)
+    noisy(20) # "(15 similar suppressed)"
+    block = np.full(160, 0.1, dtype=np.float32)
+    for i in range(100):
+        telemetry.level(block)
+        telemetry.vad(i % 3 == 0)
+    telemetry.xrun()
+    print(telemetry.aggregate())
+    shutdown_logging()
@@ -1,57 +1,55 @@
-import json
-import re
-import os
+from command_router import KIND_RENAME, get_router
+from config_service import get_config_service
+from jarvis_log import get_logger
 
-CONFIG_FILE = 'config.json'
+log = get_logger(__name__)
 
-# config.json ka poora path
-CONFIG_PATH = os.path.join(os.path.expanduser('~/jarvis'), CONFIG_FILE)
+# Rename commands: (config key, verbs, owners, response).
+# Har verb/owner jodi se "<verb> <owner> name to <naya naam>" phrase banta hai,
+# jaise "change your name to Friday" ya "badlo mera name to Boss".
+RENAME_PATTERNS = [
+    ('JARVIS_NAME', ('change', 'badlo', 'set'), ('your', 'tumhara'), "Theek hai, abse mera naam {name} hai."),
+    ('USER_NAME', ('change', 'badlo', 'set'), ('my', 'mera'), "Noted, abse main aapko {name} kahunga."),
+]
 
 def load_config():
-    if not os.path.exists(CONFIG_PATH):
-        print(f"Error: {CONFIG_PATH} nahi mila!")
-        return {}
-    with open(CONFIG_PATH, 'r') as f:
-        return json.load(f)
+    """Shared config service (pehli baar zaroorat par file load). File na ho toh None."""
+    service = get_config_service()
+    if not service.loaded:
+        try:
+            service.load()
+        except FileNotFoundError:
+            log.error(f"Error: {service.path} nahi mila!")
+            return None
+    return service
 
 def save_config(data):
-    with open(CONFIG_PATH, 'w') as f:
-        json.dump(data, f, indent=2)
-    print(f"Config saved: {data}")
+    """Badli hui keys atomically likho; subscribers (main waghera) ko turant pata chal jaata hai."""
+    service = load_config()
+    if service is not None:
+        service.update(data)
+
+def apply_rename(config_key, new_name):
+    """Router ne rename pakda: config update karke bolne wala response deta hai."""
+    for key, _verbs, _owners, response in RENAME_PATTERNS:
+        if key == config_key:
+            break
+    else:
+        return None
+    if load_config() is None:
+        return None
+    save_config({config_key: new_name})
+    return response.format(name=new_name) # Yeh response hum TTS se bulwayenge
 
 def handle_rename_command(stt_text):
     """
     STT (voice-to-text) ke text ko parse karke naam badalta hai.
+    Patterns command_router ke trie mein compiled hain; config sirf match hone par padhi jaati hai.
     """
-    config = load_config()
-    if not config:
-        return None
-
-    new_name = None
-    response = None
-    stt_text = stt_text.lower() # Sab lowercase mein check karo
-
-    # Pattern 1: Change Jarvis's name
-    # "change your name to Friday" | "tumhara naam badal kar Friday kar do"
-    match_jarvis = re.search(r'(change|badlo|set) (your|tumhara) name to (.*)', stt_text)
-    if match_jarvis:
-        new_name = match_jarvis.group(3).strip()
-        config['JARVIS_NAME'] = new_name
-        response = f"Theek hai, abse mera naam {new_name} hai."
-
-    # Pattern 2: Change User's name
-    # "change my name to Boss" | "mera naam badal kar Boss kar do"
-    match_user = re.search(r'(change|badlo|set) (my|mera) name to (.*)', stt_text)
-    if match_user:
-        new_name = match_user.group(3).strip()
-        config['USER_NAME'] = new_name
-        response = f"Noted, abse main aapko {new_name} kahunga."
-
-    if response:
-        save_config(config)
-        return response # Yeh response hum TTS se bulwayenge
-    else:
+    match = get_router().route(stt_text, kind=KIND_RENAME)
+    if match is None:
         return None # Matlab yeh rename command nahi tha
+    return apply_rename(match.name, match.argument.lower())
 
 # --- Test Karne Ke Liye ---
 if __name__ == "__main__":
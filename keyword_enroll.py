@@ -0,0 +1,71 @@
+import sounddevice as sd
+import numpy as np
+import argparse
+import wave
+import time
+import json
+import os
+
+from intent_parser import INTENT_MAP
+from keyword_spotter import open_keyword_spotter, KeywordSpotter, KEYWORD_DIR, SAMPLE_RATE
+
+def load_config():
+    with open('config.json', 'r') as f:
+        return json.load(f)
+
+config = load_config()
+
+def read_wav(path):
+    """16kHz mono 16-bit WAV -> float32 (jo audio_capture deta hai)."""
+    with wave.open(path, 'rb') as wf:
+        if wf.getframerate() != SAMPLE_RATE or wf.getnchannels() != 1:
+            raise ValueError(f"{path}: 16kHz mono WAV chahiye.")
+        frames = wf.readframes(wf.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+# Har intent ke liye --takes baar wahi command bolein (jaise "kitni ram hai"); kam se kam 2 samples
+# ke baad hi woh intent Whisper ke bina pehchana jaata hai (threshold un samples ke aapas ke farak se)
+parser = argparse.ArgumentParser(description="Command enroll karo (Whisper ke bina keyword spotting)")
+parser.add_argument('--intent', required=True, help=f"Kaunsa intent ({', '.join(INTENT_MAP)})")
+parser.add_argument('--takes', type=int, default=3, help="Kitne 2 second ke takes record karne hain")
+parser.add_argument('--wav', nargs='*', default=None, help="Mic ki jagah yeh WAV files (16kHz mono)")
+args = parser.parse_args()
+
+if args.intent not in INTENT_MAP:
+    parser.error(f"'{args.intent}' koi jaana-pehchana intent nahi hai.")
+
+# KWS_ENABLED false ho tab bhi enroll ho sakta hai (pehle samples, phir config mein on)
+spotter = open_keyword_spotter(dict(config, KWS_ENABLED=True)) or \
+    KeywordSpotter(os.path.expanduser(config.get('KWS_DIR', KEYWORD_DIR)))
+
+try:
+    if args.wav:
+        for path in args.wav:
+            samples = spotter.enroll(args.intent, read_wav(path))
+            print(f"{path}: {args.intent} ke ab {samples} samples.")
+    else:
+        print(f"\n'{args.intent}' ke liye command {args.takes} baar bolein (jaise aap Jarvis ko bolte hain).")
+        print(f"Example: '{INTENT_MAP[args.intent][-1]}'")
+
+        duration = 2
+        for take in range(1, args.takes + 1):
+            print(f"\nTake {take}/{args.takes}: 3...")
+            time.sleep(1)
+            print("2...")
+            time.sleep(1)
+            print("1...")
+            time.sleep(1)
+            print("Boliye...")
+
+            audio = sd.rec(int(duration * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1, dtype='float32')
+            sd.wait()
+
+            samples = spotter.enroll(args.intent, audio.flatten())
+            print(f"Saved: {args.intent} ke ab {samples} samples.")
+
+    threshold = spotter.intents[args.intent]['threshold']
+    print(f"\nSuccess! Templates {spotter.directory} mein (threshold: {threshold}).")
+    print("config.json mein 'KWS_ENABLED': true karein.")
+
+except Exception as e:
+    print(f"Ek error hua: {e}")
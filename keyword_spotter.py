@@ -0,0 +1,275 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file sabse zyada bole jaane wale commands ke liye Whisper ko bypass karti hai.
+# "kitni ram hai", "aaj ki tareekh" jaise chhote fixed commands bhi poore whisper.cpp decode aur phir
+# regex routing se guzarte the. Ab user har intent ke kuch samples bolkar enroll karta hai
+# (keyword_enroll.py); command audio ke MFCC (NumPy, vectorized) har template se subsequence DTW
+# par milaaye jaate hain. Match pakka ho (apne intent ke threshold ke andar aur doosre intent se
+# saaf door) toh STT skip -- decision kuch milliseconds mein. Shak ho toh normal Whisper path.
+#
+# Storage speaker_store jaisa: har sample ek .npy (MFCC frames), index.json atomic replace se.
+
+KEYWORD_DIR = os.path.join(os.path.expanduser('~/jarvis'), 'keywords')
+INDEX_FILE = 'index.json'
+
+SAMPLE_RATE = 16000
+FRAME_MS = 25
+HOP_MS = 10
+N_FFT = 512
+N_MELS = 26
+N_MFCC = 13
+PRE_EMPHASIS = 0.97
+TRIM_DB = 35.0 # Sabse tez frame se itna neeche wale frames shuru/aakhir se kaat do
+FLOOR_DB = 30.0 # Isse neeche sab ek barabar: digital silence aur mic ka halka shor ek jaise dikhein
+MIN_SAMPLES = 2 # Isse kam samples wala intent match nahi hota (threshold seekh nahi sakte)
+THRESHOLD_SLACK = 1.5 # Leave-one-out distances ke upar itni chhoot
+DEFAULT_MIN_MARGIN = 0.15 # Best intent doosre best se kam se kam itna (relative) behtar
+DEFAULT_MAX_SECONDS = 4.0 # Isse lamba command fixed keyword nahi hai: seedha Whisper
+
+# intent: match (ya None);  distance: best normalized DTW distance;  threshold: us intent ka
+# margin: (second - best) / second;  elapsed_ms: features + DTW
+Spot = namedtuple('Spot', ['intent', 'distance', 'threshold', 'margin', 'accepted', 'elapsed_ms'])
+
+_mel_cache = {}
+
+
+def _mel_filterbank(sample_rate, n_fft=N_FFT, n_mels=N_MELS):
+    key = (sample_rate, n_fft, n_mels)
+    if key not in _mel_cache:
+        def hz_to_mel(hz):
+            return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+        def mel_to_hz(mel):
+            return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+        mels = np.linspace(hz_to_mel(20.0), hz_to_mel(sample_rate / 2.0), n_mels + 2)
+        bins = np.floor((n_fft + 1) * mel_to_hz(mels) / sample_rate).astype(int)
+        fbank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+        for m in range(1, n_mels + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            if center > left:
+                fbank[m - 1, left:center] = (np.arange(left, center) - left) / float(center - left)
+            if right > center:
+                fbank[m - 1, center:right] = (right - np.arange(center, right)) / float(right - center)
+        # DCT-II matrix (orthonormal) ek hi baar
+        n = np.arange(n_mels)
+        dct = np.cos(np.pi / n_mels * (n + 0.5)[None, :] * np.arange(N_MFCC)[:, None]) * np.sqrt(2.0 / n_mels)
+        dct[0] /= np.sqrt(2.0)
+        _mel_cache[key] = (fbank, dct.astype(np.float32))
+    return _mel_cache[key]
+
+def mfcc(audio, sample_rate=SAMPLE_RATE):
+    """
+    float32 mono -> (frames x N_MFCC), silence trim aur per-utterance normalize (median/std).
+    Framing stride tricks se (copy nahi), FFT/mel/DCT ek-ek matrix op.
+    """
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    frame = int(sample_rate * FRAME_MS / 1000)
+    hop = int(sample_rate * HOP_MS / 1000)
+    if len(audio) < frame:
+        return np.zeros((0, N_MFCC), dtype=np.float32)
+    emphasized = np.append(audio[0], audio[1:] - PRE_EMPHASIS * audio[:-1])
+    frames = np.lib.stride_tricks.sliding_window_view(emphasized, frame)[::hop] * np.hamming(frame).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, n=N_FFT)) ** 2 / N_FFT
+    fbank, dct = _mel_filterbank(sample_rate)
+    log_mel = np.log(power @ fbank.T + 1e-10)
+    # Hotword aur command ke beech ka gap: bina floor ke log(1e-10) vs shor ka farak CMVN ke baad
+    # poore DTW distance par chha jaata hai
+    log_mel = np.maximum(log_mel, log_mel.max() - FLOOR_DB * np.log(10) / 10)
+    # Shuru/aakhir ki khamoshi (aur hotword ki poonch ke baad ka gap) hatao
+    energy = log_mel.max(axis=1)
+    voiced = np.flatnonzero(energy > energy.max() - TRIM_DB * np.log(10) / 10)
+    log_mel = log_mel[voiced[0]:voiced[-1] + 1]
+    coeffs = log_mel @ dct.T
+    # Median (mean nahi): hotword ki poonch jaise extra frames center ko kam khiskate hain
+    coeffs -= np.median(coeffs, axis=0)
+    coeffs /= coeffs.std(axis=0) + 1e-6
+    return coeffs.astype(np.float32)
+
+def dtw_distance(template, query):
+    """
+    Subsequence DTW: poora template query ke kisi bhi hisse se (shuru mein hotword ki poonch, aakhir
+    mein shor ho toh bhi). Har template row ek vectorized step: D[i] = C + cummin(a - C), jahan
+    a = cost + min(upar, diagonal) aur C us row ki cost ka cumsum (horizontal moves). Returns
+    template length se normalized distance.
+    """
+    if not len(template) or not len(query):
+        return np.inf
+    # Saare frame pairs ki Euclidean cost ek matmul mein
+    sq = (template ** 2).sum(1)[:, None] + (query ** 2).sum(1)[None, :] - 2.0 * template @ query.T
+    cost = np.sqrt(np.maximum(sq, 0.0)) / np.sqrt(template.shape[1])
+    prev = cost[0].copy() # Template ka pehla frame query mein kahin se bhi shuru
+    for i in range(1, len(template)):
+        row = cost[i]
+        best_prev = prev.copy()
+        best_prev[1:] = np.minimum(prev[1:], prev[:-1])
+        a = row + best_prev
+        cumulative = np.cumsum(row)
+        prev = cumulative + np.minimum.accumulate(a - cumulative)
+    return float(prev.min()) / len(template)
+
+
+class KeywordSpotter:
+    """
+    enroll(intent, audio) ek sample jodta hai aur us intent ka threshold dobara seekhta hai.
+    spot(audio) -> Spot; accepted=True ho tabhi Whisper skip karna chahiye.
+    """
+
+    def __init__(self, directory=KEYWORD_DIR, min_margin=DEFAULT_MIN_MARGIN, max_seconds=DEFAULT_MAX_SECONDS,
+                 sample_rate=SAMPLE_RATE):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.min_margin = float(min_margin)
+        self.max_seconds = float(max_seconds)
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        self.intents = {} # intent -> {"samples": [file, ...], "threshold": float ya None}
+        self.templates = {} # intent -> [MFCC array, ...]
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                self.intents = json.load(f).get('intents', {})
+        except (OSError, ValueError):
+            self.intents = {}
+        for intent, entry in self.intents.items():
+            self.templates[intent] = [np.load(os.path.join(self.directory, name)) for name in entry['samples']
+                                      if os.path.exists(os.path.join(self.directory, name))]
+        if self.intents:
+            log.info(f"[KWS] {sum(len(t) for t in self.templates.values())} templates "
+                     f"({', '.join(sorted(self.intents))}) loaded.")
+
+    def __len__(self):
+        return sum(1 for intent in self.templates if len(self.templates[intent]) >= MIN_SAMPLES)
+
+    def _write_index(self):
+        fd, tmp_path = tempfile.mkstemp(prefix='.index.', suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"sample_rate": self.sample_rate, "intents": self.intents}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def _learn_threshold(self, intent):
+        """Leave-one-out: har sample apne hi intent ke baaki samples se kitna door; unka max * slack."""
+        templates = self.templates[intent]
+        if len(templates) < MIN_SAMPLES:
+            return None
+        nearest = [min(dtw_distance(other, sample) for j, other in enumerate(templates) if j != i)
+                   for i, sample in enumerate(templates)]
+        return round(float(max(nearest)) * THRESHOLD_SLACK, 4)
+
+    def enroll(self, intent, audio):
+        """Returns us intent ke samples ki ginti."""
+        features = mfcc(audio, self.sample_rate)
+        if len(features) < 10:
+            raise ValueError("Sample bahut chhota/khamosh hai.")
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            entry = self.intents.setdefault(intent, {"samples": [], "threshold": None})
+            name = f"{intent}_{int(time.time() * 1000)}.npy"
+            np.save(os.path.join(self.directory, name), features)
+            entry['samples'].append(name)
+            self.templates.setdefault(intent, []).append(features)
+            entry['threshold'] = self._learn_threshold(intent)
+            self._write_index()
+            return len(entry['samples'])
+
+    def spot(self, audio):
+        start = time.perf_counter()
+        if len(audio) > self.max_seconds * self.sample_rate:
+            return Spot(None, None, None, 0.0, False, (time.perf_counter() - start) * 1000)
+        query = mfcc(audio, self.sample_rate)
+        scores = []
+        for intent, templates in self.templates.items():
+            threshold = self.intents[intent].get('threshold')
+            if threshold is None or len(templates) < MIN_SAMPLES:
+                continue
+            # Template query se bahut lamba ho toh woh command bola hi nahi gaya
+            distances = [dtw_distance(t, query) for t in templates if len(t) <= 2 * len(query)]
+            if distances:
+                scores.append((min(distances), intent, threshold))
+        elapsed = (time.perf_counter() - start) * 1000
+        if not scores:
+            return Spot(None, None, None, 0.0, False, elapsed)
+        scores.sort()
+        distance, intent, threshold = scores[0]
+        # Doosra intent na ho toh margin threshold se (kitna andar hai)
+        runner_up = scores[1][0] if len(scores) > 1 else threshold
+        margin = max(0.0, (runner_up - distance) / runner_up) if runner_up > 0 else 0.0
+        accepted = distance <= threshold and margin >= self.min_margin
+        return Spot(intent, round(distance, 4), threshold, round(margin, 3), accepted, elapsed)
+
+
+def open_keyword_spotter(config):
+    """config['KWS_ENABLED'] (default False), KWS_DIR, KWS_MIN_MARGIN, KWS_MAX_SECONDS. Kuch enrolled na ho toh None."""
+    if not config.get('KWS_ENABLED', False):
+        return None
+    spotter = KeywordSpotter(
+        os.path.expanduser(config.get('KWS_DIR', KEYWORD_DIR)),
+        min_margin=config.get('KWS_MIN_MARGIN', DEFAULT_MIN_MARGIN),
+        max_seconds=config.get('KWS_MAX_SECONDS', DEFAULT_MAX_SECONDS)
+    )
+    if not len(spotter):
+        log.warning("[KWS] Koi intent enrolled nahi. 'python3 keyword_enroll.py --intent check_ram' chala lein.")
+        return None
+    return spotter
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import shutil
+    print("--- Keyword Spotter Test (synthetic 'words') ---")
+    rng = np.random.default_rng(7)
+
+    def word(pitches, stretch=1.0, noise=0.01, lead=0.0):
+        """Har 'syllable' ek formant-jaisa tone; stretch = bolne ki speed, lead = hotword ki poonch."""
+        parts = [rng.normal(0, 0.2, int(lead * SAMPLE_RATE)).astype(np.float32)] if lead else []
+        for f0, f1 in pitches:
+            n = int(0.15 * stretch * SAMPLE_RATE)
+            t = np.arange(n) / SAMPLE_RATE
+            parts.append(0.4 * np.sin(2 * np.pi * f0 * t) + 0.2 * np.sin(2 * np.pi * f1 * t))
+        parts.append(np.zeros(int(0.3 * SAMPLE_RATE)))
+        audio = np.concatenate(parts).astype(np.float32)
+        return audio + rng.normal(0, noise, len(audio)).astype(np.float32)
+
+    vocab = {
+        'check_ram': [(300, 2300), (700, 1200), (500, 1800)],
+        'check_date': [(250, 900), (400, 2600), (650, 1500), (300, 2000)],
+        'check_disk': [(600, 1000), (350, 2400), (450, 1300)],
+    }
+    directory = tempfile.mkdtemp(prefix='jarvis_kws_test_')
+    spotter = KeywordSpotter(directory)
+    for intent, pitches in vocab.items():
+        # Asli takes jaise: har baar thodi alag speed aur kamre ka shor
+        for stretch, noise in ((0.85, 0.01), (1.0, 0.02), (1.2, 0.03)):
+            spotter.enroll(intent, word(pitches, stretch=stretch, noise=noise))
+    print({intent: entry['threshold'] for intent, entry in spotter.intents.items()})
+
+    spotter = KeywordSpotter(directory) # Disk se dobara load
+    queries = [
+        ('check_ram (fast)', word(vocab['check_ram'], stretch=0.9)),
+        ('check_date (slow + hotword tail)', word(vocab['check_date'], stretch=1.15, lead=0.2)),
+        ('check_disk (noisy)', word(vocab['check_disk'], noise=0.025)),
+        ('check_disk (bahut shor)', word(vocab['check_disk'], noise=0.1)),
+        ('unknown command', word([(800, 1100), (200, 3000), (900, 2100), (550, 700)])),
+        ('long sentence', np.tile(word(vocab['check_ram']), 6)),
+    ]
+    for label, audio in queries:
+        spot = spotter.spot(audio)
+        verdict = f"SKIP WHISPER -> {spot.intent}" if spot.accepted else "Whisper"
+        print(f"{label:<34} {verdict:<28} dist={spot.distance} thr={spot.threshold} "
+              f"margin={spot.margin} ({spot.elapsed_ms:.1f} ms)")
+    shutil.rmtree(directory, ignore_errors=True)
+    print("\n--- Test Complete ---")
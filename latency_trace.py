@@ -0,0 +1,216 @@
+import collections
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file har interaction (hotword -> jawab khatam) ka latency trace rakhti hai.
+# Har stage par monotonic timestamp lagta hai; interaction khatam hone par poora trace
+# ek JSON line ban kar rotating file mein jaata hai, aur har stage ke p50/p95/p99 ka
+# Prometheus text-format snapshot update hota hai (node_exporter textfile collector padh sakta hai).
+# Isse WHISPER_THREADS, LLAMA_THREADS aur VAD hangover asli data dekh kar tune ho sakte hain.
+
+JARVIS_DIR = os.path.expanduser('~/jarvis')
+TRACE_DIR = os.path.join(JARVIS_DIR, 'traces')
+TRACE_FILE = 'latency.jsonl'
+METRICS_FILE = 'latency.prom'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+DEFAULT_WINDOW = 500 # Quantiles pichle itne interactions par
+
+# Ek interaction ke stages, is order mein. Har stage ki 'duration' = pichle lage hue stage se gap.
+STAGES = [
+    'hotword',          # Hotword detect hua (trace ka t=0)
+    'speech_start',     # VAD ne user ki awaaz pakdi ("Yes sir?" + user ka reaction bhi isi mein)
+    'speech_end',       # Silence hangover ke baad recording band
+    'stt_done',         # Transcript tayyar
+    'route_done',       # Rename / intent / LLM ka faisla ho gaya
+    'action_start',     # SafeRunner ya LLM shuru
+    'first_token',      # LLM ka pehla token (non-streaming mein poora response)
+    'tts_first_audio',  # Jawab ki pehli awaaz speaker par
+    'tts_done',         # Jawab bolna khatam
+]
+LAST_WINS = ('tts_done',) # Streaming TTS mein har sentence ke baad aage badhta hai
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Trace:
+    """Ek interaction ke stage timestamps (monotonic) aur kuch meta info."""
+
+    def __init__(self, meta=None):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.wall_start = time.time()
+        self.marks = {}
+        self.meta = dict(meta or {})
+        self.mark('hotword')
+
+    def mark(self, stage):
+        """Stage ka time. Pehla mark jeet-ta hai (tts_done ko chhod kar)."""
+        if stage in self.marks and stage not in LAST_WINS:
+            return
+        self.marks[stage] = time.monotonic()
+
+    def offsets(self):
+        """stage -> hotword se kitne seconds baad."""
+        t0 = self.marks['hotword']
+        return {stage: self.marks[stage] - t0 for stage in STAGES if stage in self.marks}
+
+    def durations(self):
+        """stage -> pichle lage hue stage se gap; saath mein 'response' aur 'total'."""
+        result = {}
+        prev = None
+        for stage in STAGES:
+            if stage not in self.marks:
+                continue
+            if prev is not None:
+                result[stage] = self.marks[stage] - self.marks[prev]
+            prev = stage
+        # User ke chup hone se jawab ki pehli awaaz tak: yahi 'latency' mehsoos hoti hai
+        if 'speech_end' in self.marks and 'tts_first_audio' in self.marks:
+            result['response'] = self.marks['tts_first_audio'] - self.marks['speech_end']
+        result['total'] = self.marks[prev] - self.marks['hotword']
+        return result
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "ts": round(self.wall_start, 3),
+            "offsets": {k: round(v, 4) for k, v in self.offsets().items()},
+            "durations": {k: round(v, 4) for k, v in self.durations().items()},
+            "meta": self.meta,
+        }
+
+
+def mark_first(items, trace, stage):
+    """Generator wrapper: pehla item aate hi trace par 'stage' lagata hai."""
+    first = True
+    for item in items:
+        if first:
+            trace.mark(stage)
+            first = False
+        yield item
+
+
+class Tracer:
+    """
+    Traces ko JSONL (RotatingFileHandler) mein likhta hai aur har stage ki pichli
+    'window' durations se Prometheus snapshot banata hai.
+    """
+
+    def __init__(self, trace_dir=TRACE_DIR, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS,
+                 window=DEFAULT_WINDOW, enabled=True):
+        self.trace_dir = trace_dir
+        self.enabled = enabled
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self.count = 0
+        self.metrics_path = os.path.join(trace_dir, METRICS_FILE)
+        self._writer = None
+        if enabled:
+            os.makedirs(trace_dir, exist_ok=True)
+            # Alag logger (jarvis.* se bahar): sirf message, terminal par nahi jaata
+            self._writer = logging.getLogger("jarvis_trace." + uuid.uuid4().hex[:6])
+            self._writer.propagate = False
+            self._writer.setLevel(logging.INFO)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(trace_dir, TRACE_FILE), maxBytes=max_bytes, backupCount=backups
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._writer.addHandler(handler)
+
+    def begin(self, meta=None):
+        return Trace(meta)
+
+    def finish(self, trace, **meta):
+        """Interaction khatam: JSON line likho, stats aur snapshot update karo."""
+        trace.meta.update(meta)
+        if not self.enabled:
+            return trace
+        record = trace.to_dict()
+        with self.lock:
+            for stage, value in record["durations"].items():
+                self.samples[stage].append(value)
+            self.count += 1
+            self._writer.info(json.dumps(record, ensure_ascii=False))
+            try:
+                self._write_snapshot()
+            except OSError as e:
+                log.warning(f"[Trace] Metrics snapshot nahi likh paaya: {e}")
+        log.debug(f"[Trace] {record['trace_id']} {record['durations']}")
+        return trace
+
+    def quantiles(self):
+        """stage -> {'p50':..,'p95':..,'p99':..,'count':..,'sum':..}"""
+        result = {}
+        for stage, values in self.samples.items():
+            arr = np.fromiter(values, dtype=np.float64)
+            if arr.size == 0:
+                continue
+            qs = np.quantile(arr, QUANTILES)
+            result[stage] = {f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, qs)}
+            result[stage]["count"] = int(arr.size)
+            result[stage]["sum"] = float(arr.sum())
+        return result
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP jarvis_stage_latency_seconds Per-stage interaction latency (recent window).",
+            "# TYPE jarvis_stage_latency_seconds summary",
+        ]
+        order = STAGES + ['response', 'total']
+        stats = self.quantiles()
+        for stage in sorted(stats, key=lambda s: order.index(s) if s in order else len(order)):
+            s = stats[stage]
+            for q in QUANTILES:
+                lines.append(f'jarvis_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} '
+                             f'{s[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'jarvis_stage_latency_seconds_sum{{stage="{stage}"}} {s["sum"]:.6f}')
+            lines.append(f'jarvis_stage_latency_seconds_count{{stage="{stage}"}} {s["count"]}')
+        lines.append("# HELP jarvis_interactions_total Interactions traced since start.")
+        lines.append("# TYPE jarvis_interactions_total counter")
+        lines.append(f"jarvis_interactions_total {self.count}")
+        return "\n".join(lines) + "\n"
+
+    def _write_snapshot(self):
+        # Scraper ko kabhi aadhi file na mile: tmp likh kar replace
+        tmp_path = self.metrics_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, self.metrics_path)
+
+
+def create_tracer(config):
+    """config['TRACE_ENABLED'] (default True) aur config['TRACE_DIR']."""
+    return Tracer(
+        trace_dir=os.path.expanduser(config.get('TRACE_DIR', TRACE_DIR)),
+        enabled=bool(config.get('TRACE_ENABLED', True))
+    )
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import tempfile
+    print("--- Latency Trace Test ---")
+    with tempfile.TemporaryDirectory() as d:
+        tracer = Tracer(trace_dir=d)
+        for i in range(20):
+            trace = tracer.begin({"whisper_threads": 2})
+            for stage in STAGES[1:4]:
+                time.sleep(0.001 * (i % 5 + 1))
+                trace.mark(stage)
+            for _ in mark_first(iter("abc"), trace, 'first_token'):
+                trace.mark('tts_first_audio')
+                trace.mark('tts_done')
+            tracer.finish(trace, route='llm')
+        with open(os.path.join(d, TRACE_FILE)) as f:
+            print(f"Last trace: {f.readlines()[-1].strip()}")
+        print(tracer.prometheus_text())
@@ -0,0 +1,194 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file LLM ke aage ek response cache rakhti hai.
+# "who are you", "what can you do", greetings jaise sawaal baar baar aate hain; har baar
+# poori generation (kai second CPU) ki zaroorat nahi. Query normalize hoti hai (case, punctuation,
+# filler words), aur model + sampling params ke saath key banti hai. Jawab sqlite mein
+# (TTL + LRU eviction) aur ek chhote in-memory hot tier mein rehte hain.
+
+JARVIS_DIR = os.path.expanduser('~/jarvis')
+LLM_CACHE_PATH = os.path.join(JARVIS_DIR, 'llm_cache.sqlite3')
+DEFAULT_TTL_S = 7 * 24 * 3600 # Ek hafte baad jawab dobara generate
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_HOT_ENTRIES = 64
+KEY_VERSION = 1 # Prompt template badle toh yeh badhao: purane jawab apne aap bekaar
+
+# Jawab par asar na daalne wale shabd
+FILLER_WORDS = {
+    "please", "plz", "hey", "hi", "ok", "okay", "um", "uh", "umm", "hmm", "well",
+    "zara", "jara", "yaar", "bhai", "ji", "na", "bas", "batao", "bataiye", "tell", "me",
+}
+PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_query(text, extra_fillers=()):
+    """'Hey Jarvis, who ARE you??' -> 'who are you' (extra_fillers mein jaise hotword ka naam)."""
+    fillers = FILLER_WORDS.union(w.lower() for w in extra_fillers)
+    words = PUNCT_RE.sub(" ", text.lower()).split()
+    kept = [w for w in words if w not in fillers]
+    return " ".join(kept or words) # Sirf filler tha ("hi")? Toh jaisa tha waisa
+
+def model_identity(model_path):
+    """Model path + size + mtime: GBs ki GGUF file hash karne ki zaroorat nahi."""
+    try:
+        st = os.stat(model_path)
+        return f"{os.path.abspath(model_path)}:{st.st_size}:{st.st_mtime_ns}"
+    except (OSError, TypeError):
+        return str(model_path)
+
+
+class LLMResponseCache:
+    """
+    Do tier: 'hot' (OrderedDict LRU, process memory) aur sqlite (disk, restart ke baad bhi).
+    get() pehle hot, phir disk; disk hit hot mein promote hota hai.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=DEFAULT_TTL_S, max_entries=DEFAULT_MAX_ENTRIES,
+                 hot_entries=DEFAULT_HOT_ENTRIES, extra_fillers=()):
+        self.path = path
+        self.ttl = float(ttl)
+        self.max_entries = int(max_entries)
+        self.hot_entries = int(hot_entries)
+        self.extra_fillers = tuple(extra_fillers)
+        self.lock = threading.Lock()
+        self.hot = collections.OrderedDict() # key -> (response, created)
+        self.stats_counts = {"hot_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "puts": 0, "evicted": 0}
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+
+    def key(self, query, model, params):
+        normalized = normalize_query(query, self.extra_fillers)
+        raw = json.dumps([KEY_VERSION, normalized, model_identity(model), params], sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest(), normalized
+
+    def get(self, query, model, params):
+        """Cached jawab ya None. params: sampling settings dict (n_predict, temperature...)."""
+        key, _ = self.key(query, model, params)
+        now = time.time()
+        with self.lock:
+            entry = self.hot.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self.hot.move_to_end(key)
+                self.stats_counts["hot_hits"] += 1
+                self.db.execute("UPDATE responses SET last_used=?, hits=hits+1 WHERE key=?", (now, key))
+                return entry[0]
+            self.hot.pop(key, None)
+            row = self.db.execute("SELECT response, created FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                self.stats_counts["misses"] += 1
+                return None
+            response, created = row
+            if now - created > self.ttl:
+                self.db.execute("DELETE FROM responses WHERE key=?", (key,))
+                self.stats_counts["expired"] += 1
+                self.stats_counts["misses"] += 1
+                return None
+            self.db.execute("UPDATE responses SET last_used=?, hits=hits+1 WHERE key=?", (now, key))
+            self.stats_counts["disk_hits"] += 1
+            self._promote(key, response, created)
+            return response
+
+    def put(self, query, model, params, response):
+        if not response or not response.strip():
+            return
+        key, normalized = self.key(query, model, params)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, query, response, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, normalized, response, now, now)
+            )
+            self.stats_counts["puts"] += 1
+            self._promote(key, response, now)
+            self._evict(now)
+
+    def _promote(self, key, response, created):
+        self.hot[key] = (response, created)
+        self.hot.move_to_end(key)
+        while len(self.hot) > self.hot_entries:
+            self.hot.popitem(last=False)
+
+    def _evict(self, now):
+        cur = self.db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        evicted = cur.rowcount
+        (count,) = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            # LRU: sabse kam recently use hue jawab hatao
+            cur = self.db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            evicted += cur.rowcount
+        if evicted:
+            self.stats_counts["evicted"] += evicted
+            live = {row[0] for row in self.db.execute("SELECT key FROM responses")}
+            for key in [k for k in self.hot if k not in live]:
+                del self.hot[key]
+
+    def stats(self):
+        with self.lock:
+            (entries,) = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            result = dict(self.stats_counts)
+        hits = result["hot_hits"] + result["disk_hits"]
+        result["entries"] = entries
+        result["hot_entries"] = len(self.hot)
+        result["hit_rate"] = round(hits / float(hits + result["misses"]), 3) if hits + result["misses"] else 0.0
+        return result
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def create_llm_cache(config):
+    """config['LLM_CACHE'] (default True) band ho toh None."""
+    if not config.get('LLM_CACHE', True):
+        return None
+    return LLMResponseCache(
+        path=os.path.expanduser(config.get('LLM_CACHE_PATH', LLM_CACHE_PATH)),
+        ttl=float(config.get('LLM_CACHE_TTL_HOURS', DEFAULT_TTL_S / 3600.0)) * 3600.0,
+        max_entries=int(config.get('LLM_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+        extra_fillers=[config.get('JARVIS_NAME', 'jarvis')]
+    )
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    print("--- LLM Response Cache Test ---")
+    cache = LLMResponseCache(path=':memory:', max_entries=2, hot_entries=1, extra_fillers=["jarvis"])
+    params = {"n_predict": 64, "temperature": 0.7}
+    print(f"Normalized: '{normalize_query('Hey Jarvis, who ARE you??', ['jarvis'])}'")
+    print(f"Miss: {cache.get('who are you', 'model.gguf', params)}")
+    cache.put("Who are you?", "model.gguf", params, "Main Jarvis hoon.")
+    print(f"Hit (hot): {cache.get('jarvis who are you', 'model.gguf', params)}")
+    print(f"Other params: {cache.get('who are you', 'model.gguf', dict(params, n_predict=128))}")
+    cache.put("what can you do", "model.gguf", params, "Main date, RAM aur disk bata sakta hoon.")
+    print(f"Hit (disk): {cache.get('who are you', 'model.gguf', params)}")
+    cache.put("hello", "model.gguf", params, "Namaste Sir.") # max_entries=2 -> LRU evict
+    print(f"Evicted: {cache.get('what can you do', 'model.gguf', params)}")
+    print(f"Stats: {cache.stats()}")
+    print("\n--- Test Complete ---")
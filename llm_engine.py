@@ -0,0 +1,502 @@
+import codecs
+import json
+import os
+import queue
+import re
+import selectors
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from cpu_scheduler import spawn_command, stage_threads
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file LLM backend sambhalti hai.
+# Pehle har sawaal par 'llama-cli' naye sire se chalta tha (4GB model har baar load).
+# Ab 'llama-server' ek baar start hota hai, model memory mein resident rehta hai,
+# aur prompts local HTTP par jaate hain.
+
+JARVIS_DIR = os.path.expanduser('~/jarvis')
+LLAMA_SERVER_PATH = os.path.join(JARVIS_DIR, 'llama.cpp', 'build', 'bin', 'llama-server')
+LLAMA_CLI_PATH = os.path.join(JARVIS_DIR, 'llama.cpp', 'build', 'bin', 'llama-cli')
+LLAMA_MODEL_PATH = os.path.join(JARVIS_DIR, 'llama.cpp', 'models', 'mistral-7b-openhermes.Q4_K_M.gguf')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8089
+DEFAULT_CTX_SIZE = 2048
+DEFAULT_LOAD_TIMEOUT = 180 # 4GB model ko load hone mein time lagta hai
+DEFAULT_TEMPERATURE = 0.7
+
+# Jawab ki pehli line hi chahiye; naya line ya agla 'User:' turn aate hi generation band
+DEFAULT_STOP = ["\n", "User:"]
+
+# Sentence/clause khatam hone ke nishaan (peeche whitespace zaroori, taaki "3.5" na toote)
+SENTENCE_END_RE = re.compile(r'[.!?\u0964]+(?=\s)')
+CLAUSE_END_RE = re.compile(r'[,;:](?=\s)')
+MIN_CLAUSE_CHARS = 24 # Isse chhote clause ko alag se TTS mein bhejna faayde ka nahi
+# llama-cli ka prompt echo '-e' escape processing ke baad hamesha prompt jaisa nahi hota;
+# itne extra chars tak echo dhoondo, phir jo aaya woh jawab maan lo
+ECHO_SLACK_CHARS = 64
+
+
+class LLMError(Exception):
+    """LLM backend fail hua (process crash, timeout, ya model load nahi hua)."""
+
+
+def strip_prompt_echo(output, prompt):
+    """
+    llama-cli ke stdout se prompt ka echo hatata hai.
+    Poora prompt na mile ('-e' ne escapes badal diye) toh prompt ki aakhri line
+    ("Jarvis:") echo wale hisse mein dhoondo; woh bhi na mile toh output jaisa ka taisa.
+    """
+    if prompt in output:
+        return output.split(prompt, 1)[-1]
+    lines = [line.strip() for line in prompt.splitlines() if line.strip()]
+    tail = lines[-1] if lines else ""
+    idx = output.rfind(tail, 0, len(prompt) + ECHO_SLACK_CHARS) if tail else -1
+    if idx >= 0:
+        return output[idx + len(tail):]
+    return output
+
+
+def trim_at_stop(pieces, stop=None):
+    """
+    Token pieces ko aage bhejta hai jab tak koi stop sequence na mile.
+    Shuru ka whitespace skip hota hai; stop ka adha hissa tab tak roka jaata hai
+    jab tak pakka na ho ki woh stop sequence nahi hai.
+    """
+    stop = DEFAULT_STOP if stop is None else stop
+    buf = ""
+    started = False
+    for piece in pieces:
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+        buf += piece
+        hits = [buf.find(s) for s in stop if s and s in buf]
+        if hits:
+            head = buf[:min(hits)]
+            if head:
+                yield head
+            return
+        keep = 0
+        for s in stop:
+            for k in range(min(len(s) - 1, len(buf)), 0, -1):
+                if buf.endswith(s[:k]):
+                    keep = max(keep, k)
+                    break
+        if len(buf) > keep:
+            yield buf[:len(buf) - keep]
+            buf = buf[len(buf) - keep:]
+    if buf:
+        yield buf
+
+def prefetch(pieces):
+    """
+    Generator ko background thread mein abhi se chalata hai: stream() ki request turant jaati hai aur
+    tokens tab bhi aate rehte hain jab consumer (voice queue) filler bol raha ho.
+    Generator ki exception consumer ko wahin milti hai jahan woh padhta.
+    """
+    items = queue.Queue()
+    end = object()
+
+    def producer():
+        try:
+            for piece in pieces:
+                items.put((piece, None))
+        except Exception as e:
+            items.put((end, e))
+            return
+        items.put((end, None))
+
+    threading.Thread(target=producer, name="jarvis-llm-prefetch", daemon=True).start()
+
+    def consume():
+        while True:
+            piece, error = items.get()
+            if piece is end:
+                if error is not None:
+                    raise error
+                return
+            yield piece
+    return consume()
+
+def split_sentences(pieces, min_clause_chars=MIN_CLAUSE_CHARS):
+    """
+    Streaming text ko poore sentences/clauses mein todta hai, taaki TTS
+    pehla sentence bol sake jab tak baaki tokens aa rahe hain.
+    """
+    buf = ""
+    for piece in pieces:
+        buf += piece
+        while True:
+            m = SENTENCE_END_RE.search(buf)
+            end = m.end() if m else None
+            for c in CLAUSE_END_RE.finditer(buf):
+                if c.end() >= min_clause_chars:
+                    if end is None or c.end() < end:
+                        end = c.end()
+                    break
+            if end is None:
+                break
+            sentence = buf[:end].strip()
+            buf = buf[end:]
+            if sentence:
+                yield sentence
+    if buf.strip():
+        yield buf.strip()
+
+
+class LlamaServerEngine:
+    """
+    llama.cpp ka 'llama-server' ek baar chalata hai aur model ko resident rakhta hai.
+    start() non-blocking hai; complete() pehle model ready hone ka wait karta hai.
+    """
+
+    def __init__(self, model_path=LLAMA_MODEL_PATH, server_path=LLAMA_SERVER_PATH,
+                 threads=None, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 ctx_size=DEFAULT_CTX_SIZE, load_timeout=DEFAULT_LOAD_TIMEOUT):
+        self.model_path = model_path
+        self.server_path = server_path
+        self.threads = threads # None/'auto': cpu_scheduler load dekh kar chune
+        self.host = host
+        self.port = int(port)
+        self.ctx_size = int(ctx_size)
+        self.load_timeout = load_timeout
+        self.base_url = f"http://{host}:{self.port}"
+        self.proc = None
+        self._ready = False
+
+    def start(self):
+        """Server process spawn karta hai (model background mein load hota rahega)."""
+        if self.is_alive():
+            return
+        if not os.path.exists(self.server_path):
+            raise LLMError(f"llama-server binary nahi mila: {self.server_path}")
+        if not os.path.exists(self.model_path):
+            raise LLMError(f"LLM model nahi mila: {self.model_path}")
+        command = [
+            self.server_path,
+            "-m", self.model_path,
+            "-t", str(stage_threads('llm', self.threads)),
+            "-c", str(self.ctx_size),
+            "--host", self.host,
+            "--port", str(self.port),
+        ]
+        log.info(f"[LLM] Resident server start kar raha hoon: {' '.join(command)}")
+        self._ready = False
+        self.proc = subprocess.Popen(
+            spawn_command('llm', command),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def _health_ok(self):
+        try:
+            with urllib.request.urlopen(self.base_url + "/health", timeout=1.0) as resp:
+                return resp.status == 200
+        except (urllib.error.URLError, OSError, ValueError):
+            # 503 (model loading) bhi yahin aata hai
+            return False
+
+    def wait_ready(self, timeout=None):
+        """Jab tak model load nahi ho jaata tab tak wait karta hai."""
+        if self._ready and self.is_alive():
+            return True
+        if not self.is_alive():
+            # Crash ho gaya tha (ya start hi nahi hua) toh dobara chalao
+            self.start()
+        deadline = time.monotonic() + (self.load_timeout if timeout is None else timeout)
+        while time.monotonic() < deadline:
+            if not self.is_alive():
+                raise LLMError(f"llama-server band ho gaya (returncode={self.proc.returncode})")
+            if self._health_ok():
+                self._ready = True
+                log.info("[LLM] Model loaded, server ready.")
+                return True
+            time.sleep(0.25)
+        raise LLMError("llama-server ready nahi hua (load timeout).")
+
+    def _wait_ready_until(self, deadline):
+        """
+        Request ke timeout mein se model load ka wait bhi katta hai: load ke beech aaya
+        sawaal poore load_timeout tak nahi atakta. Bacha hua time return karta hai.
+        """
+        self.wait_ready(timeout=max(0.0, deadline - time.monotonic()))
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMError("llama-server request timeout ho gaya (model ready hone mein hi time nikal gaya).")
+        return remaining
+
+    @staticmethod
+    def _server_stop(stop):
+        # "\n" server ko nahi dete: jawab newline se shuru ho sakta hai (trim_at_stop/strip skip karta hai)
+        return [s for s in (DEFAULT_STOP if stop is None else stop) if s.strip()]
+
+    def complete(self, prompt, n_predict=64, timeout=30, temperature=DEFAULT_TEMPERATURE, stop=None):
+        """Prompt bhejta hai aur generated text return karta hai (agle 'User:' turn se pehle ruk kar)."""
+        deadline = time.monotonic() + timeout
+        timeout = self._wait_ready_until(deadline)
+        payload = {
+            "prompt": prompt,
+            "n_predict": int(n_predict),
+            "temperature": temperature,
+            "cache_prompt": True,
+            "stop": self._server_stop(stop),
+        }
+        request = urllib.request.Request(
+            self.base_url + "/completion",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as resp:
+                body = json.loads(resp.read().decode('utf-8'))
+        except Exception as e:
+            raise LLMError(f"llama-server request fail hua: {e}") from e
+        return body.get("content", "")
+
+    def stream(self, prompt, n_predict=64, timeout=30, temperature=DEFAULT_TEMPERATURE, stop=None):
+        """
+        Tokens ko aate hi yield karta hai (server-sent events).
+        Stop sequence milte hi connection band, jisse server bhi generation rok deta hai.
+        """
+        deadline = time.monotonic() + timeout
+        timeout = self._wait_ready_until(deadline)
+        payload = {
+            "prompt": prompt,
+            "n_predict": int(n_predict),
+            "temperature": temperature,
+            "cache_prompt": True,
+            "stream": True,
+            "stop": self._server_stop(stop),
+        }
+        request = urllib.request.Request(
+            self.base_url + "/completion",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            resp = urllib.request.urlopen(request, timeout=timeout)
+        except Exception as e:
+            raise LLMError(f"llama-server request fail hua: {e}") from e
+
+        def events():
+            for raw_line in resp:
+                if time.monotonic() > deadline:
+                    raise LLMError("llama-server stream timeout ho gaya.")
+                line = raw_line.decode('utf-8').strip()
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):])
+                if event.get("content"):
+                    yield event["content"]
+                if event.get("stop"):
+                    return
+
+        try:
+            yield from trim_at_stop(events(), stop)
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(f"llama-server stream toot gaya: {e}") from e
+        finally:
+            resp.close()
+
+    def stop(self):
+        if self.is_alive():
+            log.info("[LLM] Server band kar raha hoon...")
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.proc = None
+        self._ready = False
+
+
+class LlamaCliEngine:
+    """
+    Purana tareeka: har prompt par 'llama-cli' naya process.
+    Sirf tab use hota hai jab llama-server build nahi hua ho.
+    """
+
+    def __init__(self, model_path=LLAMA_MODEL_PATH, cli_path=LLAMA_CLI_PATH, threads=None):
+        self.model_path = model_path
+        self.cli_path = cli_path
+        self.threads = threads # None/'auto': cpu_scheduler load dekh kar chune
+
+    def start(self):
+        if not os.path.exists(self.cli_path):
+            raise LLMError(f"llama-cli binary nahi mila: {self.cli_path}")
+
+    def is_alive(self):
+        return os.path.exists(self.cli_path)
+
+    def wait_ready(self, timeout=None):
+        return self.is_alive()
+
+    def complete(self, prompt, n_predict=64, timeout=30, temperature=DEFAULT_TEMPERATURE):
+        command = [
+            self.cli_path,
+            "-m", self.model_path,
+            "-p", prompt,
+            "-n", str(int(n_predict)),
+            "-t", str(stage_threads('llm', self.threads)),
+            "--temp", str(temperature),
+            "-e"
+        ]
+        try:
+            result = subprocess.run(spawn_command('llm', command), check=True, capture_output=True, text=True,
+                                    timeout=timeout)
+        except subprocess.CalledProcessError as e:
+            raise LLMError(f"llama-cli fail hua: returncode={e.returncode} stderr={e.stderr[:1000]}") from e
+        except subprocess.TimeoutExpired as e:
+            raise LLMError("llama-cli timeout ho gaya.") from e
+        # llama-cli prompt ko bhi echo karta hai, usse hata do
+        return strip_prompt_echo(result.stdout, prompt)
+
+    def stream(self, prompt, n_predict=64, timeout=30, temperature=DEFAULT_TEMPERATURE, stop=None):
+        """
+        stdout ko chunk-by-chunk padhta hai; stop sequence ya timeout par process kill.
+        read() sirf tab hota hai jab selector bataye ki data hai, taaki atka hua
+        llama-cli deadline ke baad bhi thread ko block na kare.
+        """
+        command = [
+            self.cli_path,
+            "-m", self.model_path,
+            "-p", prompt,
+            "-n", str(int(n_predict)),
+            "-t", str(stage_threads('llm', self.threads)),
+            "--temp", str(temperature),
+            "-e"
+        ]
+        proc = subprocess.Popen(spawn_command('llm', command), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + timeout
+
+        selector = selectors.DefaultSelector()
+        selector.register(proc.stdout, selectors.EVENT_READ)
+
+        def pieces():
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+            echoed = ""
+            prompt_seen = False
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not selector.select(remaining):
+                    proc.kill()
+                    raise LLMError("llama-cli timeout ho gaya.")
+                chunk = os.read(proc.stdout.fileno(), 64)
+                if not chunk:
+                    if not prompt_seen and echoed:
+                        # Echo kabhi match nahi hua: jo output aaya woh kho mat do
+                        yield strip_prompt_echo(echoed, prompt)
+                    return
+                text = decoder.decode(chunk)
+                if not prompt_seen:
+                    echoed += text
+                    if prompt not in echoed and len(echoed) <= len(prompt) + ECHO_SLACK_CHARS:
+                        continue
+                    prompt_seen = True
+                    text = strip_prompt_echo(echoed, prompt)
+                if text:
+                    yield text
+
+        try:
+            yield from trim_at_stop(pieces(), stop)
+        finally:
+            selector.close()
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+
+    def stop(self):
+        pass
+
+
+class StubLLMEngine:
+    """
+    Testing ke liye nakli LLM. Asli model ki zaroorat nahi.
+    responses: {prompt ka substring: jawab}; match na ho toh default.
+    """
+
+    def __init__(self, responses=None, default="Main ek test jawab hoon.", delay=0.0):
+        self.responses = responses or {}
+        self.default = default
+        self.delay = delay
+        self.prompts = [] # Tests ke liye: kaun se prompts aaye
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return True
+
+    def wait_ready(self, timeout=None):
+        return True
+
+    def complete(self, prompt, n_predict=64, timeout=30, temperature=DEFAULT_TEMPERATURE):
+        self.prompts.append(prompt)
+        if self.delay:
+            time.sleep(self.delay)
+        for key, answer in self.responses.items():
+            if key in prompt:
+                return " " + answer
+        return " " + self.default
+
+    def stream(self, prompt, n_predict=64, timeout=30, temperature=DEFAULT_TEMPERATURE, stop=None):
+        """complete() wala jawab word-by-word yield karta hai (token streaming jaisa)."""
+        text = self.complete(prompt, n_predict=n_predict, timeout=timeout, temperature=temperature)
+        yield from trim_at_stop(re.findall(r'\s*\S+', text), stop)
+
+    def stop(self):
+        pass
+
+
+def create_engine(config, model_path=LLAMA_MODEL_PATH):
+    """
+    config['LLM_BACKEND'] ke hisaab se engine banata hai:
+    'server' (default), 'cli', ya 'stub'.
+    Agar llama-server build nahi hua toh 'cli' par fallback.
+    """
+    backend = config.get('LLM_BACKEND', 'server')
+    threads = config.get('LLAMA_THREADS') # Na ho / 'auto': cpu_scheduler
+    if backend == 'stub':
+        return StubLLMEngine()
+    if backend == 'server' and os.path.exists(LLAMA_SERVER_PATH):
+        return LlamaServerEngine(
+            model_path=model_path,
+            threads=threads,
+            port=int(config.get('LLAMA_SERVER_PORT', DEFAULT_PORT)),
+            ctx_size=int(config.get('LLAMA_CTX_SIZE', DEFAULT_CTX_SIZE))
+        )
+    if backend == 'server':
+        log.error(f"[LLM] llama-server nahi mila ({LLAMA_SERVER_PATH}), llama-cli par fallback.")
+    return LlamaCliEngine(model_path=model_path, threads=threads)
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    print("--- LLM Engine Test (stub) ---")
+    engine = StubLLMEngine(responses={"who are you": "Main Jarvis hoon."})
+    engine.start()
+    print(engine.complete("User: who are you\nJarvis:"))
+    print(engine.complete("User: mausam kaisa hai\nJarvis:"))
+    print(f"Prompts seen: {len(engine.prompts)}")
+
+    print("\n--- Streaming Test (stub) ---")
+    engine = StubLLMEngine(default="Theek hai Sir, yeh pehla sentence hai. Yeh doosra hai!\nUser: yeh nahi aana chahiye")
+    for sentence in split_sentences(engine.stream("User: test\nJarvis:")):
+        print(f"Sentence: '{sentence}'")
+    print("\n--- Test Complete ---")
@@ -1,10 +1,11 @@
 import argparse
-import json
+import asyncio
+import concurrent.futures
 import os
-import subprocess
 import threading
 import time
 import shutil
+import sys
 
 # --- Configuration (moved up so self-test can use paths) ---
 CONFIG_PATH = os.path.join(os.path.expanduser('~/jarvis'), 'config.json')
@@ -20,12 +21,12 @@ VAD_FRAME_SIZE = int(VAD_SAMPLE_RATE * VAD_FRAME_MS / 1000)
 WHISPER_CPP_PATH = os.path.join(JARVIS_DIR, 'whisper.cpp', 'build', 'bin', 'main')
 WHISPER_MODEL_PATH = os.path.join(JARVIS_DIR, 'whisper.cpp', 'models', 'ggml-tiny.en.bin')
 LLAMA_CPP_PATH = os.path.join(JARVIS_DIR, 'llama.cpp', 'build', 'bin', 'llama-cli')
+LLAMA_SERVER_PATH = os.path.join(JARVIS_DIR, 'llama.cpp', 'build', 'bin', 'llama-server')
 LLAMA_MODEL_PATH = os.path.join(JARVIS_DIR, 'llama.cpp', 'models', 'mistral-7b-openhermes.Q4_K_M.gguf')
 PIPER_BINARY = os.path.join(JARVIS_DIR, 'piper', 'piper')
 
 # Runtime tunables (can be overridden in config.json)
-DEFAULT_WHISPER_THREADS = max(1, (os.cpu_count() or 1) // 2)
-DEFAULT_LLAMA_THREADS = max(1, (os.cpu_count() or 1) - 1)
+# WHISPER_THREADS/LLAMA_THREADS ka default ab cpu_scheduler load aur MODE dekh kar chunta hai
 DEFAULT_LLAMA_N = 64
 DEFAULT_LLAMA_TIMEOUT = 30
 
@@ -57,12 +58,25 @@ def quick_self_test():
         else:
             fail(f"{name} NOT found: {path}")
 
-    # ffmpeg
+    # Resident whisper server (optional: na ho toh per-utterance CLI fallback)
+    whisper_server_path = os.path.join(JARVIS_DIR, 'whisper.cpp', 'build', 'bin', 'whisper-server')
+    if os.path.exists(whisper_server_path) or os.path.exists(os.path.join(JARVIS_DIR, 'whisper.cpp', 'build', 'bin', 'server')):
+        ok("Whisper server binary found")
+    else:
+        ok(f"Whisper server binary not found ({whisper_server_path}); STT will use slower per-command CLI")
+
+    # Resident LLM server (optional: na ho toh llama-cli fallback)
+    if os.path.exists(LLAMA_SERVER_PATH):
+        ok(f"Llama server binary found: {LLAMA_SERVER_PATH}")
+    else:
+        ok(f"Llama server binary not found ({LLAMA_SERVER_PATH}); LLM will use slower llama-cli fallback")
+
+    # ffmpeg (ab sirf audio_volume_analysis.sh ke liye; STT path NumPy mein hai)
     ffmpeg_path = shutil.which('ffmpeg')
     if ffmpeg_path:
         ok(f"ffmpeg found: {ffmpeg_path}")
     else:
-        fail("ffmpeg NOT found in PATH")
+        ok("ffmpeg not found (optional; use 'python3 audio_conditioning.py <wav>' for volume analysis)")
 
     # Report
     print("--- Self-test report ---")
@@ -88,441 +102,872 @@ def quick_self_test():
 # If user requested a quick self-test, run it and exit before importing heavy modules
 parser = argparse.ArgumentParser(add_help=False)
 parser.add_argument('--self-test', action='store_true', help='Run quick environment checks and exit')
+parser.add_argument('--replay', metavar='DIR', help='WAV files ko mic/speaker ke bina pipeline se chalao (benchmark)')
+parser.add_argument('--real', default='', help="Replay mein asli components: stt,llm,tts,hotword,runner ya 'all'")
+parser.add_argument('--speed', type=float, default=1.0, help='Replay audio feed speed (x real-time)')
+parser.add_argument('--report', metavar='PATH', help='Replay report JSON yahan save karo')
+parser.add_argument('--startup-profile', action='store_true', help='Har component ka import/init time print karo')
 args, _ = parser.parse_known_args()
 if args.self_test:
     quick_self_test()
     raise SystemExit(0)
 
 # Defer heavy imports until after self-test
+from jarvis_log import get_logger, setup_logging, shutdown_logging, telemetry
+log = get_logger("main")
+
+# Imports saath-saath (neeche ke imports phir sirf sys.modules se milte hain).
+# resemblyzer/torch yahan nahi: woh hotword live hone ke baad background mein (load_all).
+from startup import StartupProfile
+startup = StartupProfile()
+startup.preload([
+    'numpy', 'sounddevice', 'pvporcupine', 'webrtcvad', 'yaml', 'sqlite3', 'urllib.request',
+    'cpu_scheduler', 'tts', 'command_router', 'fuzzy_intent', 'safe_runner', 'llm_engine', 'llm_cache', 'stt_engine',
+    'streaming_stt', 'audio_capture', 'latency_trace', 'orchestrator', 'interrupt_handler', 'keyword_spotter',
+])
+
 import numpy as np
-import sounddevice as sd
 import pvporcupine
 import webrtcvad
-try:
-    from resemblyzer import VoiceEncoder
-except Exception:
-    VoiceEncoder = None
-    print("Notice: 'resemblyzer' not installed. Speaker verification will be disabled.")
-import soundfile as sf # Hum Scipy ki jagah yeh use karenge
 
 # Hamare apne banaye hue scripts
-from tts import speak
-from intent_parser import parse_intent
+from tts import speak, speak_stream, stop_playback, start_tts_pool, stop_tts_pool, get_pool, warm_cache
+from command_router import get_router, external_match, KIND_INTENT, KIND_RENAME
+from intent_parser import parse_confirmation
+from fuzzy_intent import get_fuzzy_index
 from safe_runner import SafeRunner
-from jarvis_name_manager import handle_rename_command
-
-# --- Configuration ---
-CONFIG_PATH = os.path.join(os.path.expanduser('~/jarvis'), 'config.json')
-JARVIS_DIR = os.path.expanduser('~/jarvis')
-
-# Audio Recording settings
-STT_SAMPLE_RATE = 16000 # Whisper ke liye 16kHz
-VAD_SAMPLE_RATE = 16000 # VAD ke liye 16kHz
-VAD_FRAME_MS = 30
-VAD_FRAME_SIZE = int(VAD_SAMPLE_RATE * VAD_FRAME_MS / 1000)
-
-# Paths to our C++ tools
-WHISPER_CPP_PATH = os.path.join(JARVIS_DIR, 'whisper.cpp', 'build', 'bin', 'main')
-WHISPER_MODEL_PATH = os.path.join(JARVIS_DIR, 'whisper.cpp', 'models', 'ggml-tiny.en.bin')
-# --- YEH HAI CORRECT LLAMA PATH ---
-LLAMA_CPP_PATH = os.path.join(JARVIS_DIR, 'llama.cpp', 'build', 'bin', 'llama-cli')
-LLAMA_MODEL_PATH = os.path.join(JARVIS_DIR, 'llama.cpp', 'models', 'mistral-7b-openhermes.Q4_K_M.gguf')
-PIPER_BINARY = os.path.join(JARVIS_DIR, 'piper', 'piper')
+from speaker_auth import create_speaker_verifier
+from jarvis_name_manager import apply_rename
+from config_service import get_config_service
+from llm_engine import create_engine, prefetch, split_sentences, LLMError, DEFAULT_TEMPERATURE
+from llm_cache import create_llm_cache
+from audio_conditioning import condition, volume_stats, is_silent
+from stt_engine import create_stt_engine, STTError
+from streaming_stt import StreamingTranscriber
+from audio_capture import AudioCapture
+from latency_trace import create_tracer, mark_first
+from orchestrator import Orchestrator, Step, Voice
+from audio_player import get_player
+from interrupt_handler import EchoGate, vad_listener
+from cpu_scheduler import create_cpu_scheduler, get_scheduler, stage_threads
+from keyword_spotter import open_keyword_spotter
+
+# --- Configuration (paths aur sample rates upar, self-test se pehle) ---
+DEFAULT_PRE_ROLL_MS = 200 # Hotword se kitna pehle ka audio command recording mein
+VAD_HANGOVER_FRAMES = 25 # Itne non-speech frames (x VAD_FRAME_MS) ke baad recording band
+ACK_TIMEOUT_S = 5.0 # "Yes sir?" itni der mein na baje toh bhi recording shuru
+CONFIRM_TIMEOUT_S = 5 # confirm_prompt ke baad haan/nahi ka intezaar
+BACKGROUND_WAIT_S = 30.0 # Pehla command jaldi aaye toh background component (LLM/voiceprint) ka max intezaar
+
+# Baar baar bole jaane wale phrases: startup par PCM cache mein pre-render hote hain
+SYSTEM_PHRASES = [
+    ("Yes sir?", 'en_m'),
+    ("Executing.", 'en_m'),
+    ("Access Denied.", 'en_m'),
+    ("Soch raha hoon...", 'hi'),
+    ("Main sun nahi paaya, Sir.", 'hi'),
+    ("Uske liye main trained nahi hoon.", 'hi'),
+]
 
 # --- Global Objects ---
 config = {}
 porcupine = None
 vad = webrtcvad.Vad()
 vad.set_mode(3) # Aggressive
-speaker_encoder = None
-saved_speaker_embedding = None
+speaker_verifier = None # Command audio par hi voiceprint check (STT ke saath-saath)
 safe_runner = SafeRunner()
+llm_engine = None
+stt_engine = None
+capture = None # Ek hi hamesha-khula mic stream (ring buffer)
+last_hotword_index = None
+hotword_tid = None # Hotword thread jise audio core par rakha gaya
+tracer = None # Har interaction ka per-stage latency trace
+llm_cache = None # Baar baar pooche gaye LLM sawaalon ke jawab
+keyword_spotter = None # Enrolled commands Whisper ke bina (MFCC + DTW)
 
 # --- Helper Functions ---
 
-def load_all():
-    """Saari settings aur models ko memory mein load karta hai."""
-    global config, porcupine, saved_speaker_embedding
-    print("Jarvis ko start kar raha hoon... components load ho rahe hain...")
+# Yeh keys sirf restart par lagu hoti hain (process/model/hotword engine startup par bante hain)
+RESTART_CONFIG_KEYS = {
+    'PICOVOICE_ACCESS_KEY', 'PICOVOICE_KEYWORD_PATH', 'PICOVOICE_SENSITIVITY', 'SPEAKER_EMBED_PATH',
+    'LLM_BACKEND', 'STT_BACKEND', 'WHISPER_THREADS', 'LLAMA_THREADS', 'LLAMA_SERVER_PORT',
+    'CPU_SCHEDULER', 'AUDIO_CPUS', 'AUDIO_RT_PRIORITY',
+    'WHISPER_SERVER_PORT', 'LLAMA_CTX_SIZE', 'TRACE_DIR', 'TRACE_ENABLED', 'LLM_CACHE', 'LLM_CACHE_PATH',
+    'KWS_ENABLED', 'KWS_DIR',
+}
+
+def on_config_change(changed):
+    """Config service subscriber: jo keys live lagu ho sakti hain unhe turant lagao."""
+    if 'LOG_LEVEL' in changed:
+        setup_logging(changed['LOG_LEVEL'] or 'INFO')
+    if 'FUZZY_INTENT_THRESHOLD' in changed and changed['FUZZY_INTENT_THRESHOLD'] is not None:
+        get_fuzzy_index(changed['FUZZY_INTENT_THRESHOLD'])
+    if 'JARVIS_NAME' in changed:
+        log.info(f"Naya naam: {changed['JARVIS_NAME']} (hotword model wahi .ppn rehta hai)")
+        if llm_cache is not None and changed['JARVIS_NAME']:
+            llm_cache.extra_fillers = (changed['JARVIS_NAME'],)
+    if 'USER_NAME' in changed:
+        log.info(f"User ab: {changed['USER_NAME']}")
+    if 'MODE' in changed and get_scheduler() is not None:
+        # Naye CLI calls turant naye profile se; resident servers ke threads restart par
+        get_scheduler().set_mode(changed['MODE'] or 'balanced')
+        log.info(get_scheduler().report())
+    if 'KWS_MIN_MARGIN' in changed and keyword_spotter is not None and changed['KWS_MIN_MARGIN'] is not None:
+        keyword_spotter.min_margin = float(changed['KWS_MIN_MARGIN'])
+    pending = sorted(RESTART_CONFIG_KEYS.intersection(changed))
+    if pending:
+        log.warning(f"Config keys {pending} restart ke baad lagu hongi.")
+
+def open_hotword():
+    """Porcupine + shared mic ring. Hotword isi ke baad sun sakta hai (critical path)."""
+    global porcupine, capture
+    key_path = os.path.expanduser(config['PICOVOICE_KEYWORD_PATH'])
+    # Allow tuning Porcupine sensitivity via config (0.0-1.0). Higher = more sensitive.
+    sensitivity = float(config.get('PICOVOICE_SENSITIVITY', 0.75))
+    log.info(f"Porcupine sensitivity set to {sensitivity}")
     try:
-        with open(CONFIG_PATH, 'r') as f:
-            config = json.load(f)
-        print(f"Config loaded. Welcome, {config['USER_NAME']}.")
-    except Exception as e:
-        print(f"FATAL: config.json load nahi kar paaya! {e}")
-        return False
-    # Populate runtime tunables with defaults if not set
-    config.setdefault('WHISPER_THREADS', DEFAULT_WHISPER_THREADS)
-    config.setdefault('LLAMA_THREADS', DEFAULT_LLAMA_THREADS)
-    config.setdefault('LLAMA_N_PREDICT', DEFAULT_LLAMA_N)
-    config.setdefault('LLAMA_TIMEOUT', DEFAULT_LLAMA_TIMEOUT)
-    try:
-        key_path = os.path.expanduser(config['PICOVOICE_KEYWORD_PATH'])
-        # Allow tuning Porcupine sensitivity via config (0.0-1.0). Higher = more sensitive.
-        sensitivity = float(config.get('PICOVOICE_SENSITIVITY', 0.75))
-        print(f"Porcupine sensitivity set to {sensitivity}")
         porcupine = pvporcupine.create(
             access_key=config['PICOVOICE_ACCESS_KEY'],
             keyword_paths=[key_path],
             sensitivities=[sensitivity]
         )
-        print("Hotword engine loaded (Porcupine).")
     except Exception as e:
-        print(f"FATAL: Porcupine load nahi kar paaya! {e}")
-        return False
+        raise RuntimeError(f"Porcupine load nahi kar paaya! {e}")
+    log.info("Hotword engine loaded (Porcupine).")
     try:
-        embed_path = os.path.expanduser(config['SPEAKER_EMBED_PATH'])
-        saved_speaker_embedding = np.load(embed_path)
-        print("Speaker voiceprint loaded.")
+        # Mic ek hi baar khulta hai; hotword/VAD/verification sab isi ring se padhte hain
+        capture = AudioCapture(sample_rate=porcupine.sample_rate)
+        capture.start()
     except Exception as e:
-        print(f"WARNING: Speaker voiceprint nahi mila. 'python3 speaker_enroll.py' chala lein.")
-        pass
-    print("--- Jarvis is Ready (Makkhan Mode) ---")
-    # Speak may fail if piper/aplay not configured; wrap it so load_all still returns True
+        raise RuntimeError(f"Mic stream nahi khul paaya! {e}")
+
+def start_stt():
+    # Whisper model ek hi baar load hota hai (resident engine)
+    global stt_engine
+    try:
+        stt_engine = create_stt_engine(config, model_path=WHISPER_MODEL_PATH)
+        stt_engine.start()
+        log.info(f"STT backend started ({type(stt_engine).__name__}).")
+    except STTError as e:
+        log.warning(f"WARNING: STT backend start nahi hua: {e}")
+        stt_engine = None
+
+def start_tts():
+    # Piper voices ko ek baar load karke warm rakho
+    start_tts_pool()
+    log.info("TTS voices warm (Piper pool).")
+
+def load_text_pipeline():
+    global tracer, llm_cache, keyword_spotter
+    tracer = create_tracer(config)
+    get_router() # Rename patterns + intent keywords ek hi baar compile
+    get_fuzzy_index(config.get('FUZZY_INTENT_THRESHOLD'))
+    llm_cache = create_llm_cache(config)
+    keyword_spotter = open_keyword_spotter(config)
+
+def start_llm():
+    # LLM ko ek hi baar load karo (low-power mode mein LLM band hai)
+    global llm_engine
+    try:
+        engine = create_engine(config, model_path=LLAMA_MODEL_PATH)
+        engine.start()
+        llm_engine = engine
+        log.info(f"LLM backend started ({type(engine).__name__}); model background mein load ho raha hai.")
+    except LLMError as e:
+        log.warning(f"WARNING: LLM backend start nahi hua: {e}")
+
+def load_speaker_verifier():
+    # VoiceEncoder (torch) yahin ek baar load hota hai (har command par nahi)
+    global speaker_verifier
     try:
-        speak(f"Jarvis is ready, {config['USER_NAME']}.", lang='en_m')
+        speaker_verifier = create_speaker_verifier(config, sample_rate=porcupine.sample_rate)
     except Exception as e:
-        print(f"Non-fatal: TTS failed during startup: {e}")
-    return True
-
-def listen_for_hotword():
-    """Mic stream kholta hai aur sirf hotword sunta hai."""
-    print(f"\nHotword sun raha hoon... ('{config['JARVIS_NAME']}')")
-    hotword_event = threading.Event()
-
-    def audio_callback(indata, frames, time, status):
-        if status:
-            print(status)
-        try:
-            # Log a tiny bit of audio level info for debugging
-            try:
-                peak = float(np.max(np.abs(indata))) * 32767.0
-                rms = float(np.sqrt(np.mean(indata.astype(np.float64) ** 2)))
-                rms_db = 20.0 * np.log10(rms + 1e-9)
-                print(f"[HOTWORD AUDIO] peak={peak:.0f} rms_db={rms_db:.1f} dB")
-            except Exception:
-                pass
-            audio_frame = (indata * 32767).astype(np.int16).flatten()
-            keyword_index = porcupine.process(audio_frame)
-            if keyword_index >= 0:
-                print(f"\n[Hotword Detected!] -> {config['JARVIS_NAME']}")
-                hotword_event.set()
-                raise sd.CallbackStop # Ab yeh 'except' mein nahi phansega
-        except sd.CallbackStop:
-            raise # CallbackStop ko aage jaane do
-        except Exception as e: 
-            print(f"Hotword processing error: {e}")
+        log.warning(f"WARNING: Speaker verification load nahi hua: {e}")
 
+def load_all():
+    """
+    Saari settings aur models ko memory mein load karta hai.
+    Hotword tak zaroori cheezein thread pool mein saath-saath; LLM aur voiceprint model
+    hotword live hone ke baad background mein (startup.py).
+    """
+    global config
+    log.info("Jarvis ko start kar raha hoon... components load ho rahe hain...")
     try:
-        with sd.InputStream(
-            channels=1,
-            samplerate=porcupine.sample_rate,
-            blocksize=porcupine.frame_length,
-            dtype='float32',
-            callback=audio_callback
-        ):
-            hotword_event.wait(timeout=30.0)
-    except sd.CallbackStop:
-        return True # Hotword mila
+        with startup.timed('config'):
+            # Ek hi shared config: rename ya bahar se edit hote hi yahan bhi taaza (koi stale copy nahi)
+            config = get_config_service(CONFIG_PATH).load()
+        log.info(f"Config loaded. Welcome, {config['USER_NAME']}.")
+        setup_logging(config.get('LOG_LEVEL', 'INFO'))
     except Exception as e:
-        print(f"Hotword stream error: {e}")
-        return False
-
-    if not hotword_event.is_set():
-        print("Hotword timeout... (30s)")
+        log.error(f"FATAL: config.json load nahi kar paaya! {e}")
         return False
+    # Populate runtime tunables with defaults if not set
+    config.setdefault('LLAMA_N_PREDICT', DEFAULT_LLAMA_N)
+    config.setdefault('LLAMA_TIMEOUT', DEFAULT_LLAMA_TIMEOUT)
+    config.subscribe(on_config_change)
+    config.start_watching()
+    # Threads/affinity/nice: servers spawn hone se pehle hi plan taiyaar
+    with startup.timed('cpu_scheduler'):
+        scheduler = create_cpu_scheduler(config)
+
+    results = startup.run_parallel([
+        ('hotword+mic', open_hotword),
+        ('stt', start_stt),
+        ('tts_pool', start_tts),
+        ('text_pipeline', load_text_pipeline),
+    ])
+    for name in ('text_pipeline', 'hotword+mic'):
+        if isinstance(results[name], Exception):
+            log.error(f"FATAL: {name}: {results[name]}")
+            return False
+    if isinstance(results['tts_pool'], Exception):
+        log.warning(f"WARNING: Piper pool start nahi hua: {results['tts_pool']}")
+    if isinstance(results['stt'], Exception):
+        log.warning(f"WARNING: STT backend start nahi hua: {results['stt']}")
+    telemetry.start(float(config.get('TELEMETRY_INTERVAL', 10)))
+    threading.Thread(target=barge_in_loop, daemon=True).start()
+    startup.mark('hotword_live')
+    if scheduler is not None:
+        log.info(scheduler.report())
+    log.info(f"--- Jarvis is Ready (Makkhan Mode) --- hotword {startup.milestones['hotword_live']:.2f}s mein live")
+
+    # Bhaari aur kabhi-kabhi kaam aane wale: hotword ke saath-saath background mein
+    if config.get("MODE", "balanced") != "low-power":
+        startup.background('llm', start_llm)
+    startup.background('speaker_verifier', load_speaker_verifier)
+    # Cache warm-up (pehli baar hi synthesis hota hai, baad mein disk hit)
+    ready_phrase = (f"Jarvis is ready, {config['USER_NAME']}.", 'en_m')
+    startup.background('tts_cache', lambda: warm_cache(SYSTEM_PHRASES + [ready_phrase]))
+    if args.startup_profile:
+        startup.report_when_done()
+    # Voice queue mein: hotword abhi se sun raha hai, announcement ka intezaar nahi
+    voice.say(*ready_phrase)
     return True
 
-def verify_speaker(duration=3):
-    """3 second ke liye record karke speaker ko verify karta hai."""
-    if saved_speaker_embedding is None:
-        print("Verification skipped (no voiceprint).")
-        return True
-    print(f"Verifying {config['USER_NAME']}... 3 sec tak bolein...")
-    speak("Please verify.", lang='en_m')
-    try:
-        audio = sd.rec(int(duration * STT_SAMPLE_RATE), samplerate=STT_SAMPLE_RATE, channels=1, dtype='float32')
-        sd.wait()
-        current_audio = audio.flatten()
-        current_embedding = speaker_encoder.embed_utterance(current_audio)
-        similarity = np.dot(saved_speaker_embedding, current_embedding) / (np.linalg.norm(saved_speaker_embedding) * np.linalg.norm(current_embedding))
-        print(f"Similarity: {similarity:.2f}")
-        if similarity > 0.75:
-            print("STATUS: VERIFIED.")
-            return True
-        else:
-            print("STATUS: FAILED.")
-            return False
-    except Exception as e:
-        print(f"Speaker verification error: {e}")
-        return False
+def listen_for_hotword(timeout=30.0):
+    """
+    Shared capture ring se frames padh kar sirf hotword sunta hai.
+    Mic stream kabhi band/reopen nahi hota; timeout sirf main_loop ko idle kaam ka mauka deta hai.
+    """
+    global last_hotword_index, hotword_tid
+    log.info(f"\nHotword sun raha hoon... ('{config['JARVIS_NAME']}')")
+    if get_scheduler() is not None and hotword_tid != threading.get_native_id():
+        # Porcupine bhi LLM ke saath cores ke liye na lade (realtime nahi: yeh Python thread hai)
+        hotword_tid = threading.get_native_id()
+        get_scheduler().protect_thread('hotword', hotword_tid, realtime=False)
+    reader = capture.reader()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if safe_runner.jobs.pending.is_set():
+            announce_jobs()
+            reader = capture.reader() # Apni hi awaaz mein hotword na dhoondo
+        try:
+            frame = reader.read(porcupine.frame_length, timeout=1.0)
+        except ValueError:
+            # Hum ring se peeche reh gaye (overrun): abhi se dobara shuru
+            reader = capture.reader()
+            continue
+        if frame is None:
+            continue
+        try:
+            # Audio levels ab capture callback se telemetry ring mein jaate hain (per-frame print nahi)
+            audio_frame = (frame * 32767).astype(np.int16)
+            keyword_index = porcupine.process(audio_frame)
+            if keyword_index >= 0:
+                log.info(f"\n[Hotword Detected!] -> {config['JARVIS_NAME']}")
+                last_hotword_index = reader.position
+                return True
+        except Exception as e:
+            log.error(f"Hotword processing error: {e}")
 
-def record_command(timeout=7):
-    """User ka command record karta hai jab tak woh chup nahi ho jaate."""
-    print("Command sun raha hoon (7s timeout)...")
-    speak("Yes sir?", lang='en_m')
+    log.warning("Hotword timeout... (30s)")
+    return False
 
-    audio_frames = []
+def barge_in_loop():
+    """
+    Background thread: jab bhi jawab baj raha ho, mic par gated VAD. User beech mein bole toh
+    ek audio block ke andar chup, queue ki baaki awaazein cancel (hotword ki zaroorat nahi).
+    """
+    warned = False
+    while True:
+        if not voice.busy or not config.get('BARGE_IN', True):
+            time.sleep(0.05)
+            continue
+        if get_player(create=False) is None:
+            # aplay fallback: playback level pata nahi, toh EchoGate kuch gate nahi karta aur
+            # Jarvis ki apni awaaz hi "user speech" ban kar jawab rok deti. Bina gate barge-in nahi.
+            if not warned:
+                log.warning("[Barge-in] Output stream (audio_player) nahi hai, barge-in band.")
+                warned = True
+            time.sleep(0.05)
+            continue
+        try:
+            position = vad_listener(capture=capture, until=lambda: not voice.busy)
+        except Exception as e:
+            log.warning(f"[Barge-in] Listener band: {e}")
+            return
+        if position is not None:
+            voice.stop()
+            ctx = orchestrator.responding
+            if ctx is not None and ctx.trace is not None:
+                ctx.trace.meta['barge_in_s'] = round(position, 2)
+
+def announce_jobs():
+    """
+    Khatam hue background jobs (apt update waghera) idle waqt bol do, interaction ke beech nahi.
+    Voice queue se, taaki barge-in/stop inhe bhi rok sake; bolna (ya rukna) poora hone tak wait
+    karta hai, phir hotword reader apni awaaz ke baad se shuru hota hai.
+    """
+    speech = [voice.say(job.summary(), lang='hi') for job in safe_runner.jobs.pop_notifications()]
+    concurrent.futures.wait(speech)
+
+def record_command(timeout=7, on_audio=None, start_index=None, trace=None, ack=None):
+    """
+    User ka command record karta hai jab tak woh chup nahi ho jaate.
+    Audio shared capture ring se aata hai. 'start_index' (hotword) se CAPTURE_PRE_ROLL_MS pehle
+    ka hissa, taaki hotword ke turant baad ka pehla syllable na chhoote, sirf asli speech milne ke
+    baad aage joda jaata hai (VAD ya hangover mein nahi gina jaata). "Yes sir?" bolne wala hissa
+    (hamari apni awaaz) skip hota hai.
+    on_audio: har recorded frame ke saath call hota hai (streaming STT ke liye).
+    trace: speech start/end ke marks yahin lagte hain.
+    ack: "Yes sir?" ka Future (orchestrator ki voice queue mein baj raha). Diya ho toh yahan bolne ka
+    intezaar nahi: recording pehle se armed hai. Output stream (audio_player) ho toh ack ke dauraan bhi
+    frames playback-energy gated VAD (EchoGate) se jaate hain, yaani ack ke upar bola gaya command bhi
+    pakda jaata hai; warna ack khatam hote hi live frames VAD mein.
+    """
+    log.info("Command sun raha hoon (7s timeout)...")
+    pre_roll = capture.ms_to_samples(int(config.get('CAPTURE_PRE_ROLL_MS', DEFAULT_PRE_ROLL_MS)))
+    if start_index is None:
+        start_index = capture.position
+    rec_start = max(start_index - pre_roll, capture.ring.oldest())
+    ack_start = capture.position
+    if ack is None:
+        speak("Yes sir?", lang='en_m')
+    player = get_player(create=False)
+    echo_gate = EchoGate(player, vad=vad) if ack is not None and player is not None else None
+    ack_end = None
+    stop_index = None
+
+    def vad_frames():
+        """
+        (position, frame): sirf live frames (ack ke baad, ya gate ho toh turant). Pre-roll VAD mein
+        nahi jaata: usme "Jarvis" ki poonch hai, jo speech start kar deti aur hangover pause mein
+        hi khatam ho jaata.
+        """
+        nonlocal ack_end, stop_index
+        if ack is not None and echo_gate is None:
+            # Apni awaaz khatam hone tak (woh VAD mein nahi jaani chahiye)
+            concurrent.futures.wait([ack], timeout=ACK_TIMEOUT_S)
+        ack_end = capture.position if echo_gate is None else ack_start # Gate ho toh koi gap nahi
+        stop_index = ack_end + timeout * VAD_SAMPLE_RATE
+        reader = capture.reader(ack_end)
+        while reader.position < stop_index:
+            frame_pos = reader.position
+            frame = reader.read(VAD_FRAME_SIZE, timeout=1.0)
+            if frame is None:
+                log.error("Recording stream error: mic se audio aana band ho gaya.")
+                return
+            yield frame_pos, frame
+
+    kept = [] # Recording ke (start, end) ranges ring mein; frames copy nahi hote
+    range_start = None
     is_speech_started = False
     silence_frames = 0
-    max_silence_frames = 25
+    max_silence_frames = VAD_HANGOVER_FRAMES
 
-    def vad_callback(indata, frames, time, status):
-        nonlocal is_speech_started, silence_frames
-        if status:
-            print(status)
-        try:
-            # Debug: show VAD decisions and level
-            audio_data_float = indata.flatten()
-            try:
-                peak = float(np.max(np.abs(audio_data_float))) * 32767.0
-                rms = float(np.sqrt(np.mean(audio_data_float.astype(np.float64) ** 2)))
-                rms_db = 20.0 * np.log10(rms + 1e-9)
-                print(f"[VAD AUDIO] peak={peak:.0f} rms_db={rms_db:.1f} dB")
-            except Exception:
-                pass
-            audio_data_int16 = (audio_data_float * 32767).astype(np.int16)
-            audio_bytes = audio_data_int16.tobytes()
-            is_speech = vad.is_speech(audio_bytes[:VAD_FRAME_SIZE*2], VAD_SAMPLE_RATE)
-            print(f"[VAD] is_speech={is_speech} is_speech_started={is_speech_started} silence_frames={silence_frames}")
+    try:
+        for frame_pos, audio_data_float in vad_frames():
+            # "Yes sir?" abhi baj raha hai (ya uski echo): apni awaaz nahi, sirf user ki awaaz speech maano
+            acking = echo_gate is not None and (not ack.done() or echo_gate.playing())
+            if acking:
+                is_speech = echo_gate.is_user_speech(audio_data_float)
+            else:
+                audio_data_int16 = (audio_data_float * 32767).astype(np.int16)
+                is_speech = vad.is_speech(audio_data_int16.tobytes(), VAD_SAMPLE_RATE)
+            telemetry.vad(is_speech)
+            log.debug(f"[VAD] is_speech={is_speech} is_speech_started={is_speech_started} silence_frames={silence_frames}")
 
             if is_speech_started:
-                audio_frames.append(audio_data_float)
-                if not is_speech:
+                if on_audio is not None:
+                    on_audio(audio_data_float)
+                if is_speech or acking:
+                    # Ack ke dauraan gated frames chup nahi gine jaate (user ack khatam hone ka
+                    # intezaar kar raha ho sakta hai): hangover ack ke baad se
+                    silence_frames = 0
+                else:
                     silence_frames += 1
                     if silence_frames > max_silence_frames:
-                        print("[Silence Detected] -> Recording stopped.")
-                        raise sd.CallbackStop # Ab yeh 'except' mein nahi phansega
-                else:
-                    silence_frames = 0
+                        log.info("[Silence Detected] -> Recording stopped.")
+                        if trace is not None:
+                            trace.mark('speech_end')
+                        kept.append((range_start, frame_pos + VAD_FRAME_SIZE))
+                        range_start = None
+                        break
             elif is_speech:
-                print("[Speech Detected] -> Recording started...")
+                log.info("[Speech Detected] -> Recording started...")
+                if trace is not None:
+                    trace.mark('speech_start')
                 is_speech_started = True
-                audio_frames.append(audio_data_float)
-        except sd.CallbackStop:
-            raise # CallbackStop ko aage jaane do
-        except Exception as e:
-            print(f"VAD record error: {e}")
-
-    try:
-        with sd.InputStream(
-            samplerate=VAD_SAMPLE_RATE,
-            blocksize=VAD_FRAME_SIZE,
-            channels=1,
-            dtype='float32',
-            callback=vad_callback
-        ):
-            sd.sleep(timeout * 1000)
-
-        if not is_speech_started:
-            print("Timeout: Kuch bola hi nahi.")
-            return None
-    except sd.CallbackStop:
-        pass # Recording safalta se poori hui
-    except Exception as e:
-        print(f"Recording stream error: {e}")
+                # Asli speech mili: ab pre-roll (hotword ke turant baad ka syllable) aage jodo
+                if rec_start < ack_start:
+                    kept.append((rec_start, ack_start))
+                    if on_audio is not None:
+                        on_audio(capture.read_range(rec_start, ack_start))
+                range_start = frame_pos
+                if on_audio is not None:
+                    on_audio(audio_data_float)
+    except ValueError as e:
+        log.error(f"Recording stream error: {e}")
         return None
 
-    full_audio = np.concatenate(audio_frames)
+    if not is_speech_started:
+        log.warning("Timeout: Kuch bola hi nahi.")
+        return None
+    if range_start is not None:
+        # Timeout tak bolte rahe: jitna mila utna
+        kept.append((range_start, min(capture.position, stop_index or capture.position)))
+        if trace is not None:
+            trace.mark('speech_end')
+
+    # Ek hi baar ring se copy (per-frame append + concatenate nahi)
+    full_audio = np.concatenate([capture.read_range(a, b) for a, b in kept if b > a])
     return full_audio
 
-def run_whisper_stt(audio_data):
-    """Audio data ko file mein save, amplify, aur fir whisper.cpp se STT chalata hai."""
-    print("Transcribing... (Whisper.cpp chal raha hai)")
+def run_whisper_stt(audio_data, streaming=None):
+    """
+    Audio ko memory mein hi condition karke (no ffmpeg, no temp WAV) resident whisper engine se STT chalata hai.
+    streaming: recording ke dauraan chal raha StreamingTranscriber; tab sirf bacha hua tail decode hota hai.
+    """
+    log.info("Transcribing... (Whisper.cpp chal raha hai)")
     try:
-        # 1. Audio ko ORIGINAL file mein save karo
-        temp_audio_file = os.path.join(JARVIS_DIR, "temp_stt_input.wav")
-        sf.write(temp_audio_file, audio_data, STT_SAMPLE_RATE, subtype='PCM_16')
-
-        # --- NAYA STEP: Audio ko FFMPEG se amplify karo ---
-        # Hum check karenge ki file silent toh nahi hai
-        try:
-            # Ek chhota check chalao
-            chk_command = ["ffmpeg", "-i", temp_audio_file, "-af", "volumedetect", "-f", "null", "-"]
-            # Correctly capture combined stdout and stderr
-            result = subprocess.run(chk_command, text=True, capture_output=True)
-
-            # Check both stdout and stderr for the volume info
-            output = result.stdout + result.stderr
-            if "mean_volume: -inf" in output:
-                print("Audio poori tarah silent hai. Skipping.")
+        if streaming is not None:
+            if is_silent(audio_data):
+                streaming.cancel()
+                log.info("Audio poori tarah silent hai. Skipping.")
                 return None
-        except Exception as e:
-            print(f"FFmpeg check error: {e}") # Agar ffmpeg na ho
-
-        print("Audio ko amplify kar raha hoon (taaki Whisper sun sake)...")
-        amplified_audio_file = os.path.join(JARVIS_DIR, "temp_stt_amplified.wav")
-
-        # Audio ko normalize (ek standard loud level par) karo
-        ffmpeg_command = [
-    "ffmpeg",
-    "-i", temp_audio_file,
-    "-af", "loudnorm=I=-16:TP=-1.5:LRA=11", # Volume badhao
-    "-ar", "16000",                        # 16kHz sample rate par force karo
-    "-ac", "1",                            # 1 channel (Mono) par force karo
-    "-c:a", "pcm_s16le",                   # 16-bit PCM format par force karo
-    "-y",                                  # Puraani file overwrite karo
-    "-hide_banner",
-    "-loglevel", "error",
-    amplified_audio_file
-]
-        subprocess.run(ffmpeg_command, check=True)
-        print("Amplification complete.")
-        # --------------------------------------------------
+            try:
+                text_result = streaming.finish()
+            except STTError as e:
+                log.error(f"Whisper STT backend error: {e}")
+                return None
+            log.info(f"[whisper] streaming decodes={streaming.decodes}")
+            if not text_result:
+                log.warning("Whisper ne transcribe kiya, par koi text nahi mila (shayad sirf silence tha).")
+                return None
+            log.info(f"STT Result: '{text_result}'")
+            return text_result
 
-        # 2. whisper.cpp command ko AMPLIFIED file par chalao
-        if not os.path.exists(WHISPER_CPP_PATH):
-            print(f"ERROR: Whisper binary not found at {WHISPER_CPP_PATH}")
+        # 1. Silence check + DC removal + gain normalize, sab NumPy mein
+        conditioned = condition(audio_data)
+        if conditioned is None:
+            log.info("Audio poori tarah silent hai. Skipping.")
             return None
-        whisper_threads = str(int(config.get('WHISPER_THREADS', DEFAULT_WHISPER_THREADS)))
-        stt_command = [
-            WHISPER_CPP_PATH,
-            "-m", WHISPER_MODEL_PATH,
-            "-f", amplified_audio_file, # Hum amplified file use kar rahe hain
-            "-t", whisper_threads,
-            "-l", "auto",
-            "-otxt"
-        ]
-        try:
-            proc = subprocess.run(stt_command, check=True, capture_output=True, text=True, timeout=120)
-            if proc.stdout:
-                print(f"[whisper] stdout (truncated): {proc.stdout.strip()[:1000]}")
-            if proc.stderr:
-                print(f"[whisper] stderr (truncated): {proc.stderr.strip()[:1000]}")
-        except subprocess.CalledProcessError as e:
-            print(f"Whisper process failed: returncode={e.returncode} stdout={e.stdout} stderr={e.stderr}")
+        mean_db, max_db = volume_stats(conditioned)
+        log.info(f"Audio conditioned in memory (mean={mean_db:.1f} dB, peak={max_db:.1f} dB).")
+
+        # 2. PCM seedha resident engine ko (model pehle se loaded)
+        if stt_engine is None:
+            log.error("ERROR: STT backend available nahi hai.")
             return None
-        except Exception as e:
-            print(f"Whisper subprocess error: {e}")
+        try:
+            transcript = stt_engine.transcribe(conditioned, STT_SAMPLE_RATE)
+        except STTError as e:
+            log.error(f"Whisper STT backend error: {e}")
             return None
 
-        # 3. Output file ko padho
-        output_txt_file = amplified_audio_file + ".txt"
-        if not os.path.exists(output_txt_file):
-            print(f"Whisper output file not found: {output_txt_file}")
-            text_result = ""
-        else:
-            with open(output_txt_file, 'r') as f:
-                text_result = f.read().strip()
-
-        # 4. Temp files delete karo
-        os.remove(temp_audio_file)
-        os.remove(amplified_audio_file)
-        if os.path.exists(output_txt_file):
-            os.remove(output_txt_file)
+        for seg in transcript.segments:
+            conf = "n/a" if seg.confidence is None else f"{seg.confidence:.2f}"
+            log.info(f"[whisper] {seg.start:.2f}-{seg.end:.2f}s conf={conf}: {seg.text}")
+        text_result = transcript.text
 
         if not text_result:
-            print("Whisper ne transcribe kiya, par koi text nahi mila (shayad sirf silence tha).")
+            log.warning("Whisper ne transcribe kiya, par koi text nahi mila (shayad sirf silence tha).")
             return None
 
-        print(f"STT Result: '{text_result}'")
+        log.info(f"STT Result: '{text_result}'")
         return text_result
 
     except Exception as e:
-        print(f"Whisper STT error: {e}")
+        log.error(f"Whisper STT error: {e}")
         return None
 
-def run_llama_llm(prompt_text):
-    """LLM ko prompt bhejta hai aur response laata hai."""
+def run_llama_llm(prompt_text, ctx, stream_lang=None):
+    """
+    LLM ko prompt bhejta hai aur response laata hai. Saari awaazein ctx (orchestrator Context) ki
+    voice queue mein: "Soch raha hoon..." filler bhi, taaki barge-in/stop use rok sake aur pehla
+    sentence hamesha filler ke baad baje. LLM filler ke saath hi chalta hai.
+    stream_lang diya ho toh jawab (aur error messages) sentence generate hote hi voice queue mein
+    bolta hai; streamed jawab ke liye None lautta hai (uska text bolne wale kaam ke andar cache hota hai).
+    """
+    trace = ctx.trace
+
+    def fail(message):
+        if stream_lang:
+            ctx.say(message, lang='hi', trace=True)
+        return message
+
     if config.get("MODE", "balanced") == "low-power":
-        print("LLM disabled in low-power mode.")
-        return "Maaf kijiye, main abhi low-power mode mein hoon."
-    print(f"Thinking... (LLM chal raha hai: {prompt_text})")
-    speak("Soch raha hoon...", lang='hi')
+        log.warning("LLM disabled in low-power mode.")
+        return fail("Maaf kijiye, main abhi low-power mode mein hoon.")
+    n_pred = int(config.get('LLAMA_N_PREDICT', DEFAULT_LLAMA_N))
+    timeout_val = int(config.get('LLAMA_TIMEOUT', DEFAULT_LLAMA_TIMEOUT))
+    cache_params = {"n_predict": n_pred, "temperature": DEFAULT_TEMPERATURE}
+    cache_model = getattr(llm_engine, 'model_path', LLAMA_MODEL_PATH)
+
+    # Cache hit: na "Soch raha hoon...", na generation -- seedha TTS
+    cached = llm_cache.get(prompt_text, cache_model, cache_params) if llm_cache else None
+    if cached:
+        log.info(f"LLM cache hit: '{cached}' ({llm_cache.stats()})")
+        if trace is not None:
+            trace.mark('action_start')
+            trace.mark('first_token')
+            trace.meta['llm_cache'] = 'hit'
+        if stream_lang:
+            ctx.say(cached, lang=stream_lang, trace=True)
+        return cached
+    if trace is not None and llm_cache:
+        trace.meta['llm_cache'] = 'miss'
+
+    log.info(f"Thinking... (LLM chal raha hai: {prompt_text})")
+    ctx.say("Soch raha hoon...", lang='hi')
     full_prompt = f"User: {prompt_text}\nJarvis:"
-    try:
-        if not os.path.exists(LLAMA_CPP_PATH):
-            print(f"ERROR: Llama binary not found at {LLAMA_CPP_PATH}")
-            return "Maaf kijiye, LLM binary missing."
-        llm_command = [
-            LLAMA_CPP_PATH,
-            "-m", LLAMA_MODEL_PATH,
-            "-p", full_prompt,
-            "-n", "128",
-            "-t", "3",
-            "--temp", "0.7",
-            "-e"
-        ]
-        try:
-            llama_threads = str(int(config.get('LLAMA_THREADS', DEFAULT_LLAMA_THREADS)))
-            n_pred = str(int(config.get('LLAMA_N_PREDICT', DEFAULT_LLAMA_N)))
-            timeout_val = int(config.get('LLAMA_TIMEOUT', DEFAULT_LLAMA_TIMEOUT))
-            # Inject threads and n_predict into command (respect overrides)
-            # Replace -t and -n entries
-            for i, v in enumerate(llm_command):
-                if v == '-t' and i + 1 < len(llm_command):
-                    llm_command[i+1] = llama_threads
-                if v in ('-n', '-N', '--n-predict') and i + 1 < len(llm_command):
-                    llm_command[i+1] = n_pred
-
-            result = subprocess.run(llm_command, check=True, capture_output=True, text=True, timeout=timeout_val)
-        except subprocess.CalledProcessError as e:
-            print(f"LLM process failed: returncode={e.returncode} stdout={e.stdout[:1000]} stderr={e.stderr[:1000]}")
-            return "Maaf kijiye, LLM process fail hua."
-        except Exception as e:
-            print(f"LLM subprocess error: {e}")
-            return "Maaf kijiye, LLM timeout ya error hua."
-
-        raw_output = result.stdout
-        response = raw_output.split(full_prompt, 1)[-1].strip()
-        response = response.split("\n")[0].strip()
-        print(f"LLM Result: '{response}'")
+    startup.wait('llm', timeout=BACKGROUND_WAIT_S) # Startup ke turant baad pehla sawaal
+    if llm_engine is None:
+        log.error("ERROR: LLM backend available nahi hai.")
+        return fail("Maaf kijiye, LLM binary missing.")
+    if trace is not None:
+        trace.mark('action_start')
+
+    def remember(response):
+        log.info(f"LLM Result: '{response}'")
+        if llm_cache and response:
+            llm_cache.put(prompt_text, cache_model, cache_params, response)
         return response
+
+    if stream_lang:
+        # Generation abhi shuru (filler bajte waqt bhi); sentences voice queue mein filler ke baad
+        tokens = prefetch(llm_engine.stream(full_prompt, n_predict=n_pred, timeout=timeout_val))
+        if trace is not None:
+            tokens = mark_first(tokens, trace, 'first_token')
+
+        def speak_answer():
+            try:
+                response = speak_stream(split_sentences(tokens), lang=stream_lang, trace=trace)
+            except LLMError as e:
+                log.error(f"LLM backend error: {e}")
+                response = None
+                message = "Maaf kijiye, LLM timeout ya error hua."
+            except Exception as e:
+                log.error(f"LLM error: {e}")
+                response = None
+                message = "Maaf kijiye, sochte waqt ek error aa gaya."
+            else:
+                message = "Uske liye main trained nahi hoon."
+            if not response:
+                speak(message, lang='hi', trace=trace)
+                return message
+            return remember(response)
+
+        ctx.run_voice(speak_answer)
+        return None
+    try:
+        raw_output = llm_engine.complete(full_prompt, n_predict=n_pred, timeout=timeout_val)
+        if trace is not None:
+            trace.mark('first_token')
+        response = raw_output.strip().split("\n")[0].strip()
+    except LLMError as e:
+        log.error(f"LLM backend error: {e}")
+        return fail("Maaf kijiye, LLM timeout ya error hua.")
     except Exception as e:
-        print(f"LLM error: {e}")
-        return "Maaf kijiye, sochte waqt ek error aa gaya."
+        log.error(f"LLM error: {e}")
+        return fail("Maaf kijiye, sochte waqt ek error aa gaya.")
+    return remember(response)
+
+def step_record(ctx):
+    """Hotword ke baad: "Yes sir?" voice queue mein, recording usi waqt armed."""
+    # Streaming STT: user ke bolte-bolte hi background mein decode (sirf resident engine par)
+    streaming = None
+    if config.get('STT_STREAMING', True) and stt_engine is not None and stt_engine.resident:
+        streaming = StreamingTranscriber(
+            stt_engine, STT_SAMPLE_RATE, preprocess=condition,
+            on_partial=lambda text: log.info(f"[Partial STT] '{text}'")
+        ).start()
+    ack = ctx.say("Yes sir?", lang='en_m')
+    audio_command = record_command(on_audio=streaming.feed if streaming else None,
+                                   start_index=last_hotword_index, trace=ctx.trace, ack=ack)
+    if audio_command is None:
+        if streaming:
+            streaming.cancel()
+        ctx.trace.meta['route'] = 'no_command'
+        ctx.done = True
+        return
+    ctx.audio = audio_command
+    ctx.streaming = streaming
+    # Voiceprint isi audio par, STT ke saath-saath; sirf requires_auth command iska wait karega
+    ctx.verification = submit_verification(audio_command)
+
+def submit_verification(audio):
+    """
+    Voiceprint check shuru karo. VoiceEncoder abhi background mein load ho raha ho toh
+    lazy check: sirf requires_auth command hi uska intezaar karega (fail closed).
+    """
+    if speaker_verifier is not None:
+        return speaker_verifier.submit(audio)
+    loading = startup.pending('speaker_verifier')
+    if loading is None:
+        return True # Verification configured nahi (resemblyzer/voiceprint nahi)
+
+    def verify_when_loaded():
+        if not startup.wait('speaker_verifier', timeout=BACKGROUND_WAIT_S):
+            return False
+        return speaker_verifier.submit(audio)() if speaker_verifier is not None else True
+    return verify_when_loaded
+
+def step_spot(ctx):
+    """
+    Enrolled command (keyword_enroll.py) ho toh Whisper aur regex routing dono skip: MFCC templates
+    se DTW match, kuch ms mein. Shak ho (threshold ya margin se bahar) toh normal STT path.
+    """
+    if keyword_spotter is None:
+        return
+    try:
+        spot = keyword_spotter.spot(ctx.audio)
+    except Exception as e:
+        log.warning(f"[KWS] Spotting fail hua, Whisper se: {e}")
+        return
+    ctx.trace.meta['kws_ms'] = round(spot.elapsed_ms, 1)
+    if not spot.accepted:
+        if spot.intent:
+            log.info(f"[KWS] Pakka nahi ({spot.intent}, dist {spot.distance}, margin {spot.margin}); Whisper se.")
+        return
+    log.info(f"[KWS] '{spot.intent}' (dist {spot.distance} / {spot.threshold}, margin {spot.margin}, "
+             f"{spot.elapsed_ms:.1f} ms) -- Whisper skip.")
+    if ctx.streaming:
+        ctx.streaming.cancel()
+    ctx.spotted = spot
+    ctx.text = f"[kws] {spot.intent}"
+    ctx.trace.mark('stt_done')
+    ctx.trace.meta['stt'] = 'kws'
+    ctx.trace.meta['kws_distance'] = spot.distance
+    ctx.trace.meta['kws_margin'] = spot.margin
+    # Router ke intent match jaisa hi: step_act ko farak nahi padta ki text kahan se aaya
+    ctx.routes = [external_match(spot.intent, 'kws')]
+    ctx.trace.mark('route_done')
+
+def step_transcribe(ctx):
+    if getattr(ctx, 'spotted', None):
+        return
+    ctx.text = run_whisper_stt(ctx.audio, streaming=ctx.streaming)
+    ctx.trace.mark('stt_done')
+    if not ctx.text:
+        ctx.trace.meta['route'] = 'no_text'
+        ctx.say("Main sun nahi paaya, Sir.", lang='hi', trace=True)
+        ctx.done = True
+
+def step_route(ctx):
+    if getattr(ctx, 'spotted', None):
+        return
+    # Rename patterns + intent keywords: ek hi compiled pass, ranked results
+    ctx.routes = get_router().match(ctx.text)
+    ctx.trace.mark('route_done')
+    log.info(f"[Router] {[(m.kind, m.name, m.phrase) for m in ctx.routes] or 'koi match nahi'}")
+
+def step_act(ctx):
+    """Rename / whitelist command / LLM. Fillers voice queue mein, kaam saath-saath."""
+    trace = ctx.trace
+    text_command = ctx.text
+    routes = ctx.routes
+    response = None
+    lang_to_speak = 'hi' 
+    already_spoken = False
+    rename = next((m for m in routes if m.kind == KIND_RENAME), None)
+    if rename:
+        response = apply_rename(rename.name, rename.argument.lower())
+    if response:
+        lang_to_speak = 'hi'
+        trace.meta['route'] = 'rename'
+    if not response:
+        intent = next((m.name for m in routes if m.kind == KIND_INTENT), None)
+        if not intent and config.get('FUZZY_INTENT', True):
+            intent = fuzzy_intent(text_command, trace)
+        if intent:
+            trace.meta.setdefault('route', f'intent:{intent}')
+            if not (safe_runner.get_command_details(intent) or {}).get('confirm_prompt'):
+                ctx.say("Executing.", lang='en_m') # Bajta rahe, command abhi chalao
+            trace.mark('action_start')
+            verification = ctx.verification
+            status, msg = safe_runner.execute(intent, is_authenticated=verification)
+            if getattr(verification, 'score', None) is not None:
+                trace.meta['speaker'] = verification.user
+                trace.meta['speaker_score'] = round(verification.score, 3)
+                trace.meta['speaker_wait_ms'] = round(verification.waited_ms, 1)
+            if status == "confirm_required":
+                # Haan/nahi agle step (step_confirm) mein
+                ctx.confirm_intent = intent
+                ctx.confirm_prompt = msg
+                msg = None
+            response = msg
+            lang_to_speak = 'en_m'
+        else:
+            if config.get("MODE", "balanced") != "low-power":
+                 lang_to_speak = 'en_m'
+                 trace.meta['route'] = 'llm'
+                 if config.get('LLM_STREAM', True):
+                     # Sentences generate hote hi bol diye jaate hain; voice queue mein, taaki
+                     # jawab bajte waqt hotword phir se suna ja sake
+                     run_llama_llm(text_command, ctx, stream_lang=lang_to_speak)
+                     already_spoken = True
+                 else:
+                     response = run_llama_llm(text_command, ctx)
+            else:
+                trace.meta['route'] = 'low_power'
+                response = "Yeh command main low power mode mein nahi chala sakta."
+                lang_to_speak = 'hi'
+    ctx.response = response
+    ctx.lang = lang_to_speak
+    ctx.already_spoken = already_spoken
+
+def step_confirm(ctx):
+    """
+    confirm_prompt wale commands (update/reboot): prompt bolo, jawab record karo aur saaf "haan" par hi
+    confirmed=True ke saath dobara execute. Nahi, chup ya samajh na aaye toh command nahi chalta.
+    """
+    intent = getattr(ctx, 'confirm_intent', None)
+    if not intent:
+        return
+    prompt = ctx.say(ctx.confirm_prompt, lang='hi')
+    # Prompt hi "ack" hai: uske upar bola gaya jawab bhi EchoGate se pakda jaata hai
+    audio = record_command(timeout=CONFIRM_TIMEOUT_S, ack=prompt)
+    answer = run_whisper_stt(audio) if audio is not None else None
+    confirmed = parse_confirmation(answer)
+    log.info(f"[Confirm] {intent}: jawab {answer!r} -> {confirmed}")
+    ctx.trace.meta['confirmed'] = confirmed
+    ctx.already_spoken = False
+    if not confirmed:
+        ctx.response = "Theek hai, main yeh command nahi chala raha."
+        ctx.lang = 'hi'
+        return
+    ctx.say("Executing.", lang='en_m')
+    status, msg = safe_runner.execute(intent, is_authenticated=ctx.verification, confirmed=True)
+    ctx.response = msg
+    ctx.lang = 'en_m'
+
+def step_respond(ctx):
+    if ctx.already_spoken:
+        pass
+    elif ctx.response:
+        ctx.say(ctx.response, lang=ctx.lang, trace=True)
+    else:
+        ctx.say("Uske liye main trained nahi hoon.", lang='hi', trace=True)
+
+# Pipeline ke steps (orchestrator.replace_step/add_step se badle ja sakte hain)
+INTERACTION_STEPS = [
+    Step('record', step_record),
+    Step('spot', step_spot),
+    Step('transcribe', step_transcribe),
+    Step('route', step_route),
+    Step('act', step_act),
+    Step('confirm', step_confirm),
+    Step('respond', step_respond),
+]
+
+def begin_trace():
+    return tracer.begin({
+        "whisper_threads": stage_threads('stt', config.get('WHISPER_THREADS')),
+        "llama_threads": stage_threads('llm', config.get('LLAMA_THREADS')),
+        "stt_streaming": bool(config.get('STT_STREAMING', True)),
+        "vad_hangover_ms": VAD_HANGOVER_FRAMES * VAD_FRAME_MS,
+    })
+
+# speak/tracer ko call ke waqt dhoondo (replay inhe badal deta hai)
+voice = Voice(lambda *a, **k: speak(*a, **k), stop_playback=lambda: stop_playback())
+orchestrator = Orchestrator(
+    INTERACTION_STEPS, voice,
+    listen=lambda: listen_for_hotword(),
+    on_idle=lambda: get_pool().health_check(), # Idle timeout: crash hue Piper workers ko abhi restart kar do
+    begin_trace=lambda: begin_trace(),
+    finish_trace=lambda trace: tracer.finish(trace),
+)
+
+def handle_interaction(trace):
+    """Hotword ke baad ek poora interaction: record -> STT -> route -> action -> jawab (jawab bajne tak block)."""
+    return orchestrator.run_once(trace)
+
+def fuzzy_intent(text_command, trace):
+    """
+    Exact router miss hua: STT ki galti (tarik/tareekh, rum/ram) maan kar fuzzy/phonetic index try karo.
+    Danger commands (requires_auth) fuzzy match se kabhi nahi chalte -- unke liye exact keyword chahiye.
+    """
+    index = get_fuzzy_index()
+    match = index.best(text_command)
+    if match is None:
+        return None
+    details = safe_runner.get_command_details(match.intent)
+    if details and details.get('requires_auth'):
+        log.info(f"[Fuzzy] '{match.heard}' ~ '{match.keyword}' ({match.score}) -> {match.intent} skip: danger command.")
+        return None
+    trace.meta['route'] = f'fuzzy:{match.intent}'
+    trace.meta['fuzzy_score'] = match.score
+    if config.get("MODE", "balanced") != "low-power":
+        saved = index.record_saved_llm_call()
+        log.info(f"[Fuzzy] '{match.heard}' ~ '{match.keyword}' ({match.score}) -> {match.intent}; "
+                 f"LLM call bachi (total {saved}).")
+    else:
+        log.info(f"[Fuzzy] '{match.heard}' ~ '{match.keyword}' ({match.score}) -> {match.intent}")
+    return match.intent
 
 # --- Main Loop (Asli Jarvis Yahaan Hai) ---
 def main_loop():
     if not load_all():
+        if args.startup_profile:
+            print(startup.report()) # Kahan atka, yeh bhi dikhe
         return
-    while True:
-        if not listen_for_hotword():
-            continue
-        #if not verify_speaker():
-        #    speak("Access Denied.", lang='en_m')
-        #    continue
-        audio_command = record_command()
-        if audio_command is None:
-            continue
-        text_command = run_whisper_stt(audio_command)
-        if not text_command:
-            speak("Main sun nahi paaya, Sir.", lang='hi')
-            continue
-
-        response = None
-        lang_to_speak = 'hi' 
-        response = handle_rename_command(text_command)
-        if response:
-            lang_to_speak = 'hi'
-        if not response:
-            intent = parse_intent(text_command)
-            if intent:
-                speak("Executing.", lang='en_m')
-                status, msg = safe_runner.execute(intent, is_authenticated=True)
-                response = msg
-                lang_to_speak = 'en_m'
-            else:
-                if config.get("MODE", "balanced") != "low-power":
-                     response = run_llama_llm(text_command)
-                     lang_to_speak = 'en_m'
-                else:
-                    response = "Yeh command main low power mode mein nahi chala sakta."
-                    lang_to_speak = 'hi'
-        if response:
-            speak(response, lang=lang_to_speak)
-        else:
-            speak("Uske liye main trained nahi hoon.", lang='hi')
+    # Hotword -> steps (asyncio task) -> jawab voice queue mein; jawab bajte waqt hotword phir live
+    asyncio.run(orchestrator.run())
 
-if __name__ == "__main__":
+if __name__ == "__main__" and args.replay:
+    from replay import run_replay, COMPONENTS
+    real = COMPONENTS if args.real == 'all' else [c for c in args.real.split(',') if c]
+    try:
+        report = run_replay(sys.modules[__name__], args.replay, real=real, speed=args.speed, report_path=args.report)
+    finally:
+        shutdown_logging()
+    if report is None or report['failures']:
+        raise SystemExit(1) # CI/regression: kati hui recording ya koi file nahi
+elif __name__ == "__main__":
     try:
         main_loop()
     except KeyboardInterrupt:
-        print("\nExiting Jarvis... Goodbye!")
+        log.info("Exiting Jarvis... Goodbye!")
         if porcupine:
             porcupine.delete()
+        if llm_engine:
+            llm_engine.stop()
+        if stt_engine:
+            stt_engine.stop()
+        if capture:
+            capture.stop()
+        orchestrator.shutdown()
+        safe_runner.shutdown()
+        startup.shutdown()
+        if speaker_verifier:
+            speaker_verifier.stop()
+        stop_tts_pool()
+        shutdown_logging()
     except Exception as e:
-        print(f"\n--- FATAL MAIN LOOP ERROR ---")
-        print(e)
+        log.exception(f"--- FATAL MAIN LOOP ERROR --- {e}")
         if porcupine:
             porcupine.delete()
+        if llm_engine:
+            llm_engine.stop()
+        if stt_engine:
+            stt_engine.stop()
+        if capture:
+            capture.stop()
+        orchestrator.shutdown()
+        safe_runner.shutdown()
+        startup.shutdown()
+        if speaker_verifier:
+            speaker_verifier.stop()
+        stop_tts_pool()
+        shutdown_logging()
@@ -0,0 +1,270 @@
+import asyncio
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file main_loop ko event-driven banati hai.
+# Pehle har stage pichle ke khatam hone ka intezaar karti thi, apni hi awaaz ka bhi:
+# speak("Yes sir?") -> phir recording, speak("Executing.") -> phir command, speak("Soch raha hoon...")
+# -> phir LLM. Ab saari awaazein ek alag 'Voice' queue (single thread) mein bajti hain aur steps
+# (record, transcribe, route, act...) saath-saath chalte rehte hain. Jawab bajte waqt hotword
+# phir se suna jaata hai; naya hotword aaye toh jawab rok kar naya interaction.
+
+# States (Orchestrator.state): steps ke naam bhi states hain
+IDLE = 'idle'
+LISTENING = 'listening'
+RESPONDING = 'responding' # Steps khatam, jawab abhi baj raha hai (hotword live)
+
+# name: state/log ke liye, func(ctx): blocking function jo worker thread mein chalta hai
+Step = namedtuple('Step', ['name', 'func'])
+
+
+class Voice:
+    """
+    Saari awaazon ki FIFO queue, ek hi thread. say()/run() turant Future lautate hain;
+    caller bolne ka intezaar nahi karta. stop() queue khaali karke bajti awaaz rokta hai.
+    """
+
+    def __init__(self, speak, stop_playback=None):
+        self.speak = speak
+        self.stop_playback = stop_playback
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jarvis-voice")
+        self.lock = threading.Lock()
+        self.pending = [] # Abhi tak poore na hue Futures
+
+    def run(self, func, *args, **kwargs):
+        """Koi bhi bolne wala kaam (jaise LLM streaming) queue mein."""
+        future = self.pool.submit(func, *args, **kwargs)
+        with self.lock:
+            self.pending = [f for f in self.pending if not f.done()] + [future]
+        return future
+
+    def say(self, text, lang='en_m', trace=None):
+        return self.run(lambda: self.speak(text, lang=lang, trace=trace))
+
+    @property
+    def busy(self):
+        with self.lock:
+            return any(not f.done() for f in self.pending)
+
+    def stop(self):
+        """Barge-in: queue ki baaki awaazein cancel, bajti hui band."""
+        with self.lock:
+            pending = list(self.pending)
+        cancelled = sum(1 for f in pending if f.cancel())
+        if self.stop_playback is not None:
+            self.stop_playback()
+        log.info(f"[Voice] Roka gaya ({cancelled} queued awaazein cancel).")
+
+    def wait(self, timeout=None):
+        """Ab tak queue ki saari awaazein poori hone do."""
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def shutdown(self):
+        self.stop()
+        self.pool.shutdown(wait=False)
+
+
+class Context:
+    """
+    Ek interaction ka shared state jo steps ke beech chalta hai.
+    Steps isme likhte hain (audio, text, routes, response...) aur ctx.done = True karke
+    baaki steps skip kar sakte hain. ctx.speech: is interaction ki aakhri awaaz ka Future.
+    """
+
+    def __init__(self, trace, voice):
+        self.trace = trace
+        self.voice = voice
+        self.state = IDLE
+        self.done = False
+        self.cancelled = False
+        self.speech = None
+        self.data = {}
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['data'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in ('trace', 'voice', 'state', 'done', 'cancelled', 'speech', 'data'):
+            object.__setattr__(self, name, value)
+        else:
+            self.data[name] = value
+
+    def say(self, text, lang='en_m', trace=False):
+        """Non-blocking: awaaz queue mein, Future lautata hai. trace=True: TTS marks is trace par."""
+        self.speech = self.voice.say(text, lang=lang, trace=self.trace if trace else None)
+        return self.speech
+
+    def run_voice(self, func, *args, **kwargs):
+        """Bolne wala poora kaam (jaise streaming LLM) voice queue mein; steps aage badh jaate hain."""
+        self.speech = self.voice.run(func, *args, **kwargs)
+        return self.speech
+
+
+class Orchestrator:
+    """
+    State machine: idle -> listening -> <steps...> -> responding -> listening.
+    steps pluggable hain (add_step/replace_step); har step worker thread mein chalta hai aur
+    interaction ek asyncio Task hai jo cancel ho sakta hai (naya hotword, shutdown).
+    """
+
+    def __init__(self, steps, voice, listen=None, on_idle=None, begin_trace=None, finish_trace=None):
+        self.steps = list(steps)
+        self.voice = voice
+        self.listen = listen # () -> bool, blocking (hotword)
+        self.on_idle = on_idle # Hotword timeout par (health checks waghera)
+        self.begin_trace = begin_trace
+        self.finish_trace = finish_trace
+        self.state = IDLE
+        self.current = None # Chal raha interaction Task
+        self.responding = None # Jis interaction ka jawab abhi baj raha hai (Context)
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="jarvis-step")
+
+    # --- Pluggable steps ---
+    def add_step(self, step, before=None):
+        names = [s.name for s in self.steps]
+        self.steps.insert(names.index(before) if before in names else len(self.steps), step)
+
+    def replace_step(self, name, func):
+        self.steps = [Step(name, func) if s.name == name else s for s in self.steps]
+
+    def _set_state(self, state, ctx=None):
+        log.debug(f"[Orchestrator] {self.state} -> {state}")
+        self.state = state
+        if ctx is not None:
+            ctx.state = state
+
+    # --- Ek interaction ---
+    async def interact(self, trace):
+        """Saare steps order mein; awaazein voice queue mein chalti rehti hain. Returns Context."""
+        loop = asyncio.get_running_loop()
+        ctx = Context(trace, self.voice)
+        try:
+            for step in self.steps:
+                self._set_state(step.name, ctx)
+                await loop.run_in_executor(self.executor, step.func, ctx)
+                if ctx.done:
+                    break
+        except asyncio.CancelledError:
+            ctx.cancelled = True
+            log.info(f"[Orchestrator] Interaction '{ctx.state}' par cancel hua.")
+            raise
+        self._set_state(RESPONDING if ctx.speech is not None and not ctx.speech.done() else LISTENING, ctx)
+        return ctx
+
+    def run_once(self, trace):
+        """Sync wrapper (replay/purane callers): steps + jawab bajne tak block."""
+        ctx = asyncio.run(self.interact(trace))
+        self.voice.wait()
+        self._set_state(LISTENING, ctx)
+        return ctx
+
+    def _finish_after_speech(self, ctx):
+        """Trace tab band karo jab is interaction ki aakhri awaaz bhi khatam ho."""
+        if self.finish_trace is None:
+            return
+        if ctx.speech is None:
+            self.finish_trace(ctx.trace)
+            return
+        ctx.speech.add_done_callback(lambda _f: self.finish_trace(ctx.trace))
+
+    def cancel(self):
+        if self.current is not None and not self.current.done():
+            self.current.cancel()
+
+    # --- Main loop ---
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        listen_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jarvis-hotword")
+        try:
+            while True:
+                if self.state != RESPONDING:
+                    self._set_state(LISTENING)
+                heard = await loop.run_in_executor(listen_pool, self.listen)
+                if not heard:
+                    if self.on_idle is not None:
+                        self.on_idle()
+                    if self.state == RESPONDING and not self.voice.busy:
+                        self._set_state(LISTENING)
+                    continue
+                if self.voice.busy:
+                    # Jawab ke beech hotword: user kuch naya chahta hai
+                    log.info("[Orchestrator] Jawab ke beech hotword: barge-in.")
+                    self.voice.stop()
+                trace = self.begin_trace() if self.begin_trace else None
+                self.current = asyncio.ensure_future(self.interact(trace))
+                try:
+                    ctx = await self.current
+                except asyncio.CancelledError:
+                    if trace is not None and self.finish_trace:
+                        self.finish_trace(trace)
+                    continue
+                except Exception as e:
+                    log.exception(f"[Orchestrator] Interaction error: {e}")
+                    if trace is not None and self.finish_trace:
+                        self.finish_trace(trace)
+                    continue
+                self.responding = ctx
+                self._finish_after_speech(ctx)
+        finally:
+            self.cancel()
+            listen_pool.shutdown(wait=False)
+
+    def shutdown(self):
+        self.cancel()
+        self.voice.shutdown()
+        self.executor.shutdown(wait=False)
+
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import time
+    print("--- Orchestrator Test ---")
+    t0 = time.monotonic()
+
+    def fake_speak(text, lang='en_m', trace=None):
+        print(f"  {time.monotonic() - t0:.2f}s  bol raha: {text}")
+        time.sleep(0.5) # Awaaz ki lambai
+
+    def record(ctx):
+        ack = ctx.say("Yes sir?")
+        time.sleep(0.6) # User bol raha hai; ack bajte hi recording armed thi
+        ack.result()
+        ctx.text = "kitni ram hai"
+
+    def act(ctx):
+        ctx.say("Executing.")
+        time.sleep(0.4) # Command filler ke saath-saath chal raha hai
+        ctx.response = "5 GB free hai."
+
+    def respond(ctx):
+        ctx.say(ctx.response)
+
+    voice = Voice(fake_speak)
+    orch = Orchestrator([Step('record', record), Step('act', act), Step('respond', respond)], voice)
+    ctx = orch.run_once(None)
+    sequential = 0.5 + 0.6 + 0.5 + 0.4 + 0.5
+    print(f"Overlapped: {time.monotonic() - t0:.2f}s (sequential hota: {sequential:.2f}s), state={orch.state}")
+
+    # Barge-in: jawab ke beech stop
+    t0 = time.monotonic()
+    voice.say("Ek bahut lamba jawab...")
+    queued = voice.say("Doosra sentence")
+    time.sleep(0.1)
+    voice.stop()
+    print(f"Queued cancelled: {queued.cancelled()}")
+    orch.shutdown()
+    print("\n--- Test Complete ---")
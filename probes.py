@@ -0,0 +1,95 @@
+import os
+import time
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file read-only whitelist commands ko Python mein hi chalati hai.
+# Pehle check_date/check_ram/check_disk har baar /usr/bin/date, free -h, df -h ko fork+exec karte the
+# aur unka table ek line mein chipka kar TTS ko dete the ("total used free shared buff/cache ...").
+# Ab whitelist.yml mein 'handler: memory' jaisa likho: /proc/meminfo, os.statvfs, time.strftime
+# se seedha chhota, bolne layak jawab banta hai (koi process spawn nahi).
+
+MEMINFO_PATH = '/proc/meminfo'
+DEFAULT_DATE_FORMAT = "%A, %B %d, %Y"
+
+
+class ProbeError(Exception):
+    pass
+
+
+def _gb(n_bytes):
+    """Bolne layak size: '7.6 GB' ya '512 MB'."""
+    gb = n_bytes / float(1 << 30)
+    if gb >= 1:
+        return f"{gb:.1f} GB"
+    return f"{n_bytes / float(1 << 20):.0f} MB"
+
+def read_meminfo(path=MEMINFO_PATH):
+    """/proc/meminfo -> {key: bytes}"""
+    info = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                parts = rest.split()
+                if parts:
+                    info[key] = int(parts[0]) * (1024 if parts[1:] == ['kB'] else 1)
+    except (OSError, ValueError) as e:
+        raise ProbeError(f"{path} padh nahi paaya: {e}")
+    return info
+
+
+def date_probe(cmd):
+    return time.strftime(cmd.get('format', DEFAULT_DATE_FORMAT))
+
+def memory_probe(cmd):
+    info = read_meminfo()
+    total = info.get('MemTotal')
+    if not total:
+        raise ProbeError("MemTotal nahi mila")
+    # MemAvailable: naye apps ko sach mein kitni mil sakti hai (cache bhi shaamil)
+    available = info.get('MemAvailable', info.get('MemFree', 0))
+    used_pct = round(100.0 * (total - available) / total)
+    return f"{_gb(total)} mein se {_gb(available)} free hai, {used_pct} percent use ho rahi hai."
+
+def disk_probe(cmd):
+    path = cmd.get('path', '/')
+    try:
+        st = os.statvfs(path)
+    except OSError as e:
+        raise ProbeError(f"{path} ka statvfs fail: {e}")
+    total = st.f_blocks * st.f_frsize
+    free = st.f_bavail * st.f_frsize # Normal user ke liye (df ka 'Avail')
+    used = (st.f_blocks - st.f_bfree) * st.f_frsize
+    used_pct = round(100.0 * used / (used + free)) if used + free else 0 # df ka 'Use%' jaisa
+    return f"{_gb(total)} mein se {_gb(free)} khaali hai, {used_pct} percent bhara hua."
+
+
+# whitelist.yml ka 'handler' -> function(cmd_dict) -> short text
+PROBES = {
+    "date": date_probe,
+    "memory": memory_probe,
+    "disk": disk_probe,
+}
+
+def run_probe(cmd):
+    """cmd['handler'] wala probe chalao. Unknown handler ya fail -> ProbeError."""
+    probe = PROBES.get(cmd.get('handler'))
+    if probe is None:
+        raise ProbeError(f"Unknown handler: {cmd.get('handler')}")
+    return probe(cmd)
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    print("--- Probes Test ---")
+    for name, cmd in [("date", {}), ("memory", {}), ("disk", {"path": "/"})]:
+        start = time.perf_counter()
+        result = run_probe(dict(cmd, handler=name))
+        print(f"{name}: '{result}' ({(time.perf_counter() - start) * 1000:.2f} ms)")
+    try:
+        run_probe({"handler": "shell"})
+    except ProbeError as e:
+        print(f"Expected error: {e}")
+    print("\n--- Test Complete ---")
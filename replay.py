@@ -0,0 +1,515 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+import audio_player
+import tts
+from audio_capture import AudioCapture
+from config_service import ConfigService, use_config_service
+from jarvis_log import get_logger
+from latency_trace import Tracer, STAGES
+from llm_cache import LLMResponseCache
+from llm_engine import StubLLMEngine, create_engine
+from safe_runner import SafeRunner
+from stt_engine import FakeSTTEngine, create_stt_engine
+
+log = get_logger(__name__)
+
+# Yeh file 'python3 main.py --replay <dir>' chalati hai: mic, speaker aur Porcupine key ke bina
+# WAV files ko usi hotword -> record_command -> run_whisper_stt -> routing -> SafeRunner/LLM -> speak
+# path se guzaarti hai jo asli Jarvis use karta hai, aur latency / real-time factor / throughput report deti hai.
+# Har component fake (deterministic) ya asli local binary ho sakta hai: --real stt,llm,tts,hotword,runner
+#
+# Replay directory:
+#   cmd1.wav        16-bit WAV (koi bhi sample rate/channels; 16 kHz mono mein convert hota hai)
+#   cmd1.txt        (optional) fake STT yahi text lautata hai
+#   cmd1.json       (optional) {"command": [start_s, end_s]}: command WAV mein kahan hai. Recording ne
+#                   iska MIN_COVERAGE hissa na pakda toh file FAIL. Na ho toh kam se kam WAV ki aakhri
+#                   awaaz recording mein honi chahiye (beech mein kati recording bhi FAIL).
+#   responses.json  (optional) fake LLM ke liye {prompt substring: jawab}
+
+SAMPLE_RATE = 16000
+BLOCK = 160 # Feeder ek baar mein 10 ms push karta hai (asli capture callback jaisa)
+LEAD_SILENCE_S = 0.5
+TRAIL_SILENCE_S = 1.5 # VAD hangover (750 ms) se zyada, taaki recording apne aap band ho
+COMPONENTS = ('stt', 'llm', 'tts', 'hotword', 'runner')
+MIN_COVERAGE = 0.9 # Command region ka kitna hissa recording mein hona chahiye
+LOUD_DB = -35.0 # EnergyHotword jaisa: isse tez frames "awaaz" hain
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replay_fixtures')
+
+
+def load_wav(path):
+    """PCM WAV (8/16/32-bit) -> float32 mono 16 kHz. Sirf stdlib wave, build machines par libsndfile nahi chahiye."""
+    with wave.open(path, 'rb') as wf:
+        width = wf.getsampwidth()
+        channels = wf.getnchannels()
+        sample_rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    if width == 1:
+        audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width in (2, 4):
+        dtype = '<i2' if width == 2 else '<i4'
+        audio = np.frombuffer(raw, dtype=dtype).astype(np.float32) / float(2 ** (8 * width - 1))
+    else:
+        raise ValueError(f"{path}: {8 * width}-bit WAV supported nahi hai")
+    audio = audio.reshape(-1, channels).mean(axis=1)
+    if sample_rate != SAMPLE_RATE:
+        n = int(round(len(audio) * SAMPLE_RATE / float(sample_rate)))
+        audio = np.interp(np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio)
+    return audio.astype(np.float32)
+
+
+class ReplayCapture(AudioCapture):
+    """AudioCapture jiska mic ek feeder thread hai. reader() khulne par feeder shuru hota hai."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.reader_opened = threading.Event()
+        self.fed_at = 0 # Current file ka pehla sample ring mein kahan hai
+        self.ranges = [] # record_command ne ring se jo (start, end) padhe
+
+    def read_range(self, start, end):
+        self.ranges.append((start, end))
+        return super().read_range(start, end)
+
+    def start(self):
+        pass # Koi sounddevice stream nahi
+
+    def reader(self, start=None):
+        r = super().reader(start)
+        self.reader_opened.set()
+        return r
+
+    def feed(self, audio, speed):
+        """Audio ko blocks mein push karta hai, speed x real-time par (background thread)."""
+        self.reader_opened.clear()
+        self.fed_at = self.position
+        self.ranges = []
+
+        def run():
+            self.reader_opened.wait()
+            step = BLOCK / float(SAMPLE_RATE) / speed
+            next_t = time.monotonic()
+            for i in range(0, len(audio), BLOCK):
+                self.push(audio[i:i + BLOCK])
+                next_t += step
+                delay = next_t - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+
+class EnergyHotword:
+    """
+    Porcupine ki jagah deterministic fake: chup ke baad pehla loud hissa hi 'hotword', aur
+    Porcupine ki tarah woh word khatam hone par fire hota hai (loud ke baad pehla quiet frame),
+    shuru mein nahi. Porcupine jaisa interface (frame_length, sample_rate, process, delete).
+    """
+
+    def __init__(self, threshold_db=-35.0, quiet_frames=3, frame_length=512, sample_rate=SAMPLE_RATE):
+        self.threshold_db = threshold_db
+        self.quiet_frames = quiet_frames
+        self.frame_length = frame_length
+        self.sample_rate = sample_rate
+        self.quiet = quiet_frames
+        self.in_word = False
+
+    def process(self, frame):
+        samples = np.asarray(frame, dtype=np.float32) / 32768.0
+        rms_db = 10.0 * np.log10(float(np.dot(samples, samples)) / max(len(samples), 1) + 1e-12)
+        if rms_db >= self.threshold_db:
+            if self.quiet >= self.quiet_frames:
+                self.in_word = True
+            self.quiet = 0
+            return -1
+        self.quiet += 1
+        if self.in_word:
+            self.in_word = False
+            return 0
+        return -1
+
+    def delete(self):
+        pass
+
+
+class FakeRunner(SafeRunner):
+    """SafeRunner jaisa whitelist (requires_auth waghera), par command chalaata nahi, bas naam lautata hai."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def execute(self, command_name, is_authenticated=False, confirmed=False):
+        self.calls.append(command_name)
+        return ("success", f"{command_name} done.")
+
+
+class FakePlayer:
+    """
+    audio_player.AudioPlayer ki jagah: kuch bajta nahi, par utni der (speed x) rukta hai jitni der
+    audio bajta, aur us dauraan recent_level_db tez hota hai. Isse record_command ka EchoGate wala
+    path (ack ke upar bolna, ack ke dauraan hangover) replay mein bhi chalta hai.
+    """
+
+    LEVEL_DB = -20.0
+
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self.until = 0.0
+        self.stopped = threading.Event()
+
+    def hold(self, seconds):
+        """Blocking 'playback' seconds (audio time) tak, ya stop() tak."""
+        self.stopped.clear()
+        wall = seconds / self.speed
+        self.until = time.monotonic() + wall
+        self.stopped.wait(wall)
+        self.until = min(self.until, time.monotonic())
+
+    def play(self, pcm, sample_rate=22050):
+        self.hold(len(pcm) / 2.0 / sample_rate)
+
+    def stop(self):
+        if not self.playing:
+            return None
+        self.stopped.set()
+        return 0.0
+
+    @property
+    def playing(self):
+        return time.monotonic() < self.until
+
+    def recent_level_db(self, window_s=0.3):
+        # window_s audio time hai; replay speed x tez chalta hai
+        return self.LEVEL_DB if time.monotonic() < self.until + window_s / self.speed else audio_player.SILENCE_DB
+
+
+class FakeSpeaker:
+    """speak() ki jagah: Piper nahi, bola gaya text yaad rakhta hai aur player par utni der 'bolta' hai."""
+
+    CHARS_PER_S = 15.0 # Piper ki lagbhag bolne ki speed
+
+    def __init__(self, player=None):
+        self.player = player
+        self.spoken = []
+
+    def __call__(self, text_to_speak, lang='en_m', cache=None, trace=None):
+        self.spoken.append(text_to_speak)
+        if trace is not None:
+            trace.mark('tts_first_audio')
+        if self.player is not None:
+            self.player.hold(len(text_to_speak) / self.CHARS_PER_S)
+        if trace is not None:
+            trace.mark('tts_done')
+
+
+def _syllable(freq, seconds, rng):
+    """Speech-jaisa synthetic hissa: tone + 5 Hz amplitude modulation (webrtcvad ise speech maanta hai)."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / float(SAMPLE_RATE)
+    tone = 0.5 * np.sin(2 * np.pi * freq * t) * (1 + 0.3 * np.sin(2 * np.pi * 5 * t))
+    return tone + rng.normal(0, 0.001, len(t))
+
+def make_fixtures(directory=FIXTURE_DIR):
+    """
+    Recording edge cases ke synthetic fixtures (WAV + fake STT ka .txt). Layout: hotword, pause, command.
+      gap_command:   hotword ke baad 1.2 s chup, phir command (pre-roll/ack hangover regression)
+      quick_command: hotword ke 0.1 s baad hi command, "Yes sir?" ke upar
+    """
+    rng = np.random.default_rng(0)
+    pause = lambda seconds: np.zeros(int(seconds * SAMPLE_RATE))
+    fixtures = {
+        'gap_command': (1.2, "Jarvis aaj ki tareekh kya hai"),
+        'quick_command': (0.1, "Jarvis kitni ram hai"),
+    }
+    os.makedirs(directory, exist_ok=True)
+    for name, (gap_s, text) in fixtures.items():
+        audio = np.concatenate([
+            _syllable(600, 0.5, rng), pause(gap_s), # "Jarvis", phir user ka pause
+            _syllable(300, 0.4, rng), pause(0.15), _syllable(450, 0.5, rng), # Command
+        ])
+        with wave.open(os.path.join(directory, name + '.wav'), 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(SAMPLE_RATE)
+            wf.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+        with open(os.path.join(directory, name + '.txt'), 'w') as f:
+            f.write(text + "\n")
+        command_start = 0.5 + gap_s
+        with open(os.path.join(directory, name + '.json'), 'w') as f:
+            json.dump({"command": [command_start, round(command_start + 1.05, 3)]}, f)
+            f.write("\n")
+    return sorted(fixtures)
+
+
+def command_region(path, audio):
+    """
+    (start_s, end_s) jo recording mein hona hi chahiye: sidecar .json ka "command", warna WAV ki
+    aakhri awaaz (aakhri loud 100 ms). Silent file par None.
+    """
+    sidecar = path[:-4] + '.json'
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            start, end = json.load(f)['command']
+        return float(start), float(end)
+    frames = audio[:len(audio) // BLOCK * BLOCK].reshape(-1, BLOCK)
+    loud = np.flatnonzero(10.0 * np.log10((frames ** 2).mean(axis=1) + 1e-12) >= LOUD_DB)
+    if not len(loud):
+        return None
+    end = (loud[-1] + 1) * BLOCK / float(SAMPLE_RATE)
+    return max(0.0, end - 0.1), end
+
+def coverage(spans, region):
+    """region ka kitna hissa (0..1) spans (overlap ho sakte hain) ke union mein hai."""
+    start, end = region
+    covered = 0.0
+    cursor = start
+    for a, b in sorted(spans):
+        a, b = max(a, cursor), min(b, end)
+        if b > a:
+            covered += b - a
+            cursor = b
+    return covered / (end - start) if end > start else 1.0
+
+
+def _read_text(path):
+    if not os.path.exists(path):
+        return ""
+    with open(path) as f:
+        return f.read().strip()
+
+
+def setup(main, directory, real=(), speed=1.0):
+    """main module ke globals ko replay components se badalta hai. Returns fakes dict."""
+    real = set(real)
+    cfg = {}
+    # Asli components ko asli config (keys, ports, thread counts) chahiye
+    if real and os.path.exists(main.CONFIG_PATH):
+        with open(main.CONFIG_PATH) as f:
+            cfg = json.load(f)
+    cfg.setdefault('JARVIS_NAME', 'Jarvis')
+    cfg.setdefault('USER_NAME', 'Sir')
+    cfg.setdefault('LLAMA_N_PREDICT', main.DEFAULT_LLAMA_N)
+    cfg.setdefault('LLAMA_TIMEOUT', main.DEFAULT_LLAMA_TIMEOUT)
+    main.config = cfg
+    # Rename commands asli ~/jarvis/config.json na badlein: temp file wala service
+    config_path = os.path.join(tempfile.mkdtemp(prefix='jarvis_replay_cfg_'), 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump({k: cfg[k] for k in ('JARVIS_NAME', 'USER_NAME')}, f)
+    use_config_service(ConfigService(config_path).load())
+    main.get_router() # Compile ka time pehle interaction mein na gine
+    main.get_fuzzy_index(cfg.get('FUZZY_INTENT_THRESHOLD'))
+    main.keyword_spotter = main.open_keyword_spotter(cfg) # KWS_ENABLED asli config mein ho tabhi
+    # Har run khaali cache se: pichle run ke jawab benchmark ko na bigaadein
+    main.llm_cache = LLMResponseCache(path=':memory:', extra_fillers=[cfg['JARVIS_NAME']])
+    fakes = {}
+
+    main.capture = ReplayCapture(sample_rate=SAMPLE_RATE)
+    if 'hotword' in real:
+        import pvporcupine
+        main.porcupine = pvporcupine.create(
+            access_key=cfg['PICOVOICE_ACCESS_KEY'],
+            keyword_paths=[os.path.expanduser(cfg['PICOVOICE_KEYWORD_PATH'])],
+            sensitivities=[float(cfg.get('PICOVOICE_SENSITIVITY', 0.75))]
+        )
+    else:
+        main.porcupine = EnergyHotword()
+
+    if 'stt' in real:
+        main.stt_engine = create_stt_engine(cfg, model_path=main.WHISPER_MODEL_PATH)
+        main.stt_engine.start()
+    else:
+        main.stt_engine = fakes['stt'] = FakeSTTEngine("")
+        cfg.setdefault('STT_STREAMING', False) # Fake STT ke partials bekaar hain
+
+    if 'llm' in real:
+        main.llm_engine = create_engine(cfg, model_path=main.LLAMA_MODEL_PATH)
+        main.llm_engine.start()
+    else:
+        responses = {}
+        responses_path = os.path.join(directory, 'responses.json')
+        if os.path.exists(responses_path):
+            with open(responses_path) as f:
+                responses = json.load(f)
+        main.llm_engine = fakes['llm'] = StubLLMEngine(responses=responses)
+
+    # get_player() (record_command ka EchoGate, stop_playback) yahi fake player paata hai
+    player = audio_player._player = FakePlayer(speed)
+    if 'tts' in real:
+        tts.play_pcm = player.play # Asli Piper synthesis, aplay/speaker nahi
+        tts.start_tts_pool()
+    else:
+        fakes['tts'] = FakeSpeaker(player)
+        main.speak = tts.speak = fakes['tts'] # speak_stream andar tts.speak call karta hai
+
+    if 'runner' not in real:
+        main.safe_runner = fakes['runner'] = FakeRunner()
+    return fakes
+
+
+def _percentile_table(stats):
+    order = STAGES + ['response', 'total']
+    rows = []
+    for stage in sorted(stats, key=lambda s: order.index(s) if s in order else len(order)):
+        s = stats[stage]
+        rows.append(f"  {stage:<16} n={s['count']:<4} p50={s['p50'] * 1000:8.1f} ms  "
+                    f"p95={s['p95'] * 1000:8.1f} ms  p99={s['p99'] * 1000:8.1f} ms")
+    return "\n".join(rows)
+
+
+def run_replay(main, directory, real=(), speed=1.0, report_path=None):
+    """
+    directory ki har WAV ko pipeline se guzaarta hai. Returns report dict
+    (per-file results, per-stage quantiles, RTF, throughput).
+    """
+    files = sorted(glob.glob(os.path.join(directory, '*.wav')))
+    if not files:
+        log.error(f"[Replay] {directory} mein koi .wav file nahi mili.")
+        return None
+    fakes = setup(main, directory, real=real, speed=speed)
+    trace_dir = tempfile.mkdtemp(prefix='jarvis_replay_')
+    main.tracer = tracer = Tracer(trace_dir=trace_dir)
+    log.info(f"[Replay] {len(files)} files, speed={speed}x, real={sorted(real) or 'none'}, traces={trace_dir}")
+
+    # Har interaction mein command audio aur transcript pakadne ke liye wrappers
+    current = {}
+    record_command = main.record_command
+    run_whisper_stt = main.run_whisper_stt
+
+    def recording(*a, **k):
+        audio = record_command(*a, **k)
+        current['command_s'] = 0.0 if audio is None else len(audio) / float(SAMPLE_RATE)
+        return audio
+
+    def transcribing(audio, streaming=None):
+        t0 = time.monotonic()
+        text = run_whisper_stt(audio, streaming=streaming)
+        current['stt_s'] = time.monotonic() - t0
+        current['transcript'] = text
+        return text
+
+    main.record_command = recording
+    main.run_whisper_stt = transcribing
+
+    results = []
+    audio_total = 0.0
+    wall_start = time.monotonic()
+    try:
+        for path in files:
+            name = os.path.basename(path)
+            audio = load_wav(path)
+            audio_s = len(audio) / float(SAMPLE_RATE)
+            audio_total += audio_s
+            if 'stt' in fakes:
+                fakes['stt'].default = _read_text(path[:-4] + '.txt')
+            if 'tts' in fakes:
+                fakes['tts'].spoken = []
+            current.clear()
+            padded = np.concatenate([
+                np.zeros(int(LEAD_SILENCE_S * SAMPLE_RATE), dtype=np.float32),
+                audio,
+                np.zeros(int(TRAIL_SILENCE_S * SAMPLE_RATE), dtype=np.float32),
+            ])
+            feeder = main.capture.feed(padded, speed)
+            t0 = time.monotonic()
+            result = {"file": name, "audio_s": round(audio_s, 3)}
+            if main.listen_for_hotword(timeout=len(padded) / float(SAMPLE_RATE) / speed + 2.0):
+                trace = tracer.begin({"file": name})
+                try:
+                    main.handle_interaction(trace)
+                finally:
+                    tracer.finish(trace)
+                result.update({
+                    "hotword": True,
+                    "trace_id": trace.trace_id,
+                    "route": trace.meta.get('route'),
+                    "durations": {k: round(v, 4) for k, v in trace.durations().items()},
+                })
+            else:
+                result["hotword"] = False
+            feeder.join()
+            result["wall_s"] = round(time.monotonic() - t0, 3)
+            result["command_s"] = round(current.get('command_s', 0.0), 3)
+            result["transcript"] = current.get('transcript')
+            # Fake STT sidecar text lautata hai chahe kuch bhi record hua ho: isliye recording khud jaancho
+            region = command_region(path, audio)
+            if result.get("hotword") and region is not None:
+                offset = main.capture.fed_at + int(LEAD_SILENCE_S * SAMPLE_RATE)
+                spans = [((a - offset) / float(SAMPLE_RATE), (b - offset) / float(SAMPLE_RATE))
+                         for a, b in main.capture.ranges]
+                result["captured"] = [[round(a, 3), round(b, 3)] for a, b in sorted(set(spans))]
+                result["command_coverage"] = round(coverage(spans, region), 3)
+                if result["command_coverage"] < MIN_COVERAGE:
+                    result["failure"] = (f"command {region[0]:.2f}-{region[1]:.2f}s ka sirf "
+                                         f"{result['command_coverage']:.0%} record hua")
+            elif region is not None:
+                result["failure"] = "hotword nahi mila"
+            result["stt_s"] = round(current.get('stt_s', 0.0), 4)
+            if result["command_s"]:
+                result["stt_rtf"] = round(result["stt_s"] / result["command_s"], 4)
+            if 'tts' in fakes:
+                result["spoken"] = list(fakes['tts'].spoken)
+            results.append(result)
+            log.info(f"[Replay] {name}: route={result.get('route')} transcript={result['transcript']!r} "
+                     f"wall={result['wall_s']:.2f}s")
+            if result.get("failure"):
+                log.error(f"[Replay] FAIL {name}: {result['failure']} (captured {result.get('captured')})")
+    finally:
+        main.record_command = record_command
+        main.run_whisper_stt = run_whisper_stt
+        for engine in (main.stt_engine, main.llm_engine):
+            if engine is not None:
+                engine.stop()
+        if 'tts' in real:
+            tts.stop_tts_pool()
+
+    wall_total = time.monotonic() - wall_start
+    command_total = sum(r["command_s"] for r in results)
+    stt_total = sum(r["stt_s"] for r in results)
+    report = {
+        "directory": directory,
+        "speed": speed,
+        "real": sorted(real),
+        "files": len(results),
+        "hotwords": sum(1 for r in results if r["hotword"]),
+        "failures": [r["file"] for r in results if r.get("failure")],
+        "audio_s": round(audio_total, 3),
+        "wall_s": round(wall_total, 3),
+        # Wall time / audio time; speed > 1 par feeder khud tez hai, isliye yeh speed ke saath padhein
+        "rtf": round(wall_total / audio_total, 4) if audio_total else None,
+        "stt_rtf": round(stt_total / command_total, 4) if command_total else None,
+        "throughput_per_min": round(len(results) * 60.0 / wall_total, 2) if wall_total else None,
+        "stages": tracer.quantiles(),
+        "fuzzy": dict(main.get_fuzzy_index().stats),
+        "llm_cache": main.llm_cache.stats(),
+        "results": results,
+        "trace_dir": trace_dir,
+    }
+    print("\n--- Replay Report ---")
+    print(f"Files: {report['files']}  hotwords: {report['hotwords']}  audio: {report['audio_s']:.1f}s  "
+          f"wall: {report['wall_s']:.1f}s")
+    for r in results:
+        if r.get("failure"):
+            print(f"FAIL {r['file']}: {r['failure']}")
+    print(f"RTF: {report['rtf']}  STT RTF: {report['stt_rtf']}  throughput: {report['throughput_per_min']} interactions/min")
+    print(_percentile_table(report['stages']))
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Report saved: {report_path}")
+    return report
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import sys
+    # Fixtures dobara banao: python3 replay.py [DIR]; chalao: python3 main.py --replay replay_fixtures
+    target = sys.argv[1] if len(sys.argv) > 1 else FIXTURE_DIR
+    print(f"Fixtures {make_fixtures(target)} -> {target}")
@@ -1,76 +1,334 @@
 import yaml
 import subprocess
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from jarvis_log import get_logger
+from probes import ProbeError, run_probe
+
+log = get_logger(__name__)
 
 WHITELIST_FILE = os.path.join(os.path.expanduser('~/jarvis'), 'whitelist.yml')
+DEFAULT_TIMEOUT = 30 # seconds (whitelist mein per-command 'timeout' se badlo)
+DEFAULT_MAX_WORKERS = 2 # Ek saath kitne background jobs (whitelist 'jobs: max_workers')
+DEFAULT_MAX_CONCURRENT = 1 # Ek hi command ke kitne jobs ek saath
+OUTPUT_TAIL_LINES = 200 # Har job ke stdout/stderr ki aakhri lines memory mein
+KILL_GRACE_S = 3.0 # terminate ke baad itna ruk kar kill
+KEEP_FINISHED_JOBS = 20 # Itne purane khatam jobs (output ke saath) yaad rakho
+
+# Whitelist ke bahar ke job commands (intent_parser.INTENT_MAP mein inke keywords hain)
+CANCEL_JOBS = "cancel_jobs"
+JOB_STATUS = "job_status"
 
 def load_whitelist():
     with open(WHITELIST_FILE, 'r') as f:
         return yaml.safe_load(f)
 
+def _clean(output):
+    """Output ko ek line mein clean karo"""
+    return " ".join(output.strip().splitlines())
+
+
+class Job:
+    """Ek background command: status, streamed output (tail) aur process handle."""
+
+    def __init__(self, job_id, name, cmd):
+        self.id = job_id
+        self.name = name
+        self.cmd = cmd
+        self.status = "queued" # queued -> running -> done/failed/timeout/cancelled
+        self.returncode = None
+        self.output = deque(maxlen=OUTPUT_TAIL_LINES) # (stream, line)
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.proc = None
+        self.future = None
+        self.cancel_requested = False
+        self.lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def last_line(self, stream="stdout"):
+        for s, line in reversed(self.output):
+            if s == stream and line.strip():
+                return line.strip()
+        return ""
+
+    def summary(self):
+        """Bolne layak ek line."""
+        if self.status == "done":
+            message = self.cmd.get('done_message', f"{self.name} poora ho gaya.")
+            return f"{message} {self.last_line()}".strip()
+        if self.status == "timeout":
+            return f"{self.name} {self.cmd.get('timeout', DEFAULT_TIMEOUT)} second mein poora nahi hua, rok diya."
+        if self.status == "failed":
+            return f"{self.name} fail ho gaya. {self.last_line('stderr')}".strip()
+        return f"{self.name}: {self.status}"
+
+
+class JobManager:
+    """
+    Bounded worker pool (ThreadPoolExecutor) par whitelist commands. Har job ka stdout/stderr
+    line-by-line capture hota hai, per-command timeout aur concurrency limit lagti hai,
+    aur khatam hone par notification queue mein jaata hai (main use idle waqt bolta hai).
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = int(max_workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="jarvis-job")
+        self.jobs = {} # id -> Job
+        self.next_id = 1
+        self.lock = threading.Lock()
+        self.notifications = deque()
+        self.pending = threading.Event() # Sasta check: koi notification hai?
+
+    def submit(self, name, cmd):
+        """Returns (job, None) ya (None, busy_job) agar command ki concurrency limit poori hai."""
+        limit = int(cmd.get('max_concurrent', DEFAULT_MAX_CONCURRENT))
+        with self.lock:
+            running = [job for job in self.jobs.values() if job.name == name and job.active]
+            if len(running) >= limit:
+                return None, running[0]
+            finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+            for job_id in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+                del self.jobs[job_id]
+            job = Job(self.next_id, name, cmd)
+            self.next_id += 1
+            job.future = self.pool.submit(self._run, job)
+            self.jobs[job.id] = job
+        log.info(f"[Jobs] #{job.id} {name} queued.")
+        return job, None
+
+    def _run(self, job):
+        cmd = job.cmd
+        full_command = [cmd['script']] + cmd.get('args', [])
+        with job.lock:
+            if job.cancel_requested:
+                return self._finish(job, "cancelled")
+            try:
+                # IMPORTANT: shell=False hamesha rakhein (Security ke liye)
+                job.proc = subprocess.Popen(
+                    full_command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    stdin=subprocess.DEVNULL,
+                    text=True,
+                    bufsize=1,
+                    shell=False
+                )
+            except Exception as e:
+                job.output.append(("stderr", str(e)))
+                return self._finish(job, "failed")
+            job.status = "running"
+            job.started = time.monotonic()
+        log.info(f"[Jobs] #{job.id} Running: {' '.join(full_command)}")
+        readers = [
+            threading.Thread(target=self._pump, args=(job, job.proc.stdout, "stdout"), daemon=True),
+            threading.Thread(target=self._pump, args=(job, job.proc.stderr, "stderr"), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        timeout = float(cmd.get('timeout', DEFAULT_TIMEOUT))
+        try:
+            job.proc.wait(timeout=timeout)
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            self._terminate(job.proc)
+        for reader in readers:
+            reader.join(timeout=1.0)
+        job.returncode = job.proc.returncode
+        if job.cancel_requested:
+            status = "cancelled"
+        elif timed_out:
+            status = "timeout"
+        else:
+            status = "done" if job.returncode == 0 else "failed"
+        self._finish(job, status)
+
+    def _pump(self, job, stream, name):
+        for line in stream:
+            line = line.rstrip("\n")
+            job.output.append((name, line))
+            log.debug(f"[Jobs] #{job.id} {name}: {line}")
+        stream.close()
+
+    @staticmethod
+    def _terminate(proc):
+        if proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(timeout=KILL_GRACE_S)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished = time.monotonic()
+        elapsed = job.finished - (job.started or job.created)
+        log.info(f"[Jobs] #{job.id} {job.name} {status} (rc={job.returncode}, {elapsed:.1f}s)")
+        if status != "cancelled" and job.cmd.get('notify', True):
+            self.notifications.append(job)
+            self.pending.set()
+
+    def cancel(self, job_id):
+        """Queued job hata do, running job ka process terminate. Returns True agar active tha."""
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        with job.lock:
+            job.cancel_requested = True
+            if job.future.cancel(): # Abhi queue mein hi tha
+                self._finish(job, "cancelled")
+                return True
+            proc = job.proc
+        if proc is not None:
+            self._terminate(proc)
+        return True
+
+    def cancel_all(self):
+        with self.lock:
+            ids = [job.id for job in self.jobs.values() if job.active]
+        return [job_id for job_id in ids if self.cancel(job_id)]
+
+    def active_jobs(self):
+        with self.lock:
+            return [job for job in self.jobs.values() if job.active]
+
+    def pop_notifications(self):
+        """Khatam hue jobs (bolne ke liye), purane pehle."""
+        self.pending.clear() # Pehle clear: beech mein aaya job agli baar miss na ho
+        done = []
+        while self.notifications:
+            done.append(self.notifications.popleft())
+        return done
+
+    def shutdown(self):
+        """Exit par: koi bhi child process peeche na chhoote."""
+        self.cancel_all()
+        self.pool.shutdown(wait=True)
+
+
 class SafeRunner:
     def __init__(self):
         self.commands = {}
+        max_workers = DEFAULT_MAX_WORKERS
         try:
             whitelist = load_whitelist()
             for cmd in whitelist.get('safe_commands', []):
                 self.commands[cmd['name']] = cmd
             for cmd in whitelist.get('danger_commands', []):
                 self.commands[cmd['name']] = cmd
+            max_workers = (whitelist.get('jobs') or {}).get('max_workers', DEFAULT_MAX_WORKERS)
         except FileNotFoundError:
-            print(f"Error: {WHITELIST_FILE} nahi mila!")
+            log.error(f"Error: {WHITELIST_FILE} nahi mila!")
         except Exception as e:
-            print(f"Whitelist load karne mein error: {e}")
+            log.error(f"Whitelist load karne mein error: {e}")
+        self.jobs = JobManager(max_workers)
+        self.result_cache = {} # name -> (expires_at, result); sirf 'cache_ttl' wale commands
+        self.cache_lock = threading.Lock()
 
     def get_command_details(self, command_name):
         return self.commands.get(command_name)
 
-    def execute(self, command_name, is_authenticated=False):
+    def execute(self, command_name, is_authenticated=False, confirmed=False):
         """
         Command ko execute karta hai.
+        'background: true' wale commands job ban kar turant ("started", ...) lautate hain.
+        is_authenticated: bool, ya callable (jaise speaker_auth.Verification) jo sirf
+        requires_auth commands ke liye call hota hai -- baaki commands uska wait nahi karte.
         Returns (status, message_or_output)
         """
+        if command_name == CANCEL_JOBS:
+            cancelled = self.jobs.cancel_all()
+            if not cancelled:
+                return ("success", "Koi job chal nahi raha.")
+            return ("success", f"{len(cancelled)} job cancel kar diye.")
+        if command_name == JOB_STATUS:
+            active = self.jobs.active_jobs()
+            if not active:
+                return ("success", "Koi job chal nahi raha.")
+            return ("success", "Chal rahe jobs: " + ", ".join(f"{job.name} ({job.status})" for job in active))
+
         cmd = self.get_command_details(command_name)
 
         if not cmd:
             return ("error", "Command not found in whitelist.")
 
         # Step 1: Check Auth for danger commands
-        if cmd.get('requires_auth', False) and not is_authenticated:
+        if cmd.get('requires_auth', False) and not (is_authenticated() if callable(is_authenticated) else is_authenticated):
             return ("auth_required", "Yeh command highly sensitive hai. Pehle authentication zaroori hai.")
 
         # Step 2: Check for confirmation (Yeh hum main script mein handle karenge)
-        if cmd.get('confirm_prompt'):
+        if cmd.get('confirm_prompt') and not confirmed:
             return ("confirm_required", cmd['confirm_prompt'])
 
-        # Step 3: Execute the command
+        # Step 3a: Thodi der pehle ka jawab abhi bhi taaza hai? (cache_ttl seconds)
+        ttl = float(cmd.get('cache_ttl', 0))
+        if ttl > 0:
+            with self.cache_lock:
+                cached = self.result_cache.get(command_name)
+            if cached and cached[0] > time.monotonic():
+                log.info(f"[Cache] {command_name} ka pichla jawab ({ttl:.0f}s TTL)")
+                return cached[1]
+        result = self._run_command(command_name, cmd)
+        if ttl > 0 and result[0] == "success":
+            with self.cache_lock:
+                self.result_cache[command_name] = (time.monotonic() + ttl, result)
+        return result
+
+    def _run_command(self, command_name, cmd):
+        # Step 3b: 'handler' wale commands Python mein hi (koi fork/exec nahi)
+        if cmd.get('handler'):
+            try:
+                message = cmd.get('message', "")
+                return ("success", f"{message} {run_probe(cmd)}".strip())
+            except ProbeError as e:
+                return ("error", f"Ek error hua: {e}")
+
+        # Step 3c: Lamba command -> background job, main loop free rehta hai
+        if cmd.get('background', False):
+            job, busy = self.jobs.submit(command_name, cmd)
+            if job is None:
+                return ("busy", f"{command_name} pehle se chal raha hai (job {busy.id}).")
+            message = cmd.get('started_message', f"{command_name} shuru ho gaya. Poora hone par bataunga.")
+            return ("started", message)
+
+        # Step 3d: Execute the command
         full_command = [cmd['script']] + cmd.get('args', [])
 
         try:
-            print(f"Running: {' '.join(full_command)}")
+            log.info(f"Running: {' '.join(full_command)}")
 
             # IMPORTANT: shell=False hamesha rakhein (Security ke liye)
             result = subprocess.run(
                 full_command,
                 capture_output=True,
                 text=True,
-                timeout=30,
+                timeout=float(cmd.get('timeout', DEFAULT_TIMEOUT)),
                 check=True,
                 shell=False 
             )
 
-            output = result.stdout.strip()
             message = cmd.get('message', "Command safaltapoorvak chala:")
-
-            # Output ko ek line mein clean karo
-            clean_output = " ".join(output.splitlines())
-            return ("success", f"{message} {clean_output}")
+            return ("success", f"{message} {_clean(result.stdout)}")
 
         except subprocess.CalledProcessError as e:
             return ("error", f"Command fail ho gaya: {e.stderr}")
         except Exception as e:
             return ("error", f"Ek error hua: {e}")
 
+    def shutdown(self):
+        self.jobs.shutdown()
+
 # --- Test Karne Ke Liye ---
 if __name__ == "__main__":
     print("--- Safe Runner Test ---")
@@ -93,8 +351,34 @@ if __name__ == "__main__":
     status, msg = runner.execute("update_system", is_authenticated=True)
     print(f"Status: {status}\n{msg}")
 
-    print("\n--- Test 5: Unknown Command ---")
+    print("\n--- Test 4b: Native Probe + TTL Cache ---")
+    runner.commands['ram_test'] = {'name': 'ram_test', 'handler': 'memory', 'cache_ttl': 5, 'message': "RAM:"}
+    for _ in range(2):
+        start = time.perf_counter()
+        print(runner.execute("ram_test"), f"({(time.perf_counter() - start) * 1000:.2f} ms)")
+    print("\n--- Test 5: Background Job (stream, limit, cancel) ---")
+    runner.commands['slow_test'] = {
+        'name': 'slow_test', 'script': '/bin/sh', 'args': ['-c', 'echo start; sleep 1; echo sab theek'],
+        'background': True, 'timeout': 5, 'done_message': "Slow test poora hua."
+    }
+    runner.commands['stuck_test'] = {
+        'name': 'stuck_test', 'script': '/bin/sleep', 'args': ['30'], 'background': True, 'timeout': 0.5
+    }
+    start = time.monotonic()
+    print(runner.execute("slow_test"), f"({(time.monotonic() - start) * 1000:.1f} ms)")
+    print(runner.execute("slow_test")) # max_concurrent=1 -> busy
+    print(runner.execute("stuck_test"))
+    print(runner.execute("job_status"))
+    time.sleep(1.5)
+    for job in runner.jobs.pop_notifications():
+        print(f"Notify: {job.summary()}")
+    runner.commands['stuck_test']['timeout'] = 30
+    print(runner.execute("stuck_test"))
+    print(runner.execute("cancel_jobs"))
+
+    print("\n--- Test 6: Unknown Command ---")
     status, msg = runner.execute("delete_everything")
     print(f"Status: {status}\n{msg}")
 
+    runner.shutdown()
     print("\n--- Test Complete ---")
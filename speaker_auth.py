@@ -0,0 +1,141 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+
+from jarvis_log import get_logger
+from speaker_store import DEFAULT_TOP_K, open_speaker_store
+
+log = get_logger(__name__)
+
+# Yeh file speaker verification ko command ke audio par hi chalati hai.
+# Pehle verify_speaker hotword ke baad alag se 3 second record karta tha ("Please verify.") --
+# har command par 3 second bekaar, isliye woh band pada tha. Ab record_command wala audio hi
+# ek worker thread mein embed hota hai, STT ke saath-saath; sirf requires_auth commands
+# result ka intezaar karte hain, baaki ke liye verification latency zero hai.
+# Matching speaker_store ke saath: ghar ke saare enrolled log, har ek ka apna threshold.
+
+DEFAULT_WAIT_S = 5.0 # Itni der mein embedding na bane toh fail (fail closed)
+MIN_AUDIO_S = 0.5 # Isse chhote clip ka embedding bharose layak nahi
+
+
+class Verification:
+    """Ek command ka chal raha verification. verified() pehli baar block karta hai, phir cached."""
+
+    def __init__(self, future, wait_s):
+        self.future = future
+        self.wait_s = wait_s
+        self.user = None
+        self.score = None
+        self.matches = []
+        self.waited_ms = None
+
+    def verified(self):
+        start = time.perf_counter()
+        try:
+            matches = self.future.result(timeout=self.wait_s)
+        except FutureTimeout:
+            log.warning(f"[Speaker] Verification {self.wait_s:.0f}s mein poora nahi hua: FAILED.")
+            return False
+        except Exception as e:
+            log.error(f"Speaker verification error: {e}")
+            return False
+        finally:
+            if self.waited_ms is None:
+                self.waited_ms = (time.perf_counter() - start) * 1000
+        if matches is None:
+            log.warning("[Speaker] Audio bahut chhota tha: FAILED.")
+            return False
+        self.matches = matches
+        if not matches:
+            log.warning("[Speaker] Koi voiceprint enrolled nahi: FAILED.")
+            return False
+        best = matches[0]
+        self.score = best.score
+        ok = best.accepted
+        if ok:
+            self.user = best.user
+        ranked = ", ".join(f"{m.user}={m.score:.2f}/{m.threshold}" for m in matches)
+        log.info(f"[Speaker] {ranked} -> {'VERIFIED: ' + best.user if ok else 'FAILED'} "
+                 f"(wait {self.waited_ms:.0f} ms)")
+        return ok
+
+    __call__ = verified # SafeRunner ise lazy is_authenticated ki tarah call karta hai
+
+
+class SpeakerVerifier:
+    """VoiceEncoder ek hi baar load; submit(audio) background mein embed karke Verification deta hai."""
+
+    def __init__(self, encoder, store, sample_rate=16000, wait_s=DEFAULT_WAIT_S, top_k=DEFAULT_TOP_K):
+        self.encoder = encoder
+        self.store = store
+        self.top_k = top_k
+        self.sample_rate = sample_rate
+        self.wait_s = float(wait_s)
+        # Ek hi worker: encoder thread-safe hone ki guarantee nahi, aur ek waqt mein ek hi command
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jarvis-speaker")
+
+    def _score(self, audio):
+        if len(audio) < MIN_AUDIO_S * self.sample_rate:
+            return None
+        return self.store.identify(self.encoder.embed_utterance(audio), top_k=self.top_k)
+
+    def submit(self, audio):
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        return Verification(self.pool.submit(self._score, audio), self.wait_s)
+
+    def stop(self):
+        self.pool.shutdown(wait=False)
+
+
+def create_speaker_verifier(config, sample_rate=16000):
+    """
+    config['SPEAKER_VERIFY'] (default True) aur speaker store (SPEAKER_STORE_DIR).
+    resemblyzer ya koi voiceprint na ho toh None (verification skip, jaise pehle).
+    """
+    if not config.get('SPEAKER_VERIFY', True):
+        return None
+    store = open_speaker_store(config)
+    if not len(store):
+        log.warning("WARNING: Speaker voiceprint nahi mila. 'python3 speaker_enroll.py' chala lein.")
+        return None
+    try:
+        from resemblyzer import VoiceEncoder
+    except Exception:
+        log.warning("Notice: 'resemblyzer' not installed. Speaker verification will be disabled.")
+        return None
+    encoder = VoiceEncoder() # Model load sirf yahan, startup par ek baar
+    log.info(f"Speaker voiceprints loaded ({', '.join(store.names)}).")
+    return SpeakerVerifier(encoder, store, sample_rate=sample_rate)
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    print("--- Speaker Auth Test ---")
+
+    class SlowEncoder:
+        """Asli VoiceEncoder jaisa: audio -> normalized vector (yahan spectrum ke band energies)."""
+        def embed_utterance(self, audio):
+            time.sleep(0.3) # Model ka kaam
+            spectrum = np.abs(np.fft.rfft(audio[:16000]))
+            bands = np.array([band.mean() for band in np.array_split(spectrum, 32)], dtype=np.float32)
+            return bands / np.linalg.norm(bands)
+
+    t = np.arange(32000) / 16000.0
+    owner = np.sin(2 * np.pi * 180 * t).astype(np.float32)
+    stranger = np.sin(2 * np.pi * 2500 * t).astype(np.float32)
+    import tempfile
+    from speaker_store import SpeakerStore
+    encoder = SlowEncoder()
+    store = SpeakerStore(tempfile.mkdtemp(prefix='jarvis_speakers_'))
+    store.enroll("Sir", encoder.embed_utterance(owner))
+    verifier = SpeakerVerifier(encoder, store)
+
+    start = time.perf_counter()
+    pending = verifier.submit(owner)
+    print(f"submit() returned in {(time.perf_counter() - start) * 1000:.1f} ms")
+    time.sleep(0.35) # Yahan STT chal raha hota
+    print(f"Owner verified: {pending.verified()} ({pending.user}, score {pending.score:.2f}, waited {pending.waited_ms:.0f} ms)")
+    print(f"Stranger verified: {verifier.submit(stranger).verified()}")
+    print(f"Too short verified: {verifier.submit(owner[:1000]).verified()}")
+    verifier.stop()
+    print("\n--- Test Complete ---")
@@ -1,48 +1,54 @@
 from resemblyzer import VoiceEncoder
 import sounddevice as sd
-import numpy as np
+import argparse
 import time
 import json
-import os
+
+from speaker_store import open_speaker_store
 
 def load_config():
     with open('config.json', 'r') as f:
         return json.load(f)
 
 config = load_config()
-encoder = VoiceEncoder()
 SAMPLE_RATE = 16000 # Resemblyzer ke liye 16kHz zaroori hai
 
-# File ka poora path config se lo
-embed_path = os.path.expanduser(config['SPEAKER_EMBED_PATH'])
+# Ghar ke har insaan ke liye alag --user; har baar chalane par naye takes purane samples mein jud jaate hain
+parser = argparse.ArgumentParser(description="Voiceprint enroll karo (multi-user speaker store)")
+parser.add_argument('--user', default=config['USER_NAME'], help="Kiska voiceprint (default: USER_NAME)")
+parser.add_argument('--takes', type=int, default=3, help="Kitne 5 second ke takes record karne hain")
+parser.add_argument('--threshold', type=float, default=None, help="Is user ka verification threshold")
+args = parser.parse_args()
+
+encoder = VoiceEncoder()
+store = open_speaker_store(config)
 
 try:
-    print(f"\nReady {config['USER_NAME']}. Kripya 5 second tak kuch bolein.")
+    print(f"\nReady {args.user}. {args.takes} baar 5 second tak kuch bolein (har baar alag vakya).")
     print("Example: 'Hello Jarvis, mera naam [aapka naam] hai aur main system ko authorize kar raha hoon.'")
-    print("\n3...")
-    time.sleep(1)
-    print("2...")
-    time.sleep(1)
-    print("1...")
-    time.sleep(1)
-    print("Recording shuru...")
-
-    # 5 second ki recording
-    duration = 5
-    audio = sd.rec(int(duration * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1, dtype='float32')
-    sd.wait() # Recording complete hone ka wait karein
-
-    print("Recording poori hui. Voiceprint process kar raha hoon...")
 
-    # --- YEH HAI CORRECT CODE ---
-    # Voiceprint generate karein
-    audio_data = audio.flatten()
-    embedding = encoder.embed_utterance(audio_data)
-    # ---------------------------
-
-    # Save karein
-    np.save(embed_path, embedding)
-    print(f"\nSuccess! Voiceprint saved to {embed_path}")
+    duration = 5
+    for take in range(1, args.takes + 1):
+        print(f"\nTake {take}/{args.takes}: 3...")
+        time.sleep(1)
+        print("2...")
+        time.sleep(1)
+        print("1...")
+        time.sleep(1)
+        print("Recording shuru...")
+
+        # 5 second ki recording
+        audio = sd.rec(int(duration * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1, dtype='float32')
+        sd.wait() # Recording complete hone ka wait karein
+
+        print("Recording poori hui. Voiceprint process kar raha hoon...")
+        embedding = encoder.embed_utterance(audio.flatten())
+
+        # Store mein append (poori file dobara nahi likhi jaati)
+        samples = store.enroll(args.user, embedding, threshold=args.threshold)
+        print(f"Saved: {args.user} ke ab {samples} samples.")
+
+    print(f"\nSuccess! Voiceprint saved to {store.directory}")
 
 except Exception as e:
     print(f"Ek error hua: {e}")
@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file ghar ke kai logon ke voiceprints ek jagah rakhti hai.
+# Pehle speaker_enroll ek hi 5 second take ka ek .npy save karta tha, aur threshold har file mein
+# alag tha (main.py 0.75, speaker_verify.py 0.80). Ab:
+#   embeddings.f32  saare samples ek contiguous float32 matrix (rows x dim), append-only, np.memmap se padho
+#   index.json      dim, rows ki ginti, har user ke row numbers + apna threshold
+# Har user ka centroid (normalized mean) memory mein ek (users x dim) matrix mein; identify ek hi
+# matrix-vector product (ek BLAS call) hai, chahe kitne bhi log hon.
+
+SPEAKER_DIR = os.path.join(os.path.expanduser('~/jarvis'), 'speakers')
+DATA_FILE = 'embeddings.f32'
+INDEX_FILE = 'index.json'
+DEFAULT_THRESHOLD = 0.75 # Sab jagah yahi (per-user badal sakte hain)
+DEFAULT_TOP_K = 3
+
+SpeakerMatch = namedtuple('SpeakerMatch', ['user', 'score', 'threshold', 'accepted'])
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class SpeakerStore:
+    """
+    enroll() naya sample file ke end mein jodta hai (poori file dobara nahi likhi jaati) aur sirf
+    usi user ka centroid dobara banata hai. identify() centroids @ query -> top-k matches.
+    """
+
+    def __init__(self, directory=SPEAKER_DIR):
+        self.directory = directory
+        self.data_path = os.path.join(directory, DATA_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.lock = threading.Lock()
+        self.dim = None
+        self.rows = 0
+        self.users = {} # name -> {"rows": [...], "threshold": float}
+        self.embeddings = None # np.memmap (rows x dim), read-only
+        self.names = [] # centroid matrix ki row order
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.thresholds = np.zeros(0)
+        self._load()
+
+    # --- Load ---
+    def _load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        self.dim = index['dim']
+        self.rows = index['rows']
+        self.users = index['users']
+        self._map()
+        for name in self.users:
+            self._recentroid(name)
+
+    def _map(self):
+        # Index mein jitni rows hain utni hi: crash se bachi aadhi append wali row ignore ho jaati hai
+        if self.rows:
+            self.embeddings = np.memmap(self.data_path, dtype=np.float32, mode='r', shape=(self.rows, self.dim))
+        else:
+            self.embeddings = None
+
+    # --- Centroids ---
+    def _recentroid(self, name):
+        """Sirf ek user ka centroid (aur threshold) matrix mein update."""
+        info = self.users[name]
+        centroid = _normalize(_normalize(self.embeddings[info['rows']]).mean(axis=0))
+        if name in self.names:
+            i = self.names.index(name)
+            self.centroids[i] = centroid
+            self.thresholds[i] = info['threshold']
+        else:
+            self.names.append(name)
+            if self.centroids.size == 0:
+                self.centroids = centroid[None, :].copy()
+            else:
+                self.centroids = np.vstack([self.centroids, centroid[None, :]])
+            self.thresholds = np.append(self.thresholds, info['threshold'])
+
+    # --- Enrollment ---
+    def enroll(self, name, embedding, threshold=None):
+        """Ek naya sample (incremental). threshold diya ho toh us user ka threshold bhi badlo."""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        with self.lock:
+            if self.dim is None:
+                self.dim = int(embedding.size)
+            elif embedding.size != self.dim:
+                raise ValueError(f"Embedding dim {embedding.size} != store dim {self.dim}")
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.data_path, 'r+b' if os.path.exists(self.data_path) else 'wb') as f:
+                f.seek(self.rows * self.dim * 4) # Pichli aadhi likhi row (agar thi) overwrite
+                f.write(embedding.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            info = self.users.setdefault(name, {"rows": [], "threshold": DEFAULT_THRESHOLD})
+            info['rows'].append(self.rows)
+            if threshold is not None:
+                info['threshold'] = float(threshold)
+            self.rows += 1
+            self._write_index()
+            self._map()
+            self._recentroid(name)
+        log.info(f"[Speakers] {name}: {len(info['rows'])} samples (total {self.rows}).")
+        return len(info['rows'])
+
+    def set_threshold(self, name, threshold):
+        with self.lock:
+            self.users[name]['threshold'] = float(threshold)
+            self._write_index()
+            self.thresholds[self.names.index(name)] = float(threshold)
+
+    def _write_index(self):
+        index = {"dim": self.dim, "rows": self.rows, "users": self.users}
+        fd, tmp_path = tempfile.mkstemp(prefix='.index.', suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    # --- Identification ---
+    def identify(self, embedding, top_k=DEFAULT_TOP_K):
+        """Best pehle SpeakerMatch list. accepted: score us user ke threshold se upar."""
+        if not self.names:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32).reshape(-1))
+        centroids, thresholds, names = self.centroids, self.thresholds, self.names
+        scores = centroids @ query # Ek hi BLAS call, saare users
+        k = min(top_k, len(names))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [SpeakerMatch(names[i], float(scores[i]), float(thresholds[i]), bool(scores[i] > thresholds[i]))
+                for i in top]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def open_speaker_store(config):
+    """
+    config['SPEAKER_STORE_DIR'] wala store. Khaali ho aur purana SPEAKER_EMBED_PATH (.npy) maujood
+    ho toh use USER_NAME ke pehle sample ki tarah import kar lo.
+    """
+    store = SpeakerStore(os.path.expanduser(config.get('SPEAKER_STORE_DIR', SPEAKER_DIR)))
+    legacy = config.get('SPEAKER_EMBED_PATH')
+    if not len(store) and legacy and os.path.exists(os.path.expanduser(legacy)):
+        store.enroll(config.get('USER_NAME', 'owner'), np.load(os.path.expanduser(legacy)))
+        log.info(f"[Speakers] Purana voiceprint {legacy} import kiya.")
+    return store
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import time
+    print("--- Speaker Store Test ---")
+    rng = np.random.default_rng(0)
+    voices = {name: rng.normal(size=256) for name in ["Sir", "Didi", "Papa"]}
+    with tempfile.TemporaryDirectory() as d:
+        store = SpeakerStore(d)
+        for name, voice in voices.items():
+            for _ in range(3): # Har user ke kai takes
+                store.enroll(name, voice + rng.normal(scale=0.4, size=256))
+        store.set_threshold("Papa", 0.85)
+        size = os.path.getsize(store.data_path)
+        store.enroll("Didi", voices["Didi"] + rng.normal(scale=0.4, size=256)) # Incremental
+        print(f"Data file: {size} -> {os.path.getsize(store.data_path)} bytes (append only)")
+
+        reopened = SpeakerStore(d) # Restart ke baad memmap se
+        query = voices["Didi"] + rng.normal(scale=0.4, size=256)
+        for match in reopened.identify(query):
+            print(f"  {match.user:5s} score={match.score:.2f} threshold={match.threshold} accepted={match.accepted}")
+        print(f"Stranger: {reopened.identify(rng.normal(size=256), top_k=1)}")
+
+        big = SpeakerStore(os.path.join(d, 'big'))
+        for i in range(50):
+            big.enroll(f"user{i}", rng.normal(size=256))
+        start = time.perf_counter()
+        for _ in range(1000):
+            big.identify(query)
+        print(f"50 users, 1000 identify: {(time.perf_counter() - start) * 1000:.1f} ms")
+    print("\n--- Test Complete ---")
@@ -1,8 +1,8 @@
 from resemblyzer import VoiceEncoder
 import sounddevice as sd
-import numpy as np
 import json
-import os
+
+from speaker_store import open_speaker_store
 
 def load_config():
     with open('config.json', 'r') as f:
@@ -11,20 +11,14 @@ def load_config():
 config = load_config()
 encoder = VoiceEncoder()
 SAMPLE_RATE = 16000
-VERIFICATION_THRESHOLD = 0.80 # Humara 'pass mark'
 
-# Saved voiceprint load karein
-embed_path = os.path.expanduser(config['SPEAKER_EMBED_PATH'])
-try:
-    saved_embedding = np.load(embed_path)
-    print("Saved voiceprint loaded.")
-except FileNotFoundError:
-    print(f"Error: Voiceprint file nahi mila: {embed_path}")
+# Saved voiceprints load karein (threshold har user ka apna, store mein)
+store = open_speaker_store(config)
+if not len(store):
+    print(f"Error: Koi voiceprint nahi mila: {store.directory}")
     print("Pehle 'python3 speaker_enroll.py' chalakar voice register karein.")
     exit()
-
-def cosine_similarity(embed1, embed2):
-    return np.dot(embed1, embed2) / (np.linalg.norm(embed1) * np.linalg.norm(embed2))
+print(f"Saved voiceprints loaded: {', '.join(store.names)}")
 
 try:
     print("\nVerification: Kripya 3 second tak kuch bolein (kuch bhi)...")
@@ -36,19 +30,15 @@ try:
 
     print("Got it. Verifying...")
 
-    # --- YEH HAI CORRECT CODE ---
-    # Naya embedding banayein
-    current_audio = audio.flatten()
-    current_embedding = encoder.embed_utterance(current_audio)
-    # ---------------------------
-
-    # Compare karein
-    similarity = cosine_similarity(saved_embedding, current_embedding)
+    current_embedding = encoder.embed_utterance(audio.flatten())
 
-    print(f"Similarity Score: {similarity:.2f}")
+    # Saare users se ek saath compare karein (top-k)
+    matches = store.identify(current_embedding)
+    for match in matches:
+        print(f"  {match.user}: Similarity Score {match.score:.2f} (threshold {match.threshold})")
 
-    if similarity > VERIFICATION_THRESHOLD:
-        print(f"STATUS: VERIFIED. Welcome, {config['USER_NAME']}.")
+    if matches and matches[0].accepted:
+        print(f"STATUS: VERIFIED. Welcome, {matches[0].user}.")
     else:
         print("STATUS: FAILED. Aap authorized nahi hain.")
 
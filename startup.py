@@ -0,0 +1,188 @@
+import importlib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file Jarvis ka startup tez karti hai aur uska hisaab rakhti hai.
+# Pehle load_all sab kuch ek ke baad ek karta tha: numpy, sounddevice, pvporcupine, config, Porcupine,
+# STT, LLM server, VoiceEncoder (torch!), Piper... aur phir blocking "Jarvis is ready". Reboot ya crash
+# ke baad hotword sun-ne tak ka time hi asli latency hai. Ab:
+#   - Imports ek thread pool mein saath-saath (cold boot par zyada time disk I/O aur .so loading ka hai)
+#   - Hotword tak zaroori components (Porcupine + mic, STT, Piper pool...) parallel mein
+#   - Bhaari aur kabhi-kabhi kaam aane wale (LLM server, VoiceEncoder) hotword live hone ke BAAD
+#     background mein; pehla interaction unhe chahiye toh wait() se intezaar karta hai
+# '--startup-profile' har component ka import/init time print karta hai.
+
+DEFAULT_WORKERS = 4
+
+# kind: 'import' / 'init' / 'background';  start_s: startup shuru hone ke kitne second baad
+Record = namedtuple('Record', ['name', 'kind', 'start_s', 'duration_s', 'thread', 'error'])
+
+
+class StartupProfile:
+    """Startup ke saare kaam yahan se chalte hain taaki har ek ka time record ho."""
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.t0 = time.perf_counter()
+        self.workers = workers
+        self.records = []
+        self.milestones = {} # name -> seconds (jaise 'hotword_live')
+        self.background_futures = {} # name -> Future
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def _elapsed(self):
+        return time.perf_counter() - self.t0
+
+    @contextmanager
+    def timed(self, name, kind='init'):
+        start = self._elapsed()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            record = Record(name, kind, start, self._elapsed() - start, threading.current_thread().name, error)
+            with self.lock:
+                self.records.append(record)
+
+    def import_module(self, name):
+        with self.timed(name, 'import'):
+            return importlib.import_module(name)
+
+    def preload(self, names):
+        """
+        Modules ko saath-saath import karo (baad ke 'import x' sirf sys.modules hit hain).
+        Jo module na mile usse yahan koi error nahi -- asli import apni jagah pe fail karega.
+        """
+        def load(name):
+            try:
+                self.import_module(name)
+            except Exception as e:
+                log.debug(f"[Startup] {name} preload nahi hua: {e}")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="jarvis-import") as pool:
+            list(pool.map(load, names))
+
+    def run_parallel(self, tasks):
+        """
+        tasks: [(name, func), ...] ek saath chalao. Returns {name: result}; kisi task ka exception
+        result ki jagah exception object hota hai (caller decide kare fatal hai ya nahi).
+        """
+        def run(name, func):
+            with self.timed(name):
+                return func()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="jarvis-init") as pool:
+            futures = {name: pool.submit(run, name, func) for name, func in tasks}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+        return results
+
+    def background(self, name, func):
+        """Hotword live hone ke baad load hone wala component. Returns Future."""
+        def run():
+            with self.timed(name, 'background'):
+                return func()
+
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="jarvis-bg")
+            future = self.pool.submit(run)
+            self.background_futures[name] = future
+
+        def report_failure(done):
+            if done.exception() is not None:
+                log.warning(f"[Startup] {name} load nahi hua: {done.exception()}")
+
+        future.add_done_callback(report_failure)
+        return future
+
+    def pending(self, name):
+        """Background mein abhi load ho raha ho toh uska Future, warna None."""
+        future = self.background_futures.get(name)
+        return future if future is not None and not future.done() else None
+
+    def wait(self, name, timeout=None):
+        """Background component ka intezaar (pehla interaction jaldi aa gaya ho). True = ready."""
+        future = self.background_futures.get(name)
+        if future is None or future.done():
+            return True
+        log.info(f"[Startup] '{name}' abhi load ho raha hai, intezaar...")
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+        return future.done()
+
+    def mark(self, name):
+        self.milestones[name] = self._elapsed()
+
+    def report(self):
+        with self.lock:
+            records = sorted(self.records, key=lambda r: r.start_s)
+        lines = ["--- Startup profile (seconds since start) ---",
+                 f"{'component':<24}{'kind':<12}{'start':>8}{'time':>8}  thread"]
+        for r in records:
+            status = f"  FAILED: {r.error}" if r.error else ""
+            lines.append(f"{r.name:<24}{r.kind:<12}{r.start_s:>8.3f}{r.duration_s:>8.3f}  {r.thread}{status}")
+        for name, at in sorted(self.milestones.items(), key=lambda item: item[1]):
+            lines.append(f"{'* ' + name:<36}{at:>8.3f}")
+        return "\n".join(lines)
+
+    def report_when_done(self, printer=print):
+        """Background loads poore hone par report (hotword tab tak chal raha hota hai)."""
+        def run():
+            for future in list(self.background_futures.values()):
+                try:
+                    future.result()
+                except Exception:
+                    pass
+            self.mark('all_loaded')
+            printer(self.report())
+
+        threading.Thread(target=run, name="jarvis-startup-report", daemon=True).start()
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    print("--- Startup Profile Test ---")
+    profile = StartupProfile()
+    profile.preload(['json', 'sqlite3', 'numpy', 'yaml', 'not_a_real_module'])
+
+    def slow(name, seconds):
+        def load():
+            time.sleep(seconds)
+            return name
+        return load
+
+    start = time.perf_counter()
+    results = profile.run_parallel([('hotword', slow('hotword', 0.3)), ('stt', slow('stt', 0.2)),
+                                    ('tts_pool', slow('tts_pool', 0.25))])
+    profile.mark('hotword_live')
+    print(f"Critical path: {time.perf_counter() - start:.2f}s (serial hota: 0.75s) -> {results}")
+
+    profile.background('llm', slow('llm', 0.4))
+    print(f"llm pending: {profile.pending('llm') is not None}")
+    print(f"wait('llm'): {profile.wait('llm', timeout=2)}")
+    profile.background('broken', lambda: 1 / 0)
+    done = threading.Event()
+    profile.report_when_done(printer=lambda text: (print(text), done.set()))
+    done.wait(2)
+    profile.shutdown()
+    print("\n--- Test Complete ---")
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import numpy as np
+
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file user ke bolte-bolte hi transcription karti hai.
+# Background thread har 'step' par ab tak ka audio (pichle committed point se) decode karta hai.
+# Jo segments do lagataar decodes mein same aaye aur audio ke end se door hain, woh
+# 'stable' maan kar commit ho jaate hain. End of utterance par sirf bacha hua tail
+# dobara decode hota hai, isliye STT ka zyada time user ki apni speech ke peeche chhup jaata hai.
+
+DEFAULT_STEP_S = 1.0 # Kitni der baad naya decode
+MIN_WINDOW_S = 0.8 # Isse chhota audio decode karna bekaar
+MAX_WINDOW_S = 12.0 # Window isse lambi ho jaaye toh aakhri segment chhod kar sab commit
+GUARD_S = 0.5 # Audio ke end ke itne paas wale segment abhi 'kachche' hain
+
+
+def _norm(text):
+    return " ".join(text.lower().split())
+
+
+class StreamingTranscriber:
+    """
+    feed() se audio frames aate hain (VAD callback se), partial() stable text deta hai,
+    finish() tail decode karke poora transcript return karta hai.
+    """
+
+    def __init__(self, engine, sample_rate=16000, step_s=DEFAULT_STEP_S, preprocess=None, on_partial=None):
+        self.engine = engine
+        self.sample_rate = sample_rate
+        self.step_s = step_s
+        self.preprocess = preprocess # jaise audio_conditioning.condition (None return = silent)
+        self.on_partial = on_partial
+        self.lock = threading.Lock()
+        self.chunks = []
+        self.total_samples = 0
+        self.committed_texts = []
+        self.committed_sample = 0
+        self.tentative = ""
+        self.last_hypothesis = []
+        self.decodes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def feed(self, samples):
+        """Real-time callback se bhi call ho sakta hai: sirf list append."""
+        with self.lock:
+            self.chunks.append(samples)
+            self.total_samples += len(samples)
+
+    def _snapshot(self, start_sample):
+        with self.lock:
+            if len(self.chunks) > 1:
+                self.chunks = [np.concatenate(self.chunks)]
+            audio = self.chunks[0] if self.chunks else np.zeros(0, dtype=np.float32)
+        return audio[start_sample:]
+
+    def _decode(self, window):
+        if self.preprocess is not None:
+            window = self.preprocess(window)
+            if window is None:
+                return None
+        self.decodes += 1
+        return self.engine.transcribe(window, self.sample_rate)
+
+    def _step(self):
+        window = self._snapshot(self.committed_sample)
+        window_s = len(window) / float(self.sample_rate)
+        if window_s < MIN_WINDOW_S:
+            return
+        transcript = self._decode(window)
+        if transcript is None:
+            return
+        segments = [seg for seg in transcript.segments if seg.text.strip()]
+
+        # Local agreement: pichle decode se match karne wale shuru ke segments
+        agreed = 0
+        for prev, cur in zip(self.last_hypothesis, segments):
+            if _norm(prev.text) != _norm(cur.text):
+                break
+            if cur.end > window_s - GUARD_S:
+                break
+            agreed += 1
+        if agreed == 0 and window_s > MAX_WINDOW_S and len(segments) > 1:
+            agreed = len(segments) - 1 # Window bahut lambi: aakhri chhod kar sab commit
+
+        changed = agreed > 0
+        if agreed:
+            with self.lock:
+                self.committed_texts.extend(seg.text.strip() for seg in segments[:agreed])
+                self.committed_sample += int(segments[agreed - 1].end * self.sample_rate)
+            segments = segments[agreed:]
+        self.last_hypothesis = segments
+        tentative = " ".join(seg.text.strip() for seg in segments)
+        changed = changed or tentative != self.tentative
+        self.tentative = tentative
+        if changed and self.on_partial:
+            self.on_partial(self.partial())
+
+    def _run(self):
+        while not self._stop.wait(self.step_s):
+            try:
+                self._step()
+            except Exception as e:
+                log.error(f"[Streaming STT] Partial decode error: {e}")
+
+    def partial(self):
+        """Ab tak ka text: committed (stable) + tentative."""
+        with self.lock:
+            committed = " ".join(self.committed_texts)
+        return " ".join((committed + " " + self.tentative).split())
+
+    def cancel(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def finish(self):
+        """Recording khatam: sirf uncommitted tail dobara decode karke poora text."""
+        self.cancel()
+        tail = self._snapshot(self.committed_sample)
+        tail_text = ""
+        if len(tail) / float(self.sample_rate) >= 0.1:
+            transcript = self._decode(tail)
+            if transcript is not None:
+                tail_text = transcript.text
+        with self.lock:
+            committed = " ".join(self.committed_texts)
+        return " ".join((committed + " " + tail_text).split())
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    from stt_engine import FakeSTTEngine, Segment, Transcript
+
+    WORDS = ["jarvis", "aaj", "ki", "tareekh", "kya", "hai"]
+
+    class WordFake(FakeSTTEngine):
+        """Har second ka sample value batata hai ki kaunsa word hai (deterministic)."""
+        def transcribe(self, audio, sample_rate=16000, timeout=60, language=None):
+            self.calls.append(len(audio) / sample_rate)
+            segs = []
+            for i in range(len(audio) // sample_rate):
+                word = WORDS[int(round(audio[i * sample_rate] * 10))]
+                segs.append(Segment(float(i), float(i + 1), word, 0.9))
+            return Transcript(" ".join(s.text for s in segs), segs, 'en')
+
+    print("--- Streaming STT Test (fake) ---")
+    engine = WordFake()
+    st = StreamingTranscriber(engine, step_s=0.2, on_partial=lambda t: print(f"Partial: '{t}'")).start()
+    for i in range(len(WORDS)):
+        st.feed(np.full(16000, i / 10.0, dtype=np.float32))
+        time.sleep(0.5)
+    print(f"Final: '{st.finish()}' (decodes={st.decodes}, tail decode={engine.calls[-1]:.1f}s)")
+    print("\n--- Test Complete ---")
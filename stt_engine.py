@@ -0,0 +1,315 @@
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import time
+import urllib.request
+import uuid
+from collections import namedtuple
+
+from audio_conditioning import to_wav_bytes
+from cpu_scheduler import spawn_command, stage_threads
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
+
+# Yeh file STT backend sambhalti hai.
+# Pehle har command par whisper.cpp binary naye sire se chalti thi (model har baar load).
+# Ab 'whisper-server' ek baar model load karta hai; hum 16 kHz PCM memory se HTTP par
+# bhejte hain aur text + har segment ka timing/confidence seedha wapas milta hai.
+
+JARVIS_DIR = os.path.expanduser('~/jarvis')
+WHISPER_BIN_DIR = os.path.join(JARVIS_DIR, 'whisper.cpp', 'build', 'bin')
+WHISPER_CLI_PATH = os.path.join(WHISPER_BIN_DIR, 'main')
+WHISPER_MODEL_PATH = os.path.join(JARVIS_DIR, 'whisper.cpp', 'models', 'ggml-tiny.en.bin')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8090
+DEFAULT_LOAD_TIMEOUT = 60
+SAMPLE_RATE = 16000
+
+Segment = namedtuple('Segment', ['start', 'end', 'text', 'confidence'])
+Transcript = namedtuple('Transcript', ['text', 'segments', 'language'])
+
+CLI_SEGMENT_RE = re.compile(r'\[(\d+):(\d+):([\d.]+)\s*-->\s*(\d+):(\d+):([\d.]+)\]\s*(.*)')
+
+
+class STTError(Exception):
+    """STT backend fail hua (process crash, timeout, ya model load nahi hua)."""
+
+
+def find_server_binary():
+    """whisper.cpp ke naye builds mein 'whisper-server', purane mein 'server'."""
+    for name in ('whisper-server', 'server'):
+        path = os.path.join(WHISPER_BIN_DIR, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(WHISPER_BIN_DIR, 'whisper-server')
+
+def _segment_confidence(seg):
+    """verbose_json segment se 0..1 confidence (avg_logprob ya word probabilities)."""
+    if seg.get('avg_logprob') is not None:
+        return float(math.exp(min(0.0, seg['avg_logprob'])))
+    probs = [w.get('probability') for w in seg.get('words', []) if w.get('probability') is not None]
+    if probs:
+        return float(sum(probs) / len(probs))
+    return None
+
+def _multipart(fields, file_field, filename, file_bytes):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+        )
+    parts.append(
+        (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+         'Content-Type: audio/wav\r\n\r\n').encode('utf-8') + file_bytes + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b"".join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class WhisperServerEngine:
+    """
+    whisper.cpp ka server ek baar chalata hai; model resident rehta hai.
+    transcribe() float32/int16 PCM leta hai, disk nahi chhoota.
+    """
+    resident = True # Baar baar decode sasta hai (streaming STT ke layak)
+
+    def __init__(self, model_path=WHISPER_MODEL_PATH, server_path=None, threads=None,
+                 host=DEFAULT_HOST, port=DEFAULT_PORT, language='auto', load_timeout=DEFAULT_LOAD_TIMEOUT):
+        self.model_path = model_path
+        self.server_path = server_path or find_server_binary()
+        self.threads = threads # None/'auto': cpu_scheduler load dekh kar chune
+        self.host = host
+        self.port = int(port)
+        self.language = language
+        self.load_timeout = load_timeout
+        self.base_url = f"http://{host}:{self.port}"
+        self.proc = None
+        self._ready = False
+
+    def start(self):
+        if self.is_alive():
+            return
+        if not os.path.exists(self.server_path):
+            raise STTError(f"whisper server binary nahi mila: {self.server_path}")
+        if not os.path.exists(self.model_path):
+            raise STTError(f"Whisper model nahi mila: {self.model_path}")
+        command = [
+            self.server_path,
+            "-m", self.model_path,
+            "-t", str(stage_threads('stt', self.threads)),
+            "-l", self.language,
+            "--host", self.host,
+            "--port", str(self.port),
+        ]
+        log.info(f"[STT] Resident whisper server start kar raha hoon: {' '.join(command)}")
+        self._ready = False
+        self.proc = subprocess.Popen(
+            spawn_command('stt', command),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def wait_ready(self, timeout=None):
+        """Server port khulne tak wait (server model load karke hi listen karta hai)."""
+        if self._ready and self.is_alive():
+            return True
+        if not self.is_alive():
+            self.start()
+        deadline = time.monotonic() + (self.load_timeout if timeout is None else timeout)
+        while time.monotonic() < deadline:
+            if not self.is_alive():
+                raise STTError(f"whisper server band ho gaya (returncode={self.proc.returncode})")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=0.5):
+                    self._ready = True
+                    log.info("[STT] Whisper model loaded, server ready.")
+                    return True
+            except OSError:
+                time.sleep(0.1)
+        raise STTError("whisper server ready nahi hua (load timeout).")
+
+    def transcribe(self, audio, sample_rate=SAMPLE_RATE, timeout=60, language=None):
+        """PCM (float32 ya int16 numpy array) -> Transcript(text, segments, language)."""
+        self.wait_ready()
+        body, content_type = _multipart(
+            {
+                "response_format": "verbose_json",
+                "temperature": "0.0",
+                "language": language or self.language,
+            },
+            "file", "audio.wav", to_wav_bytes(audio, sample_rate)
+        )
+        request = urllib.request.Request(
+            self.base_url + "/inference",
+            data=body,
+            headers={"Content-Type": content_type},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as resp:
+                result = json.loads(resp.read().decode('utf-8'))
+        except Exception as e:
+            raise STTError(f"whisper server request fail hua: {e}") from e
+
+        segments = [
+            Segment(float(seg.get('start', 0.0)), float(seg.get('end', 0.0)),
+                    seg.get('text', '').strip(), _segment_confidence(seg))
+            for seg in result.get('segments', [])
+        ]
+        text = " ".join(result.get('text', '').split())
+        return Transcript(text, segments, result.get('language'))
+
+    def stop(self):
+        if self.is_alive():
+            log.info("[STT] Whisper server band kar raha hoon...")
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.proc = None
+        self._ready = False
+
+
+class WhisperCliEngine:
+    """
+    Fallback: har utterance par whisper.cpp CLI, par WAV stdin se aur text stdout se.
+    Server build nahi hua ho tab use hota hai. Confidence available nahi hota (None).
+    """
+    resident = False
+
+    def __init__(self, model_path=WHISPER_MODEL_PATH, cli_path=WHISPER_CLI_PATH, threads=None, language='auto'):
+        self.model_path = model_path
+        self.cli_path = cli_path
+        self.threads = threads # None/'auto': cpu_scheduler load dekh kar chune
+        self.language = language
+
+    def start(self):
+        if not os.path.exists(self.cli_path):
+            raise STTError(f"Whisper binary not found at {self.cli_path}")
+
+    def is_alive(self):
+        return os.path.exists(self.cli_path)
+
+    def wait_ready(self, timeout=None):
+        return self.is_alive()
+
+    def transcribe(self, audio, sample_rate=SAMPLE_RATE, timeout=120, language=None):
+        command = [
+            self.cli_path,
+            "-m", self.model_path,
+            "-f", "-",
+            "-t", str(stage_threads('stt', self.threads)),
+            "-l", language or self.language,
+            "-np"
+        ]
+        try:
+            proc = subprocess.run(spawn_command('stt', command), check=True, capture_output=True,
+                                  input=to_wav_bytes(audio, sample_rate), timeout=timeout)
+        except subprocess.CalledProcessError as e:
+            raise STTError(f"Whisper process failed: returncode={e.returncode} stderr={e.stderr[:1000]}") from e
+        except subprocess.TimeoutExpired as e:
+            raise STTError("Whisper process timeout.") from e
+
+        segments = []
+        for line in proc.stdout.decode('utf-8', errors='ignore').splitlines():
+            m = CLI_SEGMENT_RE.match(line.strip())
+            if not m:
+                continue
+            h1, m1, s1, h2, m2, s2, seg_text = m.groups()
+            start = int(h1) * 3600 + int(m1) * 60 + float(s1)
+            end = int(h2) * 3600 + int(m2) * 60 + float(s2)
+            segments.append(Segment(start, end, seg_text.strip(), None))
+        text = " ".join(" ".join(seg.text for seg in segments).split())
+        return Transcript(text, segments, None)
+
+    def stop(self):
+        pass
+
+
+class FakeSTTEngine:
+    """
+    Testing ke liye nakli STT. transcripts: list (har call par agla) ya ek string.
+    Audio ki lambai se ek segment banata hai.
+    """
+    resident = True
+
+    def __init__(self, transcripts="", confidence=0.9, language='en', delay=0.0):
+        self.transcripts = list(transcripts) if isinstance(transcripts, (list, tuple)) else None
+        self.default = transcripts if isinstance(transcripts, str) else ""
+        self.confidence = confidence
+        self.language = language
+        self.delay = delay
+        self.calls = [] # Tests ke liye: har call ke audio ki lambai (seconds)
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return True
+
+    def wait_ready(self, timeout=None):
+        return True
+
+    def transcribe(self, audio, sample_rate=SAMPLE_RATE, timeout=60, language=None):
+        duration = len(audio) / float(sample_rate)
+        self.calls.append(duration)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.transcripts is not None:
+            text = self.transcripts.pop(0) if self.transcripts else ""
+        else:
+            text = self.default
+        segments = [Segment(0.0, duration, text, self.confidence)] if text else []
+        return Transcript(text, segments, self.language)
+
+    def stop(self):
+        pass
+
+
+def create_stt_engine(config, model_path=WHISPER_MODEL_PATH):
+    """
+    config['STT_BACKEND'] ke hisaab se: 'server' (default), 'cli', 'cascade' ya 'fake'.
+    Server binary na ho toh CLI par fallback.
+    """
+    backend = config.get('STT_BACKEND', 'server')
+    threads = config.get('WHISPER_THREADS') # Na ho / 'auto': cpu_scheduler
+    if backend == 'fake':
+        return FakeSTTEngine()
+    if backend == 'cascade':
+        # Sasta model pehle, confidence/language fail ho tabhi bada (whisper_wrapper.py)
+        from whisper_wrapper import create_cascade
+        return create_cascade(config)
+    server_path = find_server_binary()
+    if backend == 'server' and os.path.exists(server_path):
+        return WhisperServerEngine(
+            model_path=model_path,
+            server_path=server_path,
+            threads=threads,
+            port=int(config.get('WHISPER_SERVER_PORT', DEFAULT_PORT))
+        )
+    if backend == 'server':
+        log.error(f"[STT] whisper server nahi mila ({server_path}), CLI par fallback.")
+    return WhisperCliEngine(model_path=model_path, threads=threads)
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import numpy as np
+    print("--- STT Engine Test (fake) ---")
+    engine = FakeSTTEngine(["aaj ki tareekh kya hai", "kitni ram hai"])
+    engine.start()
+    silence = np.zeros(SAMPLE_RATE * 2, dtype=np.float32)
+    for _ in range(3):
+        print(engine.transcribe(silence))
+    print(f"Calls: {engine.calls}")
+    print("\n--- Test Complete ---")
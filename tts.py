@@ -1,5 +1,20 @@
 import subprocess
 import os
+import json
+import queue
+import select
+import shutil
+import tempfile
+import threading
+import time
+import wave
+
+from audio_player import get_player
+from cpu_scheduler import spawn_command
+from tts_cache import PCMCache
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
 
 # --- Paths ---
 JARVIS_DIR = os.path.expanduser('~/jarvis')
@@ -10,67 +25,382 @@ HINDI_MODEL_PATH = os.path.join(JARVIS_DIR, 'piper', 'hi_IN-rohan-medium.onnx')
 EN_MALE_MODEL_PATH = os.path.join(JARVIS_DIR, 'piper', 'en_GB-alan-medium.onnx') # Male
 EN_FEMALE_MODEL_PATH = os.path.join(JARVIS_DIR, 'piper', 'en_GB-alba-medium.onnx') # Female
 
-TEMP_AUDIO_FILE = os.path.join(JARVIS_DIR, 'temp_tts_output.raw')
+# lang code -> (model path, error message mein naam)
+VOICES = {
+    'hi': (HINDI_MODEL_PATH, "Hindi"),
+    'en_m': (EN_MALE_MODEL_PATH, "English (Male)"),
+    'en_f': (EN_FEMALE_MODEL_PATH, "English (Female)"),
+}
+
+DEFAULT_SAMPLE_RATE = 22050 # Medium voices ka rate (model ki .onnx.json se override hota hai)
+SYNTH_TIMEOUT = 20 # Ek utterance ke synthesis ka max time (seconds)
+
+# Piper ki WAV files RAM-backed /dev/shm mein likhi jaati hain (disk nahi chhoona)
+SCRATCH_BASE = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+class TTSError(Exception):
+    """Piper worker synthesis nahi kar paaya (crash, timeout, ya start fail)."""
+
+
+def voice_sample_rate(model_path):
+    """Voice ki .onnx.json config se sample rate padhta hai."""
+    try:
+        with open(model_path + '.json', 'r') as f:
+            return int(json.load(f)['audio']['sample_rate'])
+    except Exception:
+        return DEFAULT_SAMPLE_RATE
 
-def speak(text_to_speak, lang='en_m'):
+
+class PiperWorker:
+    """
+    Ek voice ke liye resident piper process. Model sirf start() par ek baar load hota hai.
+    Har input line ek utterance hai; piper uski WAV /dev/shm mein likh kar path stdout par
+    print karta hai. Woh line hi utterance ka frame boundary hai, jisse hum exact
+    PCM bytes wapas nikaal lete hain.
+    """
+
+    def __init__(self, model_path, piper_binary=PIPER_BINARY):
+        self.model_path = model_path
+        self.piper_binary = piper_binary
+        self.sample_rate = voice_sample_rate(model_path)
+        self.proc = None
+        self.scratch_dir = None
+        self.lock = threading.Lock() # Ek waqt mein ek hi utterance
+        self.restarts = 0
+
+    def start(self):
+        if self.is_alive():
+            return
+        if not os.path.exists(self.piper_binary):
+            raise TTSError("Piper binary nahi mila!")
+        if self.scratch_dir is None:
+            self.scratch_dir = tempfile.mkdtemp(prefix='jarvis_piper_', dir=SCRATCH_BASE)
+        self.proc = subprocess.Popen(spawn_command('tts', [
+            self.piper_binary,
+            '--model', self.model_path,
+            '--output_dir', self.scratch_dir
+        ]), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def restart(self):
+        log.info(f"[TTS] Piper worker restart ho raha hai ({os.path.basename(self.model_path)})")
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def _read_line(self, timeout):
+        """stdout se ek line padhta hai, timeout ke saath."""
+        fd = self.proc.stdout.fileno()
+        line = b""
+        deadline = time.monotonic() + timeout
+        while not line.endswith(b"\n"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TTSError("Piper synthesis timeout.")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 1)
+            if not chunk:
+                raise TTSError("Piper worker band ho gaya.")
+            line += chunk
+        return line.decode('utf-8', errors='ignore').strip()
+
+    def _synthesize_once(self, text):
+        self.proc.stdin.write((text + "\n").encode('utf-8'))
+        self.proc.stdin.flush()
+        wav_path = self._read_line(SYNTH_TIMEOUT)
+        try:
+            with wave.open(wav_path, 'rb') as wf:
+                self.sample_rate = wf.getframerate()
+                return wf.readframes(wf.getnframes())
+        finally:
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+
+    def synthesize(self, text):
+        """Text ko raw S16_LE mono PCM bytes mein badalta hai. Crash par ek baar restart karke retry."""
+        text = " ".join(text.split()) # Newline se utterance toot jaati
+        if not text:
+            return b""
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.proc is None:
+                        self.start()
+                    elif not self.is_alive():
+                        self.restart()
+                    return self._synthesize_once(text)
+                except (TTSError, OSError) as e:
+                    log.error(f"[TTS] Worker error: {e}")
+                    if attempt == 0:
+                        self.restart()
+            raise TTSError("Piper worker do baar fail hua.")
+
+    def health_check(self):
+        """Process zinda hai ya nahi; mara hua ho toh restart."""
+        with self.lock:
+            if not self.is_alive():
+                try:
+                    self.restart()
+                except (TTSError, OSError) as e:
+                    log.error(f"[TTS] Health check restart fail: {e}")
+                    return False
+        return True
+
+    def stop(self):
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.proc = None
+
+
+class PiperPool:
+    """Har configured voice ke liye ek warm PiperWorker."""
+
+    def __init__(self, voices=VOICES, piper_binary=PIPER_BINARY):
+        self.workers = {}
+        for lang, (model_path, _name) in voices.items():
+            self.workers[lang] = PiperWorker(model_path, piper_binary=piper_binary)
+
+    def start(self):
+        """Saare workers start karta hai (models parallel mein load hote hain)."""
+        for lang, worker in self.workers.items():
+            if not os.path.exists(worker.model_path):
+                continue
+            try:
+                worker.start()
+            except (TTSError, OSError) as e:
+                log.info(f"[TTS] {lang} worker start nahi hua: {e}")
+
+    def worker_for(self, lang):
+        return self.workers.get(lang, self.workers['en_m'])
+
+    def health_check(self):
+        """{lang: True/False}; mare hue workers restart ho jaate hain."""
+        return {lang: w.health_check() for lang, w in self.workers.items() if os.path.exists(w.model_path)}
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.stop()
+            if worker.scratch_dir:
+                shutil.rmtree(worker.scratch_dir, ignore_errors=True)
+                worker.scratch_dir = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide PiperPool (pehli baar mein ban jaata hai)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PiperPool()
+        return _pool
+
+_cache = None
+_cacheable = set() # (text, lang) jo cache mein save hone chahiye (system phrases)
+
+def get_cache():
+    """Process-wide PCM cache (fixed phrases ke liye)."""
+    global _cache
+    with _pool_lock:
+        if _cache is None:
+            try:
+                _cache = PCMCache()
+            except OSError as e:
+                log.warning(f"[TTS] PCM cache disabled: {e}")
+                return None
+        return _cache
+
+def warm_cache(phrases):
+    """
+    phrases: [(text, lang), ...]. Jo cache mein nahi hain unhe abhi synthesize karke
+    save karta hai; aage se yeh seedha disk se bajenge.
+    """
+    cache = get_cache()
+    for text, lang in phrases:
+        _cacheable.add((" ".join(text.split()), lang))
+    for text, lang in phrases:
+        if cache is None:
+            continue
+        model_path, _name = VOICES.get(lang, VOICES['en_m'])
+        if not os.path.exists(model_path) or cache.contains(text, model_path):
+            continue
+        try:
+            worker = get_pool().worker_for(lang)
+            cache.put(text, model_path, worker.synthesize(text), worker.sample_rate)
+        except Exception as e:
+            log.error(f"[TTS] Cache warm fail ('{text}'): {e}")
+
+def start_tts_pool():
+    """Startup par voices ko warm karta hai taaki pehla 'Yes sir?' bhi fast ho."""
+    get_pool().start()
+
+def stop_tts_pool():
+    if _pool is not None:
+        _pool.stop()
+
+_playback_lock = threading.Lock() # Ek waqt mein ek hi awaaz: filler aur jawab alag threads se aa sakte hain
+_player = None # Abhi baj raha (hamara apna) aplay process (fallback)
+_stop_count = 0 # stop_playback() har baar badhata hai; intezaar kar rahi awaazein aur speak_stream ruk jaate hain
+_stop_lock = threading.Lock() # stop_playback() kai threads se aata hai (barge-in, shutdown); '+= 1' atomic nahi
+last_interrupt_s = None # Pichli stop_playback() utterance ke kitne second par hui
+
+def play_pcm(pcm, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Raw S16_LE mono PCM bajaata hai (blocking, stop_playback se ek block ke andar rukta hai).
+    Persistent sounddevice output stream (audio_player); woh na khule toh aplay.
+    """
+    global _player
+    if not pcm:
+        return
+    player = get_player()
+    if player is not None:
+        player.play(pcm, sample_rate)
+        return
+    proc = subprocess.Popen([
+        'aplay', '-q', '-r', str(sample_rate), '-f', 'S16_LE', '-c', '1', '-t', 'raw', '-'
+    ], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _player = proc
+    try:
+        proc.communicate(pcm)
+    except BrokenPipeError:
+        pass # stop_playback ne beech mein band kar diya
+    finally:
+        _player = None
+
+def _stops():
+    """Ab tak kitni baar stop_playback() hua (lock ke saath padha gaya)."""
+    with _stop_lock:
+        return _stop_count
+
+def stop_playback():
+    """
+    Abhi bajti awaaz rok do (sirf hamari, 'killall' nahi) aur queue mein rukti awaazein bhi.
+    Returns: utterance ke kitne second par roka (kuch baj nahi raha tha toh None).
+    """
+    global _stop_count, last_interrupt_s
+    with _stop_lock:
+        _stop_count += 1
+    position = None
+    player = get_player(create=False)
+    if player is not None:
+        position = player.stop()
+    proc = _player
+    if proc is not None and proc.poll() is None:
+        proc.terminate()
+    if position is not None:
+        last_interrupt_s = position
+        log.info(f"[TTS] Playback {position:.2f}s par roka gaya.")
+    return position
+
+def _play_traced(pcm, sample_rate, trace):
+    stops = _stops()
+    with _playback_lock:
+        if _stops() != stops:
+            return # Baari aane se pehle hi stop ho gaya
+        if trace is not None:
+            trace.mark('tts_first_audio')
+        play_pcm(pcm, sample_rate)
+        if trace is not None:
+            trace.mark('tts_done')
+
+def speak(text_to_speak, lang='en_m', cache=None, trace=None):
     """
     Piper TTS ka istemaal karke text ko awaaz mein badalta hai.
     lang='hi' (Hindi)
     lang='en_m' (English Male - Default)
     lang='en_f' (English Female)
+    cache=True: synthesized audio PCM cache mein save karo (warm_cache wale phrases
+    apne aap save hote hain). Cache hit par Piper chalta hi nahi.
+    trace: latency_trace.Trace; playback shuru/khatam hone par 'tts_first_audio'/'tts_done' lagte hain.
     """
 
-    model_path = ""
-    if lang == 'hi':
-        model_path = HINDI_MODEL_PATH
-        if not os.path.exists(model_path):
-            print("Error: Hindi model nahi mila!")
-            return
-    elif lang == 'en_f':
-        model_path = EN_FEMALE_MODEL_PATH
-        if not os.path.exists(model_path):
-            print("Error: English (Female) model nahi mila!")
-            return
-    else:
-        # Default English Male hai
-        model_path = EN_MALE_MODEL_PATH
-        if not os.path.exists(model_path):
-            print("Error: English (Male) model nahi mila!")
-            return
+    if lang not in VOICES:
+        lang = 'en_m' # Default English Male hai
+    model_path, voice_name = VOICES[lang]
+    if not os.path.exists(model_path):
+        log.error(f"Error: {voice_name} model nahi mila!")
+        return
 
     if not os.path.exists(PIPER_BINARY):
-        print("Error: Piper binary nahi mila!")
+        log.error("Error: Piper binary nahi mila!")
         return
 
-    print(f"Jarvis ({lang}) bol raha hai: {text_to_speak}")
+    log.info(f"Jarvis ({lang}) bol raha hai: {text_to_speak}")
 
-    # Stream Piper output directly to aplay to reduce latency and disk IO
+    # Pehle pre-rendered cache, warna warm worker se PCM lo (model dobara load nahi hota)
     try:
-        # Start piper process that writes raw PCM to stdout
-        piper_proc = subprocess.Popen([
-            PIPER_BINARY,
-            '--model', model_path,
-            '--output_raw'
-        ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-        # Start aplay to play raw PCM from stdin
-        aplay_proc = subprocess.Popen([
-            'aplay', '-r', '22050', '-f', 'S16_LE', '-t', 'raw', '-'
-        ], stdin=piper_proc.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        # Send the text to piper stdin and close to signal EOF
-        piper_proc.stdin.write(text_to_speak + '\n')
-        piper_proc.stdin.close()
-
-        # Wait for playback to finish
-        aplay_proc.wait()
-        piper_proc.wait()
+        pcm_cache = get_cache()
+        cached = pcm_cache.get(text_to_speak, model_path) if pcm_cache else None
+        if cached:
+            _play_traced(cached[0], cached[1], trace)
+            return
+        worker = get_pool().worker_for(lang)
+        pcm = worker.synthesize(text_to_speak)
+        _play_traced(pcm, worker.sample_rate, trace)
+        if cache is None:
+            cache = (" ".join(text_to_speak.split()), lang) in _cacheable
+        if cache and pcm_cache:
+            pcm_cache.put(text_to_speak, model_path, pcm, worker.sample_rate)
     except Exception as e:
-        print(f"TTS streaming error: {e}")
+        log.error(f"TTS streaming error: {e}")
+
+def speak_stream(chunks, lang='en_m', trace=None):
+    """
+    Streaming text (jaise LLM ke sentences) ko aate hi bolta hai.
+    Ek background thread 'chunks' ko padhta rehta hai (LLM generate karta rehta hai)
+    jab tak yahaan pichla sentence bola ja raha hai.
+    Returns: jo poora text bola gaya.
+    """
+    pending = queue.Queue()
+    errors = []
+
+    def producer():
+        try:
+            for chunk in chunks:
+                pending.put(chunk)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            pending.put(None) # Khatam hone ka signal
+
+    threading.Thread(target=producer, daemon=True).start()
+
+    stops = _stops()
+    spoken = []
+    while True:
+        chunk = pending.get()
+        if chunk is None:
+            break
+        if _stops() != stops:
+            log.info("[TTS] Stream beech mein roka gaya.")
+            break
+        speak(chunk, lang=lang, trace=trace)
+        spoken.append(chunk)
+
+    if errors:
+        log.error(f"TTS stream source error: {errors[0]}")
+        if not spoken:
+            raise errors[0]
+    return " ".join(spoken)
 
 # --- Test Karne Ke Liye ---
 if __name__ == "__main__":
     print("--- Multilingual TTS Test ---")
+    start_tts_pool()
 
     # English Male (Default) test
     speak("Hello Sir. This is the default British male voice.", lang='en_m')
@@ -80,3 +410,10 @@ if __name__ == "__main__":
 
     # Hindi test
     speak("नमस्ते, मैं जार्विस हूँ। यह हिंदी आवाज़ है।", lang='hi')
+
+    # Warm worker: doosri baar model load nahi hona chahiye
+    start = time.monotonic()
+    speak("Yes sir?", lang='en_m')
+    print(f"Warm 'Yes sir?' took {time.monotonic() - start:.2f}s")
+    print(f"Worker health: {get_pool().health_check()}")
+    stop_tts_pool()
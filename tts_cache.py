@@ -0,0 +1,156 @@
+import hashlib
+import os
+import threading
+import time
+import wave
+
+# Yeh file fixed system phrases ("Yes sir?", "Executing." ...) ka pre-rendered PCM
+# disk par rakhti hai, taaki unke liye Piper synthesis hi na karna pade.
+# Key = sha256(text, voice model, model file ka hash): model badla toh purana audio apne aap bekaar.
+
+JARVIS_DIR = os.path.expanduser('~/jarvis')
+TTS_CACHE_DIR = os.path.join(JARVIS_DIR, 'tts_cache')
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024 # 32 MB kaafi hai saikdon chhote phrases ke liye
+
+HASH_CHUNK = 1024 * 1024
+
+
+_model_hashes = {} # (path, size, mtime_ns) -> sha256; model ko har baar hash nahi karna
+_model_hash_lock = threading.Lock()
+
+def model_file_hash(model_path):
+    """Voice model file ka sha256 (size+mtime par memoized)."""
+    try:
+        st = os.stat(model_path)
+    except OSError:
+        return "missing"
+    memo_key = (model_path, st.st_size, st.st_mtime_ns)
+    with _model_hash_lock:
+        if memo_key in _model_hashes:
+            return _model_hashes[memo_key]
+    h = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _model_hash_lock:
+        _model_hashes[memo_key] = digest
+    return digest
+
+
+class PCMCache:
+    """
+    Content-addressed PCM cache (WAV files, ek phrase ek file).
+    LRU eviction: file ka mtime hi 'last used' hai, total size max_bytes se upar jaaye toh
+    sabse purani files hatti hain.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.lock = threading.Lock()
+        self.index = {} # key -> [size, last_used]
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            if not name.endswith('.wav'):
+                continue
+            try:
+                st = os.stat(os.path.join(cache_dir, name))
+            except OSError:
+                continue
+            self.index[name[:-4]] = [st.st_size, st.st_mtime]
+
+    def key(self, text, model_path):
+        text = " ".join(text.split())
+        raw = "\0".join([text, os.path.basename(model_path), model_file_hash(model_path)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.wav')
+
+    def contains(self, text, model_path):
+        with self.lock:
+            return self.key(text, model_path) in self.index
+
+    def get(self, text, model_path):
+        """(pcm_bytes, sample_rate) ya None."""
+        key = self.key(text, model_path)
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with wave.open(self._path(key), 'rb') as wf:
+                    result = (wf.readframes(wf.getnframes()), wf.getframerate())
+            except (OSError, EOFError, wave.Error):
+                # File gayab ya kharab: index se hata do
+                self.index.pop(key, None)
+                self.misses += 1
+                return None
+            now = time.time()
+            entry[1] = now
+            try:
+                os.utime(self._path(key), (now, now))
+            except OSError:
+                pass
+            self.hits += 1
+            return result
+
+    def put(self, text, model_path, pcm, sample_rate):
+        if not pcm:
+            return
+        key = self.key(text, model_path)
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with self.lock:
+            with wave.open(tmp_path, 'wb') as wf:
+                wf.setnchannels(1)
+                wf.setsampwidth(2)
+                wf.setframerate(int(sample_rate))
+                wf.writeframes(pcm)
+            os.replace(tmp_path, path)
+            self.index[key] = [os.path.getsize(path), time.time()]
+            self._evict()
+
+    def _evict(self):
+        total = sum(size for size, _ in self.index.values())
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self.index.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self.index[key]
+            total -= size
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.index),
+                "bytes": sum(size for size, _ in self.index.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+# --- Test Karne Ke Liye ---
+if __name__ == "__main__":
+    import tempfile
+    print("--- PCM Cache Test ---")
+    with tempfile.TemporaryDirectory() as d:
+        model = os.path.join(d, 'voice.onnx')
+        with open(model, 'wb') as f:
+            f.write(b"fake model")
+        cache = PCMCache(cache_dir=os.path.join(d, 'cache'), max_bytes=3000)
+        print(f"Miss: {cache.get('Yes sir?', model)}")
+        cache.put("Yes sir?", model, b"\x00\x01" * 1000, 22050)
+        pcm, sr = cache.get("Yes sir?", model)
+        print(f"Hit: {len(pcm)} bytes @ {sr} Hz")
+        cache.put("Executing.", model, b"\x00\x01" * 1000, 22050) # Size cap cross -> LRU evict
+        print(f"Stats: {cache.stats()}")
+    print("\n--- Test Complete ---")
@@ -1,30 +1,79 @@
 #!/usr/bin/env python3
 # whisper_wrapper.py
 # Hinglish: safe wrapper for whisper.cpp (whisper-cli). Copy-paste this file to ~/jarvis/
-# Use karein to call whisper-cli reliably, capture stdout/stderr, fallback and detect blank audio.
+# Confidence cascade: sabse tez model pehle, bada/multilingual model sirf jab zaroorat ho.
+#
+# Pehle transcribe_safe whisper ko teen baar tak ek ke baad ek chalata tha (multilingual, phir
+# English-only, phir diagnostic rerun) aur "blank" stdout ki string matching se decide hota tha.
+# Ab har run whisper ka JSON (-ojf) deta hai: har token ki probability aur detected language.
+# Stage tab accept hota hai jab text ho, token confidence threshold se upar ho aur language
+# allowed ho (en/hi -- Hinglish aksar 'ur'/'pa' detect hoti hai, tab agla model). Zyada tar
+# commands pehle (tiny.en) model par hi khatam. race=True: pehle do stages saath-saath,
+# jeetne wala accept hote hi doosra process kill.
 
-import subprocess
-import shlex
+import json
 import os
+import shlex
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cpu_scheduler import spawn_command, stage_threads
+from jarvis_log import get_logger
+
+log = get_logger(__name__)
 
 WHISPER_CLI = os.path.expanduser("~/jarvis/whisper.cpp/build/bin/whisper-cli")
-MODEL_MULTI = os.path.expanduser("~/jarvis/whisper.cpp/models/ggml-tiny.bin")
-MODEL_EN = os.path.expanduser("~/jarvis/whisper.cpp/models/ggml-tiny.en.bin")
+MODELS_DIR = os.path.expanduser("~/jarvis/whisper.cpp/models")
+MODEL_MULTI = os.path.join(MODELS_DIR, "ggml-tiny.bin")
+MODEL_EN = os.path.join(MODELS_DIR, "ggml-tiny.en.bin")
+MODEL_BASE = os.path.join(MODELS_DIR, "ggml-base.bin")
+
+DEFAULT_MIN_CONFIDENCE = 0.6
+DEFAULT_LANGUAGES = ('en', 'hi')
+DEFAULT_TIMEOUT = 60
+BLANK_MARKERS = ('[blank_audio]', 'blank_audio', 'no speech', '(silence)', '[silence]', '[music]')
+
+# name: log/trace ke liye;  language: '-l' flag ('en' English-only model ke liye, 'auto' detect)
+Stage = namedtuple('Stage', ['name', 'model', 'language'])
+# confidence: text tokens ki average probability (None = purana build, JSON nahi mila)
+# accepted: is stage ka jawab final?  reason: kyun nahi (log ke liye)
+Attempt = namedtuple('Attempt', ['stage', 'text', 'language', 'confidence', 'segments', 'elapsed_s',
+                                 'accepted', 'reason'])
+
+DEFAULT_STAGES = [
+    Stage('tiny.en', MODEL_EN, 'en'), # Sabse tez: English commands yahin khatam
+    Stage('tiny', MODEL_MULTI, 'auto'), # Hinglish/Hindi
+    Stage('base', MODEL_BASE, 'auto'), # Sabse dheema, sabse sahi
+]
 
-def run_whisper(model_path, wav_path, threads=1, lang="auto", extra_flags=None):
+
+def run_whisper(model_path, wav_path, threads=1, lang="auto", extra_flags=None, timeout=DEFAULT_TIMEOUT,
+                on_start=None, cli_path=None):
+    """
+    whisper-cli ek baar. Returns (returncode, stdout, stderr).
+    on_start(proc): process shuru hote hi (race mein loser ko kill karne ke liye).
+    """
     extra_flags = extra_flags or []
-    cmd = [WHISPER_CLI, "-m", model_path, "-f", wav_path, "-t", str(threads), "-l", lang] + extra_flags
-    print(f"[whisper_wrapper] Running: {' '.join(shlex.quote(x) for x in cmd)}")
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    print(f"[whisper_wrapper] returncode={p.returncode}")
-    if p.stdout:
-        print("[whisper_wrapper] STDOUT (head):")
-        print(p.stdout.strip()[:2000])
-    if p.stderr:
-        print("[whisper_wrapper] STDERR (head):")
-        print(p.stderr.strip()[:4000])
-    return p.returncode, p.stdout, p.stderr
+    cmd = [cli_path or WHISPER_CLI, "-m", model_path, "-f", wav_path, "-t", str(threads), "-l", lang] + extra_flags
+    log.debug(f"[whisper_wrapper] Running: {' '.join(shlex.quote(x) for x in cmd)}")
+    proc = subprocess.Popen(spawn_command('stt', cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if on_start is not None:
+        on_start(proc)
+    try:
+        out, err = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        out, err = proc.communicate()
+        return -9, out, (err or "") + "\ntimeout"
+    if proc.returncode not in (0, -9, -15):
+        log.info(f"[whisper_wrapper] returncode={proc.returncode} STDERR (head): {(err or '').strip()[:2000]}")
+    return proc.returncode, out, err
 
 def detect_blank(stdout_text):
     if stdout_text is None:
@@ -32,36 +81,269 @@ def detect_blank(stdout_text):
     s = stdout_text.strip().lower()
     if not s:
         return True
-    if "[blank_audio]" in s or "blank_audio" in s or "no speech" in s:
-        return True
-    return False
+    return any(marker in s for marker in BLANK_MARKERS)
+
+def _is_text_token(token):
+    text = token.get('text', '')
+    # [_BEG_], [_TT_42], <|en|> jaise special tokens confidence mein nahi gine jaate
+    return bool(text.strip()) and not text.startswith('[_') and not text.startswith('<|')
+
+def parse_json_output(data):
+    """
+    whisper-cli -ojf JSON -> (text, language, confidence, segments).
+    segments: [(start_s, end_s, text, confidence), ...]
+    """
+    language = (data.get('result') or {}).get('language')
+    probs = []
+    segments = []
+    for item in data.get('transcription', []):
+        seg_probs = [float(t['p']) for t in item.get('tokens', []) if _is_text_token(t) and 'p' in t]
+        probs.extend(seg_probs)
+        offsets = item.get('offsets', {})
+        segments.append((offsets.get('from', 0) / 1000.0, offsets.get('to', 0) / 1000.0,
+                         item.get('text', '').strip(),
+                         sum(seg_probs) / len(seg_probs) if seg_probs else None))
+    text = " ".join(" ".join(seg[2] for seg in segments).split())
+    confidence = sum(probs) / len(probs) if probs else None
+    return text, language, confidence, segments
+
+
+class WhisperCascade:
+    """
+    stages: cheap -> expensive. transcribe_file(wav)/transcribe(audio) -> (final Attempt, saare attempts).
+    STT engine interface bhi (transcribe -> Transcript), taaki main 'STT_BACKEND: cascade' se use kare.
+    """
+    resident = False # Har stage naya process: streaming STT ke layak nahi
+
+    def __init__(self, stages=None, cli_path=WHISPER_CLI, min_confidence=DEFAULT_MIN_CONFIDENCE,
+                 languages=DEFAULT_LANGUAGES, race=False, threads=None, timeout=DEFAULT_TIMEOUT):
+        self.cli_path = cli_path
+        self.all_stages = list(stages or DEFAULT_STAGES)
+        self.min_confidence = float(min_confidence)
+        self.languages = tuple(languages)
+        self.race = bool(race)
+        self.threads = threads # None/'auto': cpu_scheduler
+        self.timeout = timeout
+        self.stats = {} # stage name -> kitni baar final jawab wahi bana
+
+    @property
+    def stages(self):
+        return [stage for stage in self.all_stages if os.path.exists(stage.model)]
+
+    # --- STT engine interface ---
+    def start(self):
+        if not os.path.exists(self.cli_path):
+            raise self._error(f"whisper-cli nahi mila: {self.cli_path}")
+        if not self.stages:
+            raise self._error(f"Cascade ka koi model nahi mila ({MODELS_DIR})")
+        log.info(f"[Cascade] Stages: {' -> '.join(s.name for s in self.stages)}"
+                 f" (min conf {self.min_confidence}, race={self.race})")
+
+    def is_alive(self):
+        return os.path.exists(self.cli_path)
+
+    def wait_ready(self, timeout=None):
+        return self.is_alive()
+
+    def stop(self):
+        pass
+
+    @staticmethod
+    def _error(message):
+        from stt_engine import STTError # Yahan import: stt_engine hi cascade ko banata hai
+        return STTError(message)
+
+    def transcribe(self, audio, sample_rate=16000, timeout=None, language=None):
+        from audio_conditioning import to_wav_bytes
+        from stt_engine import Segment, Transcript
+        scratch = tempfile.mkdtemp(prefix='jarvis_cascade_')
+        try:
+            wav_path = os.path.join(scratch, 'command.wav')
+            with open(wav_path, 'wb') as f:
+                f.write(to_wav_bytes(audio, sample_rate))
+            final, attempts = self.transcribe_file(wav_path, timeout=timeout)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        if final is None:
+            if attempts and all(a.reason == "blank" for a in attempts):
+                return Transcript("", [], None) # Sach mein kuch nahi bola gaya
+            raise self._error("; ".join(f"{a.stage}: {a.reason}" for a in attempts) or "koi stage nahi chala")
+        segments = [Segment(start, end, text, conf) for start, end, text, conf in final.segments]
+        return Transcript(final.text, segments, final.language)
+
+    # --- Cascade ---
+    def _judge(self, stage, text, language, confidence):
+        if not text or detect_blank(text):
+            return False, "blank"
+        if stage.language == 'auto' and language and language not in self.languages:
+            return False, f"language '{language}'"
+        if confidence is not None and confidence < self.min_confidence:
+            return False, f"confidence {confidence:.2f}"
+        return True, None
+
+    def _run_stage(self, stage, wav_path, threads, timeout, on_start=None):
+        start = time.perf_counter()
+        scratch = tempfile.mkdtemp(prefix='jarvis_whisper_')
+        prefix = os.path.join(scratch, 'out')
+        try:
+            rc, out, err = run_whisper(stage.model, wav_path, threads=threads, lang=stage.language,
+                                       extra_flags=["-oj", "-ojf", "-of", prefix, "-np"],
+                                       timeout=timeout, on_start=on_start, cli_path=self.cli_path)
+            elapsed = time.perf_counter() - start
+            if rc != 0:
+                return Attempt(stage.name, "", None, None, [], elapsed, False, f"returncode {rc}")
+            try:
+                with open(prefix + '.json', encoding='utf-8', errors='ignore') as f:
+                    text, language, confidence, segments = parse_json_output(json.load(f))
+            except (OSError, ValueError):
+                # Purana build (-ojf nahi): sirf stdout, confidence pata nahi
+                text = " ".join((out or "").split())
+                language, confidence, segments = None, None, [(0.0, 0.0, text, None)]
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        accepted, reason = self._judge(stage, text, language, confidence)
+        return Attempt(stage.name, text, language, confidence, segments, elapsed, accepted, reason)
+
+    def _best(self, attempts):
+        """Koi stage accept na ho: sabse zyada confidence wala non-blank jawab (kuch na ho toh None)."""
+        usable = [a for a in attempts if a.text and not detect_blank(a.text)]
+        if not usable:
+            return None
+        return max(usable, key=lambda a: -1.0 if a.confidence is None else a.confidence)
+
+    def _race(self, first, second, wav_path, threads, timeout):
+        """Do stages saath-saath; pehla accept hua jawab jeetta hai, doosra process kill."""
+        procs = {}
+        lock = threading.Lock()
+
+        def remember(name):
+            def on_start(proc):
+                with lock:
+                    procs[name] = proc
+            return on_start
+
+        attempts = []
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="jarvis-whisper") as pool:
+            futures = {
+                pool.submit(self._run_stage, stage, wav_path, threads, timeout, remember(stage.name)): stage
+                for stage in (first, second)
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    attempt = future.result()
+                    attempts.append(attempt)
+                    if attempt.accepted:
+                        with lock:
+                            losers = [proc for name, proc in procs.items() if name != attempt.stage]
+                        for proc in losers:
+                            if proc.poll() is None:
+                                proc.kill() # Loser ka kaam ab bekaar hai
+                        return attempt, attempts
+        return None, attempts
+
+    def transcribe_file(self, wav_path, timeout=None):
+        """Returns (final Attempt ya None, saare attempts)."""
+        timeout = timeout or self.timeout
+        stages = self.stages
+        threads = stage_threads('stt', self.threads)
+        attempts = []
+        final = None
+        if self.race and len(stages) >= 2:
+            # Do processes cores baant lete hain
+            final, attempts = self._race(stages[0], stages[1], wav_path, max(1, threads // 2), timeout)
+            stages = stages[2:] if final is None else []
+        for stage in stages:
+            attempt = self._run_stage(stage, wav_path, threads, timeout)
+            attempts.append(attempt)
+            if attempt.accepted:
+                final = attempt
+                break
+        if final is None:
+            final = self._best(attempts)
+        summary = ", ".join(
+            f"{a.stage} {a.elapsed_s * 1000:.0f}ms "
+            f"{'OK' if a.accepted else 'x ' + (a.reason or '')}" for a in attempts
+        )
+        log.info(f"[Cascade] {summary} -> {final.stage + ': ' + repr(final.text) if final else 'no text'}")
+        if final is not None:
+            self.stats[final.stage] = self.stats.get(final.stage, 0) + 1
+        return final, attempts
+
+
+def create_cascade(config):
+    """config: STT_CASCADE_MODELS ([{name, model, language}]), STT_MIN_CONFIDENCE, STT_LANGUAGES, STT_CASCADE_RACE."""
+    stages = None
+    if config.get('STT_CASCADE_MODELS'):
+        stages = [Stage(m.get('name', os.path.basename(m['model'])), os.path.expanduser(m['model']),
+                        m.get('language', 'auto')) for m in config['STT_CASCADE_MODELS']]
+    return WhisperCascade(
+        stages=stages,
+        min_confidence=config.get('STT_MIN_CONFIDENCE', DEFAULT_MIN_CONFIDENCE),
+        languages=config.get('STT_LANGUAGES', DEFAULT_LANGUAGES),
+        race=config.get('STT_CASCADE_RACE', False),
+        threads=config.get('WHISPER_THREADS')
+    )
 
 def transcribe_safe(wav_path):
-    # Try multilingual model first if present
-    if os.path.exists(MODEL_MULTI):
-        rc, out, err = run_whisper(MODEL_MULTI, wav_path, threads=1, lang="auto", extra_flags=["-otxt"])
-        if rc == 0 and not detect_blank(out):
-            return out
-    # Then try english-only model
-    if os.path.exists(MODEL_EN):
-        rc, out, err = run_whisper(MODEL_EN, wav_path, threads=1, lang="en", extra_flags=["-otxt"])
-        if rc == 0 and not detect_blank(out):
-            return out
-    # Final attempt with default model (show diagnostics)
-    model = MODEL_MULTI if os.path.exists(MODEL_MULTI) else MODEL_EN
-    rc, out, err = run_whisper(model, wav_path, threads=1, lang="auto")
-    if rc != 0:
-        print("[whisper_wrapper] WARNING: whisper-cli returned non-zero. See STDERR above.")
-    if detect_blank(out):
-        print("[whisper_wrapper] Detected blank audio / no transcription.")
-        print("[whisper_wrapper] Suggestions:")
-        print("  - Ensure the WAV has clear speech (play it with aplay).")
-        print("  - Length >= 0.5s (prefer >1s).")
-        print("  - If you speak Hindi/Hinglish, use ggml-tiny.bin (multilingual).")
-    return out
+    """Purana API: WAV path -> text (kuch na mile toh "")."""
+    final, attempts = WhisperCascade().transcribe_file(wav_path)
+    if final is None:
+        log.info("[whisper_wrapper] Detected blank audio / no transcription.")
+        log.info("[whisper_wrapper] Suggestions:")
+        log.info("  - Ensure the WAV has clear speech (play it with aplay).")
+        log.info("  - Length >= 0.5s (prefer >1s).")
+        log.info("  - If you speak Hindi/Hinglish, use ggml-tiny.bin (multilingual).")
+        return ""
+    return final.text
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: whisper_wrapper.py <wav-path>")
-        sys.exit(1)
-    print(transcribe_safe(sys.argv[1]))
+    if len(sys.argv) >= 2:
+        print(transcribe_safe(sys.argv[1]))
+        sys.exit(0)
+
+    # --- Test Karne Ke Liye --- (whisper-cli ke bina: fake CLI jo model ke naam se JSON likhta hai)
+    print("--- Whisper Cascade Test (fake whisper-cli) ---")
+    workdir = tempfile.mkdtemp(prefix='jarvis_cascade_test_')
+    fake_cli = os.path.join(workdir, 'whisper-cli')
+    with open(fake_cli, 'w') as f:
+        f.write(f"""#!{sys.executable}
+import json, sys, time
+args = sys.argv[1:]
+model = args[args.index('-m') + 1]
+prefix = args[args.index('-of') + 1]
+wav = open(args[args.index('-f') + 1]).read()
+# Har 'model' ka jawab: (delay, text, language, token probability)
+table = {{
+    'english': {{'tiny.en': (0.05, 'kitni ram hai', 'en', 0.91)}},
+    'hinglish': {{'tiny.en': (0.05, 'key tiny rum hey', 'en', 0.35),
+                  'tiny': (0.15, 'mera naam badlo', 'ur', 0.7),
+                  'base': (0.4, 'mera naam badlo', 'hi', 0.82)}},
+    'silence': {{}},
+}}
+delay, text, lang, p = table[wav.strip()].get(model.split('/')[-1], (0.05, '[BLANK_AUDIO]', 'en', 0.2))
+time.sleep(delay)
+tokens = [{{'text': '[_BEG_]', 'p': 0.99}}] + [{{'text': ' ' + w, 'p': p}} for w in text.split()]
+json.dump({{'result': {{'language': lang}}, 'transcription': [
+    {{'offsets': {{'from': 0, 'to': 1500}}, 'text': ' ' + text, 'tokens': tokens}}]}}, open(prefix + '.json', 'w'))
+""")
+    os.chmod(fake_cli, 0o755)
+    for name in ('tiny.en', 'tiny', 'base'):
+        open(os.path.join(workdir, name), 'w').close()
+    stages = [Stage(name, os.path.join(workdir, name), 'en' if name.endswith('.en') else 'auto')
+              for name in ('tiny.en', 'tiny', 'base')]
+
+    for race in (False, True):
+        cascade = WhisperCascade(stages=stages, cli_path=fake_cli, race=race, threads=2)
+        for utterance in ('english', 'hinglish', 'silence'):
+            wav = os.path.join(workdir, utterance + '.wav')
+            with open(wav, 'w') as f:
+                f.write(utterance)
+            start = time.perf_counter()
+            final, attempts = cascade.transcribe_file(wav)
+            print(f"race={race} {utterance:<9} -> {final.stage + ': ' + final.text if final else None} "
+                  f"({len(attempts)} runs, {time.perf_counter() - start:.2f}s)")
+        print(f"Final stage counts: {cascade.stats}")
+    shutil.rmtree(workdir, ignore_errors=True)
+    print("\n--- Test Complete ---")